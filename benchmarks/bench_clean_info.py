@@ -0,0 +1,116 @@
+"""
+基准测试：step2.clean_info_for_json 新旧实现对比
+
+用 youtube_downloads_test/metadata/*_full.json 作为样本，并在每个 info 里加入几个
+不可序列化的对象（模拟 yt-dlp 内存中的 info），比较两种实现的耗时并校验结果一致
+
+用法:
+    python benchmarks/bench_clean_info.py [--limit 50] [--repeat 3]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from step2 import clean_info_for_json  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "youtube_downloads_test", "metadata", "*_full.json")
+
+
+def clean_info_for_json_legacy(info):
+    """旧实现：递归重建每个容器，对每个叶子调用 json.dumps 测试能否序列化"""
+    if info is None:
+        return None
+
+    if not isinstance(info, (dict, list, tuple)):
+        try:
+            json.dumps(info)
+            return info
+        except (TypeError, ValueError):
+            return None
+
+    if isinstance(info, dict):
+        cleaned = {}
+        for key, value in info.items():
+            cleaned_value = clean_info_for_json_legacy(value)
+            if cleaned_value is not None:
+                cleaned[key] = cleaned_value
+            elif value is None:
+                cleaned[key] = None
+        return cleaned
+
+    cleaned_list = []
+    for item in info:
+        cleaned_item = clean_info_for_json_legacy(item)
+        if cleaned_item is not None or item is None:
+            cleaned_list.append(cleaned_item)
+    return cleaned_list if isinstance(info, list) else tuple(cleaned_list)
+
+
+class _Postprocessor:
+    """模拟 yt-dlp info 里挂着的不可序列化对象"""
+
+
+def with_live_objects(info):
+    """往 info 里加入几处不可序列化的对象"""
+    info = dict(info)
+    info['__postprocessors'] = [_Postprocessor(), _Postprocessor()]
+    info['__files_to_move'] = {'x.json3': _Postprocessor()}
+    if info.get('requested_formats'):
+        info['requested_formats'] = [dict(f, _downloader=_Postprocessor()) for f in info['requested_formats']]
+    return info
+
+
+def load_fixtures(limit):
+    paths = sorted(glob.glob(FIXTURES))[:limit]
+    infos = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            infos.append(with_live_objects(json.load(f)))
+    return infos
+
+
+def bench(func, infos, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for info in infos:
+            func(info)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='clean_info_for_json 新旧实现对比')
+    parser.add_argument('--limit', type=int, default=50, help='使用的样本文件数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    infos = load_fixtures(args.limit)
+    if not infos:
+        print(f"❌ 找不到样本: {FIXTURES}")
+        return
+
+    # 结果必须一致
+    for info in infos:
+        expected = json.dumps(clean_info_for_json_legacy(info), sort_keys=True)
+        actual = json.dumps(clean_info_for_json(info), sort_keys=True)
+        assert expected == actual, f"结果不一致: {info.get('id')}"
+
+    legacy = bench(clean_info_for_json_legacy, infos, args.repeat)
+    fast = bench(clean_info_for_json, infos, args.repeat)
+
+    print(f"样本: {len(infos)} 个 info")
+    print(f"  旧实现: {legacy * 1000:8.1f} ms  ({legacy / len(infos) * 1000:.2f} ms/个)")
+    print(f"  新实现: {fast * 1000:8.1f} ms  ({fast / len(infos) * 1000:.2f} ms/个)")
+    print(f"  加速:   {legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
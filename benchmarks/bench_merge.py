@@ -0,0 +1,96 @@
+"""
+基准测试：merge_transcripts 的合并流水线在合成数据上的耗时和内存
+
+生成 N 个视频的合成字幕（模拟自动字幕：滚动重复的行 + 空的换行片段），
+每个规模在独立子进程里合并一次，报告耗时、每个视频的耗时和峰值RSS，
+用来确认耗时随视频数线性增长、内存不随视频数增长
+
+用法:
+    python benchmarks/bench_merge.py [--sizes 5000 10000 20000 50000] [--segments 60]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ("inflation prices rates the fed money supply interest economy markets bond yields "
+         "cost of living wages demand supply chain energy food housing rent central bank").split()
+
+
+def synthetic_record(video_id, segments, rng):
+    """一个视频的合成字幕：每段带上一段末尾的两三个词（滚动重复），中间夹空片段"""
+    segs = []
+    start = 0
+    previous = []
+    for _ in range(segments):
+        words = previous[-rng.randint(2, 3):] + [rng.choice(WORDS) for _ in range(rng.randint(4, 9))]
+        segs.append({'start_ms': start, 'end_ms': start + 3000, 'text': ' '.join(words)})
+        segs.append({'start_ms': start + 1500, 'end_ms': start + 3000, 'text': '\n'})
+        previous = words
+        start += 2000
+    return {'video_id': video_id, 'transcripts': [{'language': 'en', 'segments': segs}]}
+
+
+def write_synthetic(path, count, segments, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            f.write(json.dumps(synthetic_record(f"v{i:010d}", segments, rng)) + '\n')
+
+
+def run_once(input_path, output_path):
+    """子进程里执行：合并一次并输出耗时和峰值RSS（JSON）"""
+    from merge_transcripts import merge_to_csv
+
+    start = time.perf_counter()
+    count = merge_to_csv(input_path, output_path)
+    elapsed = time.perf_counter() - start
+    maxrss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'videos': count, 'seconds': elapsed, 'maxrss_kb': maxrss_kb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并流水线基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 10000, 20000, 50000])
+    parser.add_argument('--segments', type=int, default=60, help='每个视频的字幕行数')
+    parser.add_argument('--run', nargs=2, metavar=('INPUT', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_once(*args.run)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            input_path = os.path.join(tmp, f"transcripts_{size}.jsonl")
+            output_path = os.path.join(tmp, f"merged_{size}.csv")
+            write_synthetic(input_path, size, args.segments)
+
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', input_path, output_path],
+                check=True, capture_output=True, text=True, cwd=ROOT,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{size:>8} 个视频: {result['seconds']:7.2f}s  "
+                  f"{result['seconds'] / size * 1e6:7.1f} µs/视频  峰值RSS {result['maxrss_kb'] / 1024:6.1f} MB")
+            os.remove(input_path)
+
+    first, last = results[0], results[-1]
+    per_video_ratio = (last['seconds'] / last['videos']) / (first['seconds'] / first['videos'])
+    print(f"\n每视频耗时比（最大/最小规模）: {per_video_ratio:.2f}（≈1 表示线性）")
+    print(f"峰值RSS 变化: {first['maxrss_kb'] / 1024:.1f} MB -> {last['maxrss_kb'] / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
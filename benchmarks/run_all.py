@@ -0,0 +1,429 @@
+"""
+整条流水线的基准测试（完全离线）：按阶段计时，报告延迟、吞吐量和峰值RSS，并和保存的基线比较
+
+阶段:
+    search      ID 搜索（异步客户端 + 本地假 API，fake_youtube_api.py）
+    details     视频/频道详情分批请求 + 解析（同上）
+    clean_info  step2.clean_info_for_json（metadata/*_full.json 样本，带不可序列化对象）
+    transcripts step2.extract_transcript_info 读取并解析 json3 字幕文件（由 transcripts_all.json 样本还原）
+    write       videos_detailed.csv + slim 元数据JSON + 字幕 JSONL 写盘
+    merge       merge_transcripts.merge_to_csv 合并字幕
+    warehouse   warehouse.Warehouse 写入视频/频道表（假 API 的 item）+ 按频道汇总
+    near_dups   near_duplicates.NearDuplicateIndex 增量加入字幕（MinHash + LSH）+ 输出重复簇
+    similarity  similarity.SimilarityIndex 哈希 TF-IDF 向量化 + refresh（行范数、频道向量）+ top-k 查询
+
+规模: fixture（样本原始数量）或视频数（样本循环复用、换成新的 video_id，如 10000、100000）；
+每个 阶段×规模 在独立子进程里运行（峰值RSS互不影响），重复 --repeat 次取中位数；
+fixture 规模和耗时不到 MIN_GATED_SECONDS 的项只报告和基线的差异，不会让退出码变成 1
+
+用法:
+    python benchmarks/run_all.py                                  # fixture + 10000，和基线比较
+    python benchmarks/run_all.py --scales fixture 10000 100000 --stages merge write
+    python benchmarks/run_all.py --save-baseline                  # 把本次结果保存为基线
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import glob
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+SAMPLE_JSON = os.path.join(ROOT, "sample.json")
+TRANSCRIPTS_JSON = os.path.join(ROOT, "youtube_downloads_test", "transcripts_all.json")
+METADATA_GLOB = os.path.join(ROOT, "youtube_downloads_test", "metadata", "*_full.json")
+
+STAGES = ('search', 'details', 'clean_info', 'transcripts', 'write', 'merge', 'warehouse', 'near_dups', 'similarity')
+DEFAULT_SCALES = ('fixture', '10000')
+
+# 每个阶段在 fixture 规模下处理的数量（搜索/详情没有样本文件，用一个查询的上限 500）
+FIXTURE_SIZES = {'search': 500, 'details': 500, 'warehouse': 500}
+
+# 单个视频很重的阶段的上限（clean_info 每个样本约 0.8 MB），超过时按上限计算吞吐量
+STAGE_CAPS = {'clean_info': 2000}
+
+# 吞吐量下降或峰值RSS上升超过这个比例就算退化
+TOLERANCE = 0.3
+
+# 耗时短于这个秒数的项（fixture 规模一般只有 0.1-0.2 秒）噪声太大：超出容差只报告，不算失败
+MIN_GATED_SECONDS = 1.0
+
+
+# ============================================================================
+# 样本
+# ============================================================================
+
+def load_transcript_fixtures():
+    """sample.json + transcripts_all.json（按 video_id 去重）"""
+    records = {}
+    for path in (SAMPLE_JSON, TRANSCRIPTS_JSON):
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for record in json.load(f):
+                    records.setdefault(record['video_id'], record)
+    return list(records.values())
+
+
+def load_metadata_fixtures(limit=None):
+    from bench_clean_info import with_live_objects
+
+    infos = []
+    for path in sorted(glob.glob(METADATA_GLOB))[:limit]:
+        with open(path, 'r', encoding='utf-8') as f:
+            infos.append(with_live_objects(json.load(f)))
+    return infos
+
+
+def scaled(fixtures, size, id_key):
+    """循环复用样本凑够 size 个，第二轮起换成新的 ID"""
+    for i, item in enumerate(itertools.islice(itertools.cycle(fixtures), size)):
+        if i < len(fixtures):
+            yield item
+        else:
+            yield dict(item, **{id_key: f"{item[id_key]}_{i}"})
+
+
+def to_json3(segments):
+    """把解析后的片段还原成 json3（和 YouTube 返回的结构一致）"""
+    return {'events': [
+        {'tStartMs': seg['start_ms'], 'dDurationMs': seg['end_ms'] - seg['start_ms'],
+         'segs': [{'utf8': seg['text'] or '\n'}]}
+        for seg in segments
+    ]}
+
+
+def resolve_size(stage, scale, fixture_count):
+    size = FIXTURE_SIZES.get(stage, fixture_count) if scale == 'fixture' else int(scale)
+    return min(size, STAGE_CAPS.get(stage, size))
+
+
+# ============================================================================
+# 各阶段：准备数据（不计时），返回 (处理数量, 计时秒数)
+# ============================================================================
+
+def stage_search(scale, tmp):
+    from fake_youtube_api import start_fake_server
+    from youtube_async import AsyncYouTubeClient
+
+    size = resolve_size('search', scale, 0)
+    per_query = 500
+    queries = [f"benchmark query {i}" for i in range(-(-size // per_query))]
+    server, base_url = start_fake_server(results_per_query=per_query)
+
+    async def run():
+        client = AsyncYouTubeClient('benchmark', base_url=base_url, max_concurrency=8)
+
+        async def one(query, limit):
+            ids = []
+            async for page in client.iter_search_pages(query, limit):
+                ids.extend(page)
+            return ids
+
+        limits = [min(per_query, size - i * per_query) for i in range(len(queries))]
+        results = await asyncio.gather(*(one(q, n) for q, n in zip(queries, limits)))
+        return sum(len(ids) for ids in results)
+
+    start = time.perf_counter()
+    count = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return count, elapsed
+
+
+def stage_details(scale, tmp):
+    from fake_youtube_api import start_fake_server
+    from step1_search import parse_channel_item, parse_video_item
+    from youtube_async import AsyncYouTubeClient
+
+    size = resolve_size('details', scale, 0)
+    video_ids = [f"v{i:010d}" for i in range(size)]
+    server, base_url = start_fake_server()
+
+    async def run():
+        client = AsyncYouTubeClient('benchmark', base_url=base_url, max_concurrency=8)
+        batches = [video_ids[i:i + 50] for i in range(0, len(video_ids), 50)]
+        videos = [parse_video_item(item)
+                  for items in await asyncio.gather(*(client.list_videos(b) for b in batches))
+                  for item in items]
+        channel_ids = sorted({video['channel_id'] for video in videos})
+        batches = [channel_ids[i:i + 50] for i in range(0, len(channel_ids), 50)]
+        for items in await asyncio.gather(*(client.list_channels(b) for b in batches)):
+            for item in items:
+                parse_channel_item(item)
+        return len(videos)
+
+    start = time.perf_counter()
+    count = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return count, elapsed
+
+
+def stage_clean_info(scale, tmp):
+    from step2 import clean_info_for_json
+
+    fixtures = load_metadata_fixtures()
+    size = resolve_size('clean_info', scale, len(fixtures))
+    start = time.perf_counter()
+    for info in itertools.islice(itertools.cycle(fixtures), size):
+        clean_info_for_json(info)
+    return size, time.perf_counter() - start
+
+
+def stage_transcripts(scale, tmp):
+    import step2
+
+    fixtures = load_transcript_fixtures()
+    size = resolve_size('transcripts', scale, len(fixtures))
+    step2.TRANSCRIPTS_DIR = os.path.join(tmp, 'transcripts')
+    step2.VIDEOS_DIR = os.path.join(tmp, 'videos')
+
+    video_ids = []
+    for record in scaled(fixtures, size, 'video_id'):
+        video_id = record['video_id']
+        video_dir = os.path.join(step2.TRANSCRIPTS_DIR, video_id)
+        os.makedirs(video_dir, exist_ok=True)
+        for transcript in record['transcripts']:
+            path = os.path.join(video_dir, f"{video_id}.{transcript['language']}.json3")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(to_json3(transcript['segments']), f, ensure_ascii=False)
+        video_ids.append(video_id)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for video_id in video_ids:
+            step2.extract_transcript_info({'en': []}, video_id)
+    return size, time.perf_counter() - start
+
+
+def stage_write(scale, tmp):
+    import metadata_store
+    from step2 import clean_info_for_json, extract_video_info
+    from transcript_store import TranscriptStore
+
+    infos = load_metadata_fixtures()
+    transcripts = load_transcript_fixtures()
+    size = resolve_size('write', scale, len(infos))
+    metadata_dir = os.path.join(tmp, 'metadata')
+    os.makedirs(metadata_dir)
+
+    start = time.perf_counter()
+    with open(os.path.join(tmp, 'videos_detailed.csv'), 'w', newline='', encoding='utf-8-sig') as f, \
+            TranscriptStore(os.path.join(tmp, 'transcripts_all.jsonl')) as store:
+        writer = None
+        for info, record in zip(scaled(infos, size, 'id'), scaled(transcripts, size, 'video_id')):
+            row = extract_video_info(info)
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=row.keys())
+                writer.writeheader()
+            writer.writerow(row)
+            metadata_store.save_metadata(info, metadata_dir, info['id'], 'slim', clean=clean_info_for_json)
+            store.append(dict(record, video_id=info['id']))
+    return size, time.perf_counter() - start
+
+
+def stage_merge(scale, tmp):
+    from merge_transcripts import merge_to_csv
+
+    fixtures = load_transcript_fixtures()
+    size = resolve_size('merge', scale, len(fixtures))
+    input_path = os.path.join(tmp, 'transcripts_all.jsonl')
+    with open(input_path, 'w', encoding='utf-8') as f:
+        for record in scaled(fixtures, size, 'video_id'):
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    start = time.perf_counter()
+    merge_to_csv(input_path, os.path.join(tmp, 'merged_transcripts.csv'))
+    return size, time.perf_counter() - start
+
+
+def stage_warehouse(scale, tmp):
+    from fake_youtube_api import fake_channel_item, fake_video_item
+    from step1_search import parse_channel_item, parse_video_item
+    from warehouse import Warehouse
+
+    size = resolve_size('warehouse', scale, 0)
+    videos = [parse_video_item(fake_video_item(f"v{i:010d}")) for i in range(size)]
+    channels = [parse_channel_item(fake_channel_item(channel_id))
+                for channel_id in sorted({video['channel_id'] for video in videos})]
+
+    start = time.perf_counter()
+    with Warehouse(os.path.join(tmp, 'warehouse.sqlite')) as warehouse:
+        warehouse.load_videos(videos)
+        warehouse.load_channels(channels)
+        warehouse.channel_panel('2022-01-01', '2022-12-31')
+    return size, time.perf_counter() - start
+
+
+def stage_near_dups(scale, tmp):
+    from near_duplicates import NearDuplicateIndex
+
+    fixtures = load_transcript_fixtures()
+    size = resolve_size('near_dups', scale, len(fixtures))
+    input_path = os.path.join(tmp, 'transcripts_all.jsonl')
+    with open(input_path, 'w', encoding='utf-8') as f:
+        for record in scaled(fixtures, size, 'video_id'):
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    start = time.perf_counter()
+    index = NearDuplicateIndex(os.path.join(tmp, 'near_duplicates.sqlite'))
+    index.add_from_store(input_path, channel_map={})
+    index.write_clusters(os.path.join(tmp, 'near_duplicate_clusters.csv'))
+    index.close()
+    return size, time.perf_counter() - start
+
+
+def stage_similarity(scale, tmp):
+    from captions import iter_merged_words, pick_transcript
+    from similarity import SimilarityIndex
+
+    fixtures = load_transcript_fixtures()
+    size = resolve_size('similarity', scale, len(fixtures))
+    texts = []
+    for record in fixtures:
+        transcript = pick_transcript(record['transcripts'])
+        segments = transcript['segments'] if transcript else []
+        texts.append(' '.join(iter_merged_words(seg['text'] for seg in segments)))
+    # scaled() 按顺序循环复用样本，第 i 个视频的文本就是 texts[i % len(texts)]
+    documents = [(record['video_id'], f"ch{i % 500}", texts[i % len(texts)])
+                 for i, record in enumerate(scaled(fixtures, size, 'video_id'))]
+
+    start = time.perf_counter()
+    index = SimilarityIndex(os.path.join(tmp, 'similarity'))
+    index.add_documents(documents)
+    index.refresh()
+    for query in ('money printing', 'federal reserve interest rates', 'cost of living'):
+        index.query(query, 10)
+    index.similar_channels(index.channel_ids[0], 10)
+    return size, time.perf_counter() - start
+
+
+STAGE_FUNCS = {
+    'search': stage_search,
+    'details': stage_details,
+    'clean_info': stage_clean_info,
+    'transcripts': stage_transcripts,
+    'write': stage_write,
+    'merge': stage_merge,
+    'warehouse': stage_warehouse,
+    'near_dups': stage_near_dups,
+    'similarity': stage_similarity,
+}
+
+
+def run_stage(stage, scale):
+    """子进程里执行一个 阶段×规模，输出 JSON"""
+    with tempfile.TemporaryDirectory() as tmp:
+        items, seconds = STAGE_FUNCS[stage](scale, tmp)
+    maxrss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'items': items, 'seconds': seconds, 'maxrss_kb': maxrss_kb}))
+
+
+# ============================================================================
+# 汇总
+# ============================================================================
+
+def measure(stage, scale, repeat=1):
+    """重复 repeat 次：耗时取中位数（比最小值稳定，基线不会偏乐观），峰值RSS取最大值"""
+    runs = []
+    for _ in range(max(1, repeat)):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run', stage, scale],
+            check=True, capture_output=True, text=True, cwd=ROOT,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    result = sorted(runs, key=lambda run: run['seconds'])[len(runs) // 2]
+    result['maxrss_kb'] = max(run['maxrss_kb'] for run in runs)
+    seconds = max(result['seconds'], 1e-9)
+    return {
+        'items': result['items'],
+        'seconds': round(result['seconds'], 4),
+        'latency_ms': round(seconds / max(1, result['items']) * 1000, 4),
+        'throughput': round(result['items'] / seconds, 1),
+        'maxrss_mb': round(result['maxrss_kb'] / 1024, 1),
+    }
+
+
+def is_gated(scale, result, baseline):
+    """是否按容差判定退化：fixture 规模和太短的项只报告"""
+    if scale == 'fixture' or not baseline:
+        return False
+    return min(result['seconds'], baseline['seconds']) >= MIN_GATED_SECONDS
+
+
+def compare(result, baseline, tolerance):
+    """和基线比较，返回退化说明列表"""
+    problems = []
+    if not baseline:
+        return problems
+    if result['throughput'] < baseline['throughput'] * (1 - tolerance):
+        problems.append(f"吞吐量 {baseline['throughput']} -> {result['throughput']}/s")
+    if result['maxrss_mb'] > baseline['maxrss_mb'] * (1 + tolerance):
+        problems.append(f"峰值RSS {baseline['maxrss_mb']} -> {result['maxrss_mb']} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流水线基准测试')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--scales', nargs='+', default=list(DEFAULT_SCALES), help="fixture 或视频数")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果写入基线文件')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（取中位数）')
+    parser.add_argument('--run', nargs=2, metavar=('STAGE', 'SCALE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_stage(*args.run)
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'阶段':<12}{'规模':>9}{'数量':>9}{'耗时(s)':>10}{'延迟(ms)':>11}{'吞吐(/s)':>11}{'峰值RSS(MB)':>13}  对比基线")
+    for stage in args.stages:
+        for scale in args.scales:
+            key = f"{stage}@{scale}"
+            result = measure(stage, scale, args.repeat)
+            results[key] = result
+            problems = compare(result, baseline.get(key), args.tolerance)
+            if problems and is_gated(scale, result, baseline.get(key)):
+                regressions.append((key, problems))
+                status = '❌ ' + '；'.join(problems)
+            elif problems:
+                status = '⚠️  ' + '；'.join(problems) + '（规模太小，只报告）'
+            else:
+                status = '✅' if key in baseline else '—'
+            print(f"{stage:<12}{scale:>9}{result['items']:>9}{result['seconds']:>10.2f}{result['latency_ms']:>11.3f}"
+                  f"{result['throughput']:>11.1f}{result['maxrss_mb']:>13.1f}  {status}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\n💾 基线已保存: {args.baseline}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项退化（容差 {args.tolerance:.0%}）")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
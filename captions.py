@@ -0,0 +1,187 @@
+"""
+字幕解析：YouTube json3 格式 -> [{start_ms, end_ms, text}, ...]
+
+不依赖 yt-dlp，第二步、基准测试和合并脚本都可以直接使用
+"""
+
+import json
+
+# 和第二步下载字幕时的语言设置一致
+DEFAULT_LANGS = ('en', 'en-US', 'en-GB')
+
+
+def parse_json3(data, compact=False, stats=None):
+    """
+    解析 json3 字幕（dict、str 或 bytes 均可），返回 segments；不是 json3 格式时返回 None
+
+    Args:
+        compact: 边解析边用 compact_segments 压缩自动字幕的滚动/重叠片段
+        stats: compact=True 时传入 dict，累计压缩前后的片段数和字节数
+    """
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    if isinstance(data, str):
+        data = json.loads(data)
+    if 'events' not in data:
+        return None
+
+    segments = _iter_json3_segments(data['events'])
+    if compact:
+        return compact_segments(segments, stats=stats)
+    return list(segments)
+
+
+def _iter_json3_segments(events):
+    for event in events:
+        if 'segs' in event:
+            text = ''.join([seg.get('utf8', '') for seg in event['segs']])
+            start_ms = event.get('tStartMs', 0)
+            yield {
+                'start_ms': start_ms,
+                'end_ms': start_ms + event.get('dDurationMs', 0),
+                'text': text.strip()
+            }
+
+
+def _segment_size(segment):
+    """
+    片段紧凑JSON的字节数（用来统计压缩效果）：固定的键名和标点 + 两个数字 + 文本；
+    不算转义字符，比逐段 json.dumps 快得多
+    """
+    return (33 + len(str(segment['start_ms'])) + len(str(segment['end_ms']))
+            + len(segment['text'].encode('utf-8')))
+
+
+def trim_overlap(tail, words, min_overlap=2, window=32):
+    """
+    去掉自动字幕滚动显示造成的重复（compact_segments 和 iter_merged_words 共用）：
+    words 开头和 tail（最近输出的单词）结尾重叠的部分去掉，剩下的单词追加到 tail 并返回
+
+    Args:
+        tail: 最近输出的单词列表，原地更新，只保留最后 window 个
+        words: 新片段的单词列表
+        min_overlap: 至少重叠几个单词才当作滚动重复（避免误删 "very very" 这种正常重复）
+        window: 最多往回比较多少个单词
+    """
+    for k in range(min(len(words), len(tail)), min_overlap - 1, -1):
+        if tail[-k:] == words[:k]:
+            words = words[k:]
+            break
+    tail.extend(words)
+    if len(tail) > window:
+        del tail[:-window]
+    return words
+
+
+def compact_segments(segments, min_overlap=2, window=32, stats=None):
+    """
+    压缩自动字幕：YouTube 自动字幕的 json3 里每行会在相邻事件中重复出现、时间窗口互相重叠，
+    还夹着只有换行的空事件。一次遍历：
+
+    - 去掉空片段
+    - 新片段开头和已输出内容结尾重复的单词去掉（至少 min_overlap 个词，避免误删 "very very"）；
+      和上一段完全相同且时间重叠的片段只延长上一段的 end_ms
+    - 上一段的 end_ms 截到下一段的 start_ms，得到互不重叠的片段
+
+    片段内的空白规整为单个空格。人工字幕没有重叠，基本只会去掉空片段
+
+    Args:
+        segments: [{start_ms, end_ms, text}, ...] 的可迭代对象（按 start_ms 顺序）
+        window: 最多往回比较多少个单词
+        stats: 传入 dict 时累计 segments_before/segments_after/bytes_before/bytes_after
+
+    Returns:
+        压缩后的 segments 列表
+    """
+    compacted = []
+    last_words = []
+    tail = []
+    segments_before = bytes_before = 0
+
+    for segment in segments:
+        if stats is not None:
+            segments_before += 1
+            bytes_before += _segment_size(segment)
+
+        words = segment['text'].split()
+        if not words:
+            continue
+        start_ms, end_ms = segment['start_ms'], segment['end_ms']
+
+        if compacted:
+            last = compacted[-1]
+            if words == last_words and start_ms < last['end_ms']:
+                last['end_ms'] = max(last['end_ms'], end_ms)
+                continue
+
+        words = trim_overlap(tail, words, min_overlap, window)
+        if compacted:
+            if not words:
+                last['end_ms'] = max(last['end_ms'], end_ms)
+                continue
+            if last['end_ms'] > start_ms:
+                last['end_ms'] = max(last['start_ms'], start_ms)
+
+        compacted.append({'start_ms': start_ms, 'end_ms': end_ms, 'text': ' '.join(words)})
+        last_words = words
+
+    if stats is not None:
+        stats['segments_before'] = stats.get('segments_before', 0) + segments_before
+        stats['bytes_before'] = stats.get('bytes_before', 0) + bytes_before
+        stats['segments_after'] = stats.get('segments_after', 0) + len(compacted)
+        stats['bytes_after'] = stats.get('bytes_after', 0) + sum(map(_segment_size, compacted))
+    return compacted
+
+
+def format_compaction(stats):
+    """压缩统计 -> '243 → 121 段，18.2 KB → 9.0 KB（-51%）'"""
+    before, after = stats.get('bytes_before', 0), stats.get('bytes_after', 0)
+    saved = (1 - after / before) * 100 if before else 0
+    return (f"{stats.get('segments_before', 0)} → {stats.get('segments_after', 0)} 段，"
+            f"{before / 1024:.1f} KB → {after / 1024:.1f} KB（-{saved:.0f}%）")
+
+
+def select_caption_tracks(info, langs=DEFAULT_LANGS, ext='json3'):
+    """
+    按语言挑选字幕轨道：人工字幕优先，没有时用自动字幕（和 yt-dlp 的
+    writesubtitles + writeautomaticsub 行为一致）
+
+    Returns:
+        [(language, url), ...]
+    """
+    subtitles = info.get('subtitles') or {}
+    automatic = info.get('automatic_captions') or {}
+
+    tracks = []
+    for lang in langs:
+        for source in (subtitles, automatic):
+            url = next((t.get('url') for t in source.get(lang, []) if t.get('ext') == ext and t.get('url')), None)
+            if url:
+                tracks.append((lang, url))
+                break
+    return tracks
+
+
+def pick_transcript(transcripts, preferred=DEFAULT_LANGS):
+    """多条字幕轨道时按语言优先级选一条"""
+    if not transcripts:
+        return None
+    rank = {lang: i for i, lang in enumerate(preferred)}
+    return min(transcripts, key=lambda t: rank.get(t['language'], len(rank)))
+
+
+def iter_merged_words(texts, min_overlap=2, window=32):
+    """
+    把一串片段文本合并成单词流：一次遍历完成空白规整（换行、回车、多余空格），
+    同时去掉自动字幕滚动显示造成的重复——新片段开头和已输出内容结尾重叠的部分
+
+    Args:
+        texts: 片段文本的可迭代对象
+        min_overlap: 至少重叠几个单词才当作滚动重复（避免误删 "very very" 这种正常重复）
+        window: 最多往回比较多少个单词
+    """
+    tail = []
+    for text in texts:
+        words = text.split()
+        if words:
+            yield from trim_overlap(tail, words, min_overlap, window)
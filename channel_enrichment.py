@@ -0,0 +1,204 @@
+"""
+频道补全：yt-dlp 的观看页里没有频道简介、国家、外部链接等信息（step2.extract_channel_info 留空），
+这里按频道ID去重后用 channels().list 批量补上（每批 50 个，异步并发，走响应缓存）
+
+- 补全结果带 enriched_at 时间戳，和已有的 channels_detailed.csv 合并；
+  没超过 TTL 的频道直接沿用上次的结果，每个频道每个 TTL 内只请求一次
+- 批次按排序后的频道ID切分，同一组频道重跑时请求键不变，可以命中响应缓存
+- external_links / business_email：Data API 不返回频道页的“链接”栏，这里从完整简介里提取
+
+用法（补全已有的 channels_detailed.csv）:
+    python channel_enrichment.py
+"""
+
+import asyncio
+import csv
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import metrics
+from response_cache import ResponseCache
+from youtube_async import API_BASE_URL, AsyncYouTubeClient
+
+CHANNELS_CSV = os.path.join("youtube_downloads_test", "channels_detailed.csv")
+TTL_HOURS = 7 * 24  # 简介、国家等很少变化
+MAX_CONCURRENCY = 8
+PART = 'id,snippet,statistics,brandingSettings'
+
+# 补全（覆盖）的列
+ENRICHED_FIELDS = [
+    'description', 'country', 'external_links', 'business_email', 'published_at',
+    'subscriber_count', 'video_count', 'view_count', 'keywords', 'enriched_at',
+]
+
+URL_RE = re.compile(r'https?://[^\s<>"\'）)]+')
+EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def needs_enrichment(row, ttl_hours, now=None):
+    """没有 enriched_at 或已超过 TTL"""
+    enriched_at = row.get('enriched_at')
+    if not enriched_at:
+        return True
+    try:
+        enriched = datetime.fromisoformat(enriched_at)
+    except ValueError:
+        return True
+    if enriched.tzinfo is None:
+        enriched = enriched.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return now - enriched > timedelta(hours=ttl_hours)
+
+
+def parse_enrichment(item):
+    """把 channels().list 返回的 item 转成要补全的列"""
+    snippet = item.get('snippet', {})
+    statistics = item.get('statistics', {})
+    description = snippet.get('description', '')
+    links = list(dict.fromkeys(url.rstrip('.,;') for url in URL_RE.findall(description)))
+    emails = EMAIL_RE.findall(description)
+    return {
+        'description': description,
+        'country': snippet.get('country', ''),
+        'external_links': ' '.join(links),
+        'business_email': emails[0] if emails else '',
+        'published_at': snippet.get('publishedAt', ''),
+        'subscriber_count': statistics.get('subscriberCount', ''),
+        'video_count': statistics.get('videoCount', ''),
+        'view_count': statistics.get('viewCount', ''),
+        'keywords': item.get('brandingSettings', {}).get('channel', {}).get('keywords', ''),
+        'enriched_at': utc_now(),
+    }
+
+
+def load_previous(csv_path):
+    """读取上次的 channels_detailed.csv：{channel_id: 补全的列}（只取已补全过的行）"""
+    if not csv_path or not os.path.exists(csv_path):
+        return {}
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        return {
+            row['channel_id']: {field: row.get(field, '') for field in ENRICHED_FIELDS}
+            for row in csv.DictReader(f) if row.get('channel_id') and row.get('enriched_at')
+        }
+
+
+async def fetch_enrichment(channel_ids, api_key, base_url=API_BASE_URL, cache=None, max_concurrency=MAX_CONCURRENCY):
+    """
+    批量请求频道信息；某一批失败（配额用完、网络错误等）时只丢掉这一批，其他批次的结果照常返回
+
+    Returns:
+        ({channel_id: 补全的列}, client.quota_report(), 失败的频道数)
+    """
+    client = AsyncYouTubeClient(api_key, base_url=base_url, max_concurrency=max_concurrency, cache=cache)
+    ordered = sorted(set(channel_ids))
+    batches = [ordered[i:i + 50] for i in range(0, len(ordered), 50)]
+    pages = await asyncio.gather(*(client.list_channels(batch, part=PART) for batch in batches),
+                                 return_exceptions=True)
+    found = {}
+    failed = 0
+    for batch, page in zip(batches, pages):
+        if isinstance(page, Exception):
+            failed += len(batch)
+            print(f"  ❌ 频道补全失败（{len(batch)} 个频道）: {page}")
+            continue
+        for item in page:
+            found[item['id']] = parse_enrichment(item)
+    return found, client.quota_report(), failed
+
+
+def enrich_channels(channels, api_key, base_url=API_BASE_URL, previous_csv=None, ttl_hours=TTL_HOURS,
+                    cache=None, max_concurrency=MAX_CONCURRENCY):
+    """
+    补全 channels（{channel_id: 行}，原地修改）
+
+    Args:
+        previous_csv: 上次输出的 channels_detailed.csv，TTL 内的补全结果直接沿用
+        ttl_hours: 补全结果的有效期
+
+    Returns:
+        {'channels', 'reused', 'fetched', 'missing', 'failed', 'quota'}
+    """
+    previous = load_previous(previous_csv)
+    stale = []
+    reused = 0
+    for channel_id, row in channels.items():
+        old = previous.get(channel_id)
+        if old and not needs_enrichment(old, ttl_hours):
+            row.update(old)
+            reused += 1
+        else:
+            stale.append(channel_id)
+
+    found, quota, failed = {}, {}, 0
+    try:
+        if stale:
+            with metrics.stage('channel_enrichment'):
+                found, quota, failed = asyncio.run(
+                    fetch_enrichment(stale, api_key, base_url, cache, max_concurrency))
+            for channel_id in stale:
+                if channel_id in found:
+                    channels[channel_id].update(found[channel_id])
+                elif channel_id in previous:
+                    # 频道已删除/不可见或这一批请求失败时保留上次的结果
+                    channels[channel_id].update(previous[channel_id])
+    finally:
+        # 即使请求中途出错，所有行的列也保持一致（保存 CSV 时不会多出或缺少列）
+        for row in channels.values():
+            for field in ENRICHED_FIELDS:
+                row.setdefault(field, '')
+
+    missing = len(stale) - len(found) - failed
+    metrics.inc('channels_enriched', reused, result='reused')
+    metrics.inc('channels_enriched', len(found), result='fetched')
+    metrics.inc('channels_enriched', missing, result='missing')
+    metrics.inc('channels_enriched', failed, result='failed')
+    return {
+        'channels': len(channels),
+        'reused': reused,
+        'fetched': len(found),
+        'missing': missing,
+        'failed': failed,
+        'quota': sum(row['quota_units'] for row in quota.values()),
+    }
+
+
+def format_enrichment(stats):
+    failed = f"，请求失败 {stats['failed']} 个" if stats.get('failed') else ''
+    return (f"{stats['channels']} 个频道：沿用 {stats['reused']} 个，请求 {stats['fetched']} 个，"
+            f"未找到 {stats['missing']} 个{failed}（配额 {stats['quota']} 单位）")
+
+
+def main():
+    api_key = os.environ.get('YOUTUBE_API_KEY')
+    if not api_key:
+        from step1_search import YOUTUBE_API_KEY as api_key
+    if not os.path.exists(CHANNELS_CSV):
+        print(f"❌ 没有找到 {CHANNELS_CSV}，请先运行 step2.py")
+        return
+
+    with open(CHANNELS_CSV, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = [row for row in csv.DictReader(f) if row.get('channel_id')]
+    channels = {row['channel_id']: row for row in rows}
+
+    cache = ResponseCache()
+    stats = enrich_channels(channels, api_key, os.environ.get('YOUTUBE_API_BASE_URL', API_BASE_URL),
+                            previous_csv=CHANNELS_CSV, cache=cache)
+    cache.close()
+
+    fieldnames = list(rows[0].keys()) if rows else []
+    fieldnames += [field for field in ENRICHED_FIELDS if field not in fieldnames]
+    with open(CHANNELS_CSV, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(channels.values())
+    print(f"✅ 频道补全: {format_enrichment(stats)}")
+    print(f"💾 已更新: {CHANNELS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,733 @@
+"""
+分布式抓取协调器：多个 API Key 组成配额池，多个 worker 进程（或多台机器）从共享的任务队列里领任务
+
+SQLite 文件当作共享队列（多台机器时放在共享盘上，或换成真正的数据库），里面有:
+- tasks:       任务（search 一页 / videos 一批 / channels 一批），带租约（lease）和心跳
+- api_keys:    每个 Key 当天已用的配额（按太平洋时间零点重置，和 YouTube 一致），用完的 Key 当天不再分配
+- video_ids / channel_ids: 已发现的 ID，每个 ID 只进一次详情批次
+- videos / channels: 详情结果，merge 时写入数据仓库和 CSV
+
+任务流转:
+    search 页完成 → 新 video ID 入表、下一页入队、每凑满 50 个 ID 生成一个 videos 任务
+    videos 批完成 → 视频行入表、新频道入表、每凑满 50 个生成一个 channels 任务
+    上游任务都完成后，不满 50 个的尾巴也生成任务
+
+可靠性:
+- 领任务时生成 lease_id，执行中按 LEASE_SECONDS / 3 的间隔续约；worker 挂掉后租约过期，任务被别的 worker 领走
+- 完成任务时只有 lease_id 还对得上才写入结果（和生成下游任务在同一个事务里），
+  租约已经被别人接手的旧 worker 的结果直接丢弃，所以每个任务的结果只生效一次
+- merge 按主键 upsert，写入数据仓库后才标记 merged；中途中断重跑也不会重复
+
+用法:
+    python crawl_coordinator.py add-key key1 AIza... --quota 10000
+    python crawl_coordinator.py plan                  # 按 step1_search 的查询/时间切片配置生成搜索任务
+    python crawl_coordinator.py work --processes 4    # 可以在多台机器上同时运行
+    python crawl_coordinator.py status
+    python crawl_coordinator.py merge                 # 写入 warehouse.sqlite 和 videos.csv / channels.csv
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import metrics
+import step1_search
+from response_cache import ResponseCache
+from warehouse import Warehouse
+from youtube_async import QUOTA_COSTS, AsyncYouTubeClient, QuotaExceededError, YouTubeApiError
+
+QUEUE_DB = os.path.join(step1_search.OUTPUT_DIR, "crawl_queue.sqlite")
+DAILY_QUOTA = 10000  # 每个 Key 每天的默认配额
+LEASE_SECONDS = 120  # 租约时长，worker 超过这么久没有心跳就认为已经挂了
+MAX_ATTEMPTS = 5  # 同一个任务最多尝试几次，超过后标记为 failed
+POLL_SECONDS = 2.0  # 暂时没有可领的任务时，隔多久再看一次
+WORKER_CONCURRENCY = 4  # 每个 worker 进程同时执行的任务数
+BATCH_SIZE = 50  # videos / channels 一次最多 50 个 ID
+
+TASK_KINDS = ('search', 'videos', 'channels')
+
+# 任务状态
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:  # 没有时区数据时按太平洋标准时间
+    QUOTA_TZ = timezone(timedelta(hours=-8))
+
+
+class NoQuotaError(Exception):
+    """所有 Key 当天的配额都不够了"""
+
+
+def quota_day(now=None):
+    """配额所属的日期（太平洋时间）"""
+    return (now or datetime.now(timezone.utc)).astimezone(QUOTA_TZ).strftime('%Y-%m-%d')
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class CrawlCoordinator:
+    """
+    任务队列 + Key 池（同一个 SQLite 文件，多进程共用）
+
+    Args:
+        path: SQLite 文件路径
+        lease_seconds: 默认租约时长
+        max_attempts: 任务最多尝试次数
+    """
+
+    def __init__(self, path=QUEUE_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # isolation_level=None：事务由 _transaction() 显式控制（BEGIN IMMEDIATE 在多进程间互斥）
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                dedup_key TEXT UNIQUE,
+                state TEXT NOT NULL,
+                worker TEXT,
+                lease_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state, lease_expires);
+            CREATE TABLE IF NOT EXISTS api_keys (
+                label TEXT PRIMARY KEY,
+                api_key TEXT NOT NULL,
+                daily_quota INTEGER NOT NULL,
+                day TEXT,
+                used INTEGER NOT NULL DEFAULT 0,
+                exhausted_day TEXT
+            );
+            CREATE TABLE IF NOT EXISTS video_ids (
+                video_id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                rank INTEGER NOT NULL,
+                batched INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS channel_ids (
+                channel_id TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                batched INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                row TEXT NOT NULL,
+                merged INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS channels (
+                channel_id TEXT PRIMARY KEY,
+                row TEXT NOT NULL,
+                merged INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """进程内加锁 + BEGIN IMMEDIATE（拿到写锁后再读，多进程领任务不会冲突）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ------------------------------------------------------------------
+    # Key 池
+    # ------------------------------------------------------------------
+
+    def add_key(self, label, api_key, daily_quota=DAILY_QUOTA):
+        """添加或更新一个 Key（已用配额保留）"""
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO api_keys (label, api_key, daily_quota) VALUES (?, ?, ?)
+                ON CONFLICT(label) DO UPDATE SET api_key = excluded.api_key, daily_quota = excluded.daily_quota
+                """,
+                (label, api_key, daily_quota),
+            )
+
+    def reserve_quota(self, cost):
+        """
+        从剩余配额最多的 Key 预扣 cost 个单位
+
+        Returns:
+            (label, api_key)；所有 Key 都不够时抛出 NoQuotaError
+        """
+        today = quota_day()
+        with self._transaction() as conn:
+            conn.execute("UPDATE api_keys SET day = ?, used = 0 WHERE day IS NOT ?", (today, today))
+            row = conn.execute(
+                """
+                SELECT label, api_key FROM api_keys
+                WHERE used + ? <= daily_quota AND exhausted_day IS NOT ?
+                ORDER BY daily_quota - used DESC, label LIMIT 1
+                """,
+                (cost, today),
+            ).fetchone()
+            if row is None:
+                raise NoQuotaError(f"所有 Key 今天（{today}）剩余的配额都不足 {cost} 单位")
+            conn.execute("UPDATE api_keys SET used = used + ? WHERE label = ?", (cost, row[0]))
+        return row
+
+    def settle_quota(self, label, reserved, actual):
+        """按实际消耗（重试会多扣、命中缓存不扣）修正预扣的配额"""
+        if actual != reserved:
+            with self._transaction() as conn:
+                conn.execute("UPDATE api_keys SET used = MAX(0, used + ?) WHERE label = ?",
+                             (actual - reserved, label))
+
+    def mark_key_exhausted(self, label):
+        """API 返回 quotaExceeded：这个 Key 今天不再分配"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE api_keys SET exhausted_day = ? WHERE label = ?", (quota_day(), label))
+
+    def keys_report(self):
+        """[{label, daily_quota, used, exhausted}]（当天）"""
+        today = quota_day()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT label, daily_quota, day, used, exhausted_day FROM api_keys ORDER BY label"
+            ).fetchall()
+        return [
+            {'label': label, 'daily_quota': quota, 'used': used if day == today else 0,
+             'exhausted': exhausted == today}
+            for label, quota, day, used, exhausted in rows
+        ]
+
+    # ------------------------------------------------------------------
+    # 任务队列
+    # ------------------------------------------------------------------
+
+    def _insert_task(self, conn, kind, payload, dedup_key=None):
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO tasks (kind, payload, dedup_key, state, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (kind, json.dumps(payload, ensure_ascii=False), dedup_key, PENDING, datetime.now().isoformat()),
+        )
+
+    def plan_searches(self, searches, max_results, language='en'):
+        """
+        每个 查询×时间切片 生成第一页的搜索任务（重复调用不会重复生成）
+
+        Args:
+            searches: [(query, date_after, date_before), ...]，顺序决定视频的排列顺序
+        """
+        with self._transaction() as conn:
+            before = conn.total_changes
+            for position, (query, date_after, date_before) in enumerate(searches):
+                payload = {'query': query, 'date_after': date_after, 'date_before': date_before,
+                           'language': language, 'position': position, 'max_results': max_results,
+                           'page_token': None, 'fetched': 0}
+                self._insert_task(conn, 'search', payload, _search_key(payload))
+            return conn.total_changes - before
+
+    def claim(self, worker_id, lease_seconds=None, kinds=TASK_KINDS):
+        """
+        领一个任务：待执行的，或者租约已过期的（原 worker 没有心跳了）
+
+        Args:
+            kinds: 只领这几类任务（配额不够搜索时还可以继续做详情批次）
+
+        Returns:
+            {'task_id', 'kind', 'payload', 'lease_id', 'attempts'}，暂时没有可领的任务时返回 None
+        """
+        lease_seconds = lease_seconds or self.lease_seconds
+        now = time.time()
+        with self._transaction() as conn:
+            # 超过尝试次数的过期任务直接标记失败，不再分配
+            conn.execute(
+                "UPDATE tasks SET state = ?, error = COALESCE(error, '租约过期') "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts),
+            )
+            row = self._next_task(conn, now, kinds)
+            if row is None and self._flush_batches(conn):
+                row = self._next_task(conn, now, kinds)
+            if row is None:
+                return None
+
+            task_id, kind, payload, attempts = row
+            lease_id = uuid.uuid4().hex
+            conn.execute(
+                """
+                UPDATE tasks SET state = ?, worker = ?, lease_id = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE task_id = ?
+                """,
+                (LEASED, worker_id, lease_id, now + lease_seconds, datetime.now().isoformat(), task_id),
+            )
+        if attempts:
+            metrics.inc('crawl_tasks_reclaimed', kind=kind)
+        return {'task_id': task_id, 'kind': kind, 'payload': json.loads(payload),
+                'lease_id': lease_id, 'attempts': attempts + 1}
+
+    @staticmethod
+    def _next_task(conn, now, kinds):
+        # 先做搜索（新 ID 越早出来，详情批次越早凑满），同类任务按入队顺序
+        if not kinds:
+            return None
+        return conn.execute(
+            f"""
+            SELECT task_id, kind, payload, attempts FROM tasks
+            WHERE (state = ? OR (state = ? AND lease_expires < ?)) AND kind IN ({','.join('?' * len(kinds))})
+            ORDER BY CASE kind WHEN 'search' THEN 0 WHEN 'videos' THEN 1 ELSE 2 END, task_id
+            LIMIT 1
+            """,
+            (PENDING, LEASED, now, *kinds),
+        ).fetchone()
+
+    def heartbeat(self, task, lease_seconds=None):
+        """续约；租约已经被别的 worker 接手时返回 False"""
+        lease_seconds = lease_seconds or self.lease_seconds
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND lease_id = ? AND state = ?",
+                (time.time() + lease_seconds, task['task_id'], task['lease_id'], LEASED),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, task, error, count_attempt=True):
+        """
+        执行失败，放回队列（超过最多尝试次数时标记为 failed）
+
+        Args:
+            count_attempt: False 表示不是任务本身的问题（如 Key 配额用完），这次不计入尝试次数
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE tasks SET
+                    state = CASE WHEN ? AND attempts >= ? THEN ? ELSE ? END,
+                    attempts = attempts - ?, error = ?, lease_id = NULL, lease_expires = NULL, updated_at = ?
+                WHERE task_id = ? AND lease_id = ? AND state = ?
+                """,
+                (count_attempt, self.max_attempts, FAILED, PENDING, 0 if count_attempt else 1, str(error)[:500],
+                 datetime.now().isoformat(), task['task_id'], task['lease_id'], LEASED),
+            )
+
+    def complete(self, task, result):
+        """
+        提交任务结果：结果入表、生成下游任务、任务标记完成，在同一个事务里完成
+
+        Returns:
+            True；租约已经失效（任务被别的 worker 接手）时丢弃结果并返回 False
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE tasks SET state = ?, error = NULL, lease_id = NULL, lease_expires = NULL, updated_at = ?
+                WHERE task_id = ? AND lease_id = ? AND state = ?
+                """,
+                (DONE, datetime.now().isoformat(), task['task_id'], task['lease_id'], LEASED),
+            )
+            if cursor.rowcount != 1:
+                metrics.inc('crawl_results_discarded', kind=task['kind'])
+                return False
+            if task['kind'] == 'search':
+                self._apply_search(conn, task['payload'], result)
+            elif task['kind'] == 'videos':
+                self._apply_videos(conn, result)
+            else:
+                self._apply_channels(conn, result)
+        metrics.inc('crawl_tasks_done', kind=task['kind'])
+        return True
+
+    def _apply_search(self, conn, payload, result):
+        ids = result['ids']
+        seq = payload['fetched']
+        for offset, video_id in enumerate(ids):
+            conn.execute(
+                """
+                INSERT INTO video_ids (video_id, position, rank) VALUES (?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET position = excluded.position, rank = excluded.rank
+                WHERE (excluded.position, excluded.rank) < (position, rank)
+                """,
+                (video_id, payload['position'], seq + offset),
+            )
+        fetched = seq + len(ids)
+        if result.get('next_page_token') and ids and fetched < payload['max_results']:
+            next_payload = dict(payload, page_token=result['next_page_token'], fetched=fetched)
+            self._insert_task(conn, 'search', next_payload, _search_key(next_payload))
+        self._make_batches(conn, 'videos', force=False)
+
+    def _apply_videos(self, conn, rows):
+        for row in rows:
+            conn.execute(
+                """
+                INSERT INTO videos (video_id, row) VALUES (?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET row = excluded.row, merged = 0
+                """,
+                (row['video_id'], json.dumps(row, ensure_ascii=False)),
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO channel_ids (channel_id, seq) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM channel_ids))",
+                (row['channel_id'],),
+            )
+        self._make_batches(conn, 'channels', force=False)
+
+    def _apply_channels(self, conn, rows):
+        for row in rows:
+            conn.execute(
+                """
+                INSERT INTO channels (channel_id, row) VALUES (?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET row = excluded.row, merged = 0
+                """,
+                (row['channel_id'], json.dumps(row, ensure_ascii=False)),
+            )
+
+    def _make_batches(self, conn, kind, force):
+        """把还没进批次的 ID 每 50 个生成一个任务；force 时不满 50 个也生成"""
+        table, column, order = (('video_ids', 'video_id', 'position, rank') if kind == 'videos'
+                                else ('channel_ids', 'channel_id', 'seq'))
+        ids = [row[0] for row in conn.execute(
+            f"SELECT {column} FROM {table} WHERE batched = 0 ORDER BY {order}")]
+        made = 0
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            if len(batch) < BATCH_SIZE and not force:
+                break
+            self._insert_task(conn, kind, {'ids': batch})
+            conn.executemany(f"UPDATE {table} SET batched = 1 WHERE {column} = ?", [(i,) for i in batch])
+            made += 1
+        return made
+
+    def _flush_batches(self, conn):
+        """没有可领的任务时：上游都完成了，就把不满 50 个的尾巴也生成任务"""
+        open_kinds = {kind for kind, in conn.execute(
+            "SELECT DISTINCT kind FROM tasks WHERE state IN (?, ?)", (PENDING, LEASED))}
+        made = 0
+        if 'search' not in open_kinds:
+            made += self._make_batches(conn, 'videos', force=True)
+            if made or 'videos' in open_kinds:
+                return made
+            made += self._make_batches(conn, 'channels', force=True)
+        return made
+
+    def is_finished(self):
+        """没有待执行/执行中的任务，也没有待生成批次的 ID"""
+        with self._lock:
+            open_tasks = self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE state IN (?, ?)", (PENDING, LEASED)).fetchone()[0]
+            unbatched = sum(self._conn.execute(f"SELECT COUNT(*) FROM {table} WHERE batched = 0").fetchone()[0]
+                            for table in ('video_ids', 'channel_ids'))
+        return open_tasks == 0 and unbatched == 0
+
+    def summary(self):
+        """{'tasks': {kind: {state: 数量}}, 'videos', 'channels', 'unmerged'}"""
+        with self._lock:
+            tasks = {}
+            for kind, state, count in self._conn.execute(
+                    "SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state"):
+                tasks.setdefault(kind, {})[state] = count
+            counts = {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ('video_ids', 'videos', 'channels')}
+            unmerged = sum(self._conn.execute(f"SELECT COUNT(*) FROM {table} WHERE merged = 0").fetchone()[0]
+                           for table in ('videos', 'channels'))
+        return {'tasks': tasks, 'video_ids': counts['video_ids'], 'videos': counts['videos'],
+                'channels': counts['channels'], 'unmerged': unmerged}
+
+    def failures(self):
+        """[(task_id, kind, error), ...]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT task_id, kind, error FROM tasks WHERE state = ? ORDER BY task_id", (FAILED,)).fetchall()
+
+    # ------------------------------------------------------------------
+    # 合并结果
+    # ------------------------------------------------------------------
+
+    def results(self):
+        """全部视频（按搜索顺序）和频道（按首次出现顺序）的行"""
+        with self._lock:
+            videos = [json.loads(row) for row, in self._conn.execute(
+                "SELECT v.row FROM videos v LEFT JOIN video_ids i USING (video_id) ORDER BY i.position, i.rank")]
+            channels = [json.loads(row) for row, in self._conn.execute(
+                "SELECT c.row FROM channels c LEFT JOIN channel_ids i USING (channel_id) ORDER BY i.seq")]
+        return videos, channels
+
+    def merge(self, warehouse_path=None):
+        """
+        还没合并的视频/频道写入数据仓库（按主键 upsert），写入成功后再标记 merged
+
+        Returns:
+            (视频数, 频道数)
+        """
+        with self._lock:
+            videos = self._conn.execute("SELECT video_id, row FROM videos WHERE merged = 0").fetchall()
+            channels = self._conn.execute("SELECT channel_id, row FROM channels WHERE merged = 0").fetchall()
+        if not videos and not channels:
+            return 0, 0
+
+        with Warehouse(warehouse_path or step1_search.WAREHOUSE_PATH) as warehouse:
+            warehouse.load_videos([json.loads(row) for _, row in videos])
+            warehouse.load_channels([json.loads(row) for _, row in channels])
+
+        with self._transaction() as conn:
+            # 读出之后又被更新过的行（row 变了）留到下次合并
+            conn.executemany("UPDATE videos SET merged = 1 WHERE video_id = ? AND row = ?", videos)
+            conn.executemany("UPDATE channels SET merged = 1 WHERE channel_id = ? AND row = ?", channels)
+        return len(videos), len(channels)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _search_key(payload):
+    return json.dumps(['search', payload['query'], payload['date_after'], payload['date_before'],
+                       payload['language'], payload['page_token']], ensure_ascii=False)
+
+
+# ============================================================================
+# worker
+# ============================================================================
+
+async def execute_task(client, task):
+    """执行一个任务，返回要提交的结果"""
+    payload = task['payload']
+    if task['kind'] == 'search':
+        # 参数和 AsyncYouTubeClient.iter_search_pages 一致，响应缓存可以共用
+        params = {
+            'q': payload['query'],
+            'type': 'video',
+            'part': 'id',
+            'maxResults': min(50, payload['max_results'] - payload['fetched']),
+            'pageToken': payload['page_token'],
+            'relevanceLanguage': payload['language'],
+            'videoCaption': 'any',
+            'publishedAfter': payload['date_after'],
+            'publishedBefore': payload['date_before'],
+        }
+        response = await client.request('search', params)
+        ids = [item['id']['videoId'] for item in response.get('items', []) if item.get('id', {}).get('videoId')]
+        return {'ids': ids, 'next_page_token': response.get('nextPageToken')}
+    if task['kind'] == 'videos':
+        return [step1_search.parse_video_item(item) for item in await client.list_videos(payload['ids'])]
+    return [step1_search.parse_channel_item(item) for item in await client.list_channels(payload['ids'])]
+
+
+async def run_worker(coordinator, worker_id=None, base_url=None, cache=None, concurrency=WORKER_CONCURRENCY,
+                     lease_seconds=None, poll_seconds=POLL_SECONDS):
+    """
+    领任务 → 预扣配额 → 请求 → 提交，直到队列做完或所有 Key 的配额都用完
+
+    Returns:
+        {'done', 'failed', 'discarded', 'no_quota'}（no_quota: 因为配额不够停下，队列里还有任务）
+    """
+    worker_id = worker_id or default_worker_id()
+    base_url = base_url or step1_search.API_BASE
+    lease_seconds = lease_seconds or coordinator.lease_seconds
+    stats = {'done': 0, 'failed': 0, 'discarded': 0, 'no_quota': False}
+    blocked = set()  # 配额不够的任务类型（搜索 100 单位，详情只要 1 单位）
+
+    async def keep_alive(task):
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            if not coordinator.heartbeat(task, lease_seconds):
+                print(f"  ⚠️ 任务 {task['task_id']} 的租约已被接手，结果将被丢弃")
+                return
+
+    async def handle(task):
+        cost = QUOTA_COSTS.get(task['kind'], 1)
+        try:
+            label, api_key = coordinator.reserve_quota(cost)
+        except NoQuotaError as e:
+            coordinator.release(task, e, count_attempt=False)
+            blocked.add(task['kind'])
+            return
+
+        # 每个任务一个客户端：quota_used 只统计这个任务，方便按实际消耗结算
+        client = AsyncYouTubeClient(api_key, base_url=base_url, max_concurrency=1, cache=cache)
+        heartbeat = asyncio.create_task(keep_alive(task))
+        try:
+            with metrics.timer('crawl_task_seconds', kind=task['kind']):
+                result = await execute_task(client, task)
+        except QuotaExceededError as e:
+            print(f"  🔑 Key {label} 今天的配额已用完，换下一个")
+            coordinator.mark_key_exhausted(label)
+            coordinator.release(task, e, count_attempt=False)
+            return
+        except (YouTubeApiError, OSError, ValueError) as e:
+            print(f"  ❌ 任务 {task['task_id']} ({task['kind']}) 失败: {e}")
+            coordinator.release(task, e)
+            stats['failed'] += 1
+            return
+        finally:
+            heartbeat.cancel()
+            coordinator.settle_quota(label, cost, client.total_quota)
+
+        if coordinator.complete(task, result):
+            stats['done'] += 1
+        else:
+            stats['discarded'] += 1
+
+    running = set()
+    while True:
+        while len(running) < concurrency:
+            task = coordinator.claim(worker_id, lease_seconds, [kind for kind in TASK_KINDS if kind not in blocked])
+            if task is None:
+                break
+            running.add(asyncio.create_task(handle(task)))
+        if not running:
+            if blocked:
+                stats['no_quota'] = True
+                break
+            if coordinator.is_finished():
+                break
+            await asyncio.sleep(poll_seconds)  # 别的 worker 还在执行上游任务
+            continue
+        _, running = await asyncio.wait(running, timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+    return stats
+
+
+def worker_main(path, worker_id, base_url=None, concurrency=WORKER_CONCURRENCY, use_cache=True):
+    """一个 worker 进程"""
+    coordinator = CrawlCoordinator(path)
+    cache = ResponseCache() if use_cache else None
+    try:
+        stats = asyncio.run(run_worker(coordinator, worker_id, base_url, cache, concurrency))
+    finally:
+        if cache is not None:
+            cache.close()
+        coordinator.close()
+    print(f"✅ worker {worker_id}: 完成 {stats['done']} 个任务，失败 {stats['failed']} 次，"
+          f"丢弃 {stats['discarded']} 个过期结果" + ("（配额已用完）" if stats['no_quota'] else ""))
+    return stats
+
+
+# ============================================================================
+# 命令行
+# ============================================================================
+
+def configured_searches():
+    """按 step1_search 的配置生成 [(query, date_after, date_before), ...]"""
+    queries = step1_search.SEARCH_QUERIES or [step1_search.SEARCH_QUERY]
+    slices = step1_search.make_date_slices(step1_search.DATE_AFTER, step1_search.DATE_BEFORE,
+                                           step1_search.DATE_SLICE_DAYS)
+    return [(query, after, before) for query in queries for after, before in slices]
+
+
+def print_status(coordinator):
+    summary = coordinator.summary()
+    print(f"\n📋 任务队列: {coordinator.path}")
+    for kind in ('search', 'videos', 'channels'):
+        states = summary['tasks'].get(kind, {})
+        if states:
+            print(f"   {kind}: " + "，".join(f"{state} {count}" for state, count in sorted(states.items())))
+    print(f"   视频 ID {summary['video_ids']} 个，视频详情 {summary['videos']} 个，频道 {summary['channels']} 个，"
+          f"未合并 {summary['unmerged']} 行")
+    for key in coordinator.keys_report():
+        flag = '（今天已用完）' if key['exhausted'] else ''
+        print(f"   🔑 {key['label']}: {key['used']}/{key['daily_quota']} 单位{flag}")
+    for task_id, kind, error in coordinator.failures()[:10]:
+        print(f"   ❌ 任务 {task_id} ({kind}): {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多 Key、多进程的分布式抓取')
+    parser.add_argument('--db', default=QUEUE_DB, help='共享任务队列（SQLite）')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    add_key = sub.add_parser('add-key', help='添加 API Key')
+    add_key.add_argument('label')
+    add_key.add_argument('api_key')
+    add_key.add_argument('--quota', type=int, default=DAILY_QUOTA, help='每天的配额')
+
+    plan = sub.add_parser('plan', help='按 step1_search 的配置生成搜索任务')
+    plan.add_argument('--max-results', type=int, default=None, help='每个 查询×切片 最多取的结果数')
+
+    work = sub.add_parser('work', help='运行 worker')
+    work.add_argument('--processes', type=int, default=1)
+    work.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY, help='每个进程同时执行的任务数')
+    work.add_argument('--worker-id', default=None)
+    work.add_argument('--no-cache', action='store_true', help='不使用响应缓存')
+
+    sub.add_parser('status', help='查看进度和配额')
+    sub.add_parser('merge', help='结果写入数据仓库和 CSV')
+    args = parser.parse_args()
+
+    if os.path.dirname(args.db):
+        os.makedirs(os.path.dirname(args.db), exist_ok=True)
+    coordinator = CrawlCoordinator(args.db)
+    try:
+        if args.command == 'add-key':
+            coordinator.add_key(args.label, args.api_key, args.quota)
+            print(f"✅ 已添加 Key: {args.label}（每天 {args.quota} 单位）")
+
+        elif args.command == 'plan':
+            if not coordinator.keys_report():
+                # 没有配置 Key 池时用 step1_search 里的 Key
+                coordinator.add_key('default', step1_search.YOUTUBE_API_KEY)
+            max_results = args.max_results or (step1_search.MAX_RESULTS_PER_SEARCH if step1_search.SEARCH_QUERIES
+                                               else step1_search.MAX_RESULTS)
+            searches = configured_searches()
+            added = coordinator.plan_searches(searches, max_results, step1_search.LANGUAGE)
+            print(f"✅ {len(searches)} 个搜索，新加入 {added} 个任务")
+
+        elif args.command == 'work':
+            worker_id = args.worker_id or default_worker_id()
+            if args.processes <= 1:
+                worker_main(args.db, worker_id, concurrency=args.concurrency, use_cache=not args.no_cache)
+            else:
+                processes = [
+                    multiprocessing.Process(target=worker_main, args=(args.db, f"{worker_id}-{i}"),
+                                            kwargs={'concurrency': args.concurrency,
+                                                    'use_cache': not args.no_cache})
+                    for i in range(args.processes)
+                ]
+                for process in processes:
+                    process.start()
+                for process in processes:
+                    process.join()
+            print_status(coordinator)
+
+        elif args.command == 'status':
+            print_status(coordinator)
+
+        elif args.command == 'merge':
+            videos, channels = coordinator.merge()
+            print(f"🗃️  数据仓库: 合并 {videos} 个视频、{channels} 个频道")
+            videos_data, channels_data = coordinator.results()
+            existing_videos = step1_search.load_csv_index(step1_search.VIDEOS_CSV, 'video_id')
+            existing_channels = step1_search.load_csv_index(step1_search.CHANNELS_CSV, 'channel_id')
+            step1_search.save_to_csv(step1_search.upsert_rows(existing_videos, videos_data, 'video_id'),
+                                     step1_search.VIDEOS_CSV, step1_search.VIDEO_FIELDS)
+            step1_search.save_to_csv(step1_search.upsert_rows(existing_channels, channels_data, 'channel_id'),
+                                     step1_search.CHANNELS_CSV, step1_search.CHANNEL_FIELDS)
+    finally:
+        coordinator.close()
+
+
+if __name__ == "__main__":
+    main()
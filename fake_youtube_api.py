@@ -0,0 +1,185 @@
+"""
+本地假 YouTube Data API 服务器，用来离线测试 youtube_async 和第一步的流程
+
+用法:
+    python fake_youtube_api.py --port 8765
+    YOUTUBE_API_BASE_URL=http://127.0.0.1:8765 python step1_search.py
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from youtube_async import QUOTA_COSTS
+
+
+def _fake_id(prefix, *parts, length=11):
+    digest = hashlib.md5('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return (prefix + digest)[:length]
+
+
+def fake_video_item(video_id):
+    """生成一个确定性的 videos().list item"""
+    n = int(hashlib.md5(video_id.encode('utf-8')).hexdigest()[:8], 16)
+    channel_id = 'UC' + _fake_id('', 'channel', n % 97, length=22)
+    return {
+        'id': video_id,
+        'snippet': {
+            'channelId': channel_id,
+            'channelTitle': f'Channel {n % 97}',
+            'title': f'Fake video {video_id}',
+            'description': 'inflation explained ' * 5,
+            'publishedAt': '2022-%02d-%02dT12:00:00Z' % (n % 12 + 1, n % 28 + 1),
+            'tags': ['inflation', 'economy'],
+            'categoryId': '27',
+            'defaultAudioLanguage': 'en',
+        },
+        'contentDetails': {
+            'duration': 'PT%dM%dS' % (n % 30 + 1, n % 60),
+            'definition': 'hd',
+            'caption': 'true',
+        },
+        'statistics': {
+            'viewCount': str(n % 1000000),
+            'likeCount': str(n % 10000),
+            'commentCount': str(n % 1000),
+        },
+    }
+
+
+def fake_channel_item(channel_id):
+    """生成一个确定性的 channels().list item"""
+    n = int(hashlib.md5(channel_id.encode('utf-8')).hexdigest()[:8], 16)
+    return {
+        'id': channel_id,
+        'snippet': {
+            'title': f'Channel {channel_id[-4:]}',
+            'customUrl': f'@channel{n % 10000}',
+            'description': f'Business inquiries: contact{n % 100}@example.com https://example.com/{n % 100}',
+            'country': 'US',
+            'publishedAt': '2015-01-01T00:00:00Z',
+        },
+        'statistics': {
+            'subscriberCount': str(n % 5000000),
+            'videoCount': str(n % 2000),
+            'viewCount': str(n % 900000000),
+        },
+        'brandingSettings': {'channel': {'keywords': 'finance economy'}},
+    }
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeYouTube/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').split('/')[-1]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        server = self.server
+
+        with server.lock:
+            server.request_counts[endpoint] += 1
+            count = sum(server.request_counts.values())
+            cost = QUOTA_COSTS.get(endpoint, 1)
+            over_quota = server.quota_limit and server.quota_used + cost > server.quota_limit
+            if over_quota:
+                server.rejected[endpoint] += 1
+            else:
+                server.quota_used += cost  # 被限流的请求也计配额，和真实 API 一样
+        if over_quota:
+            self._send(403, {'error': {'code': 403, 'message': 'quota exceeded',
+                                       'errors': [{'reason': 'quotaExceeded'}]}})
+            return
+        if server.throttle_every and count % server.throttle_every == 0:
+            self._send(server.throttle_status, {'error': {'code': server.throttle_status, 'message': 'slow down',
+                                                          'errors': [{'reason': 'rateLimitExceeded'}]}})
+            return
+
+        if endpoint == 'search':
+            self._send(200, self._search(params))
+        elif endpoint == 'videos':
+            ids = [i for i in params.get('id', '').split(',') if i]
+            self._send(200, {'items': [fake_video_item(i) for i in ids]})
+        elif endpoint == 'channels':
+            ids = [i for i in params.get('id', '').split(',') if i]
+            self._send(200, {'items': [fake_channel_item(i) for i in ids]})
+        else:
+            self._send(404, {'error': {'code': 404, 'message': 'not found', 'errors': [{'reason': 'notFound'}]}})
+
+    def _search(self, params):
+        start = int(params.get('pageToken') or 0)  # pageToken 是下一页的起始位置，最后一页 maxResults 可能变小
+        per_page = int(params.get('maxResults', 5))
+        window = (params.get('q', ''), params.get('publishedAfter', ''), params.get('publishedBefore', ''))
+        total = self.server.results_per_query
+        ids = [_fake_id('', *window, i) for i in range(start, min(total, start + per_page))]
+        response = {'items': [{'id': {'kind': 'youtube#video', 'videoId': i}} for i in ids]}
+        if start + per_page < total:
+            response['nextPageToken'] = str(start + per_page)
+        return response
+
+
+def start_fake_server(port=0, results_per_query=120, throttle_every=0, throttle_status=429, quota_limit=0):
+    """
+    在后台线程启动假服务器，返回 (server, base_url)；用完调用 server.shutdown()
+
+    server.request_counts 是每种调用收到的请求数，server.quota_used 是已扣的配额单位，
+    server.rejected 是因配额用完被拒的请求数
+
+    Args:
+        port: 端口，0 表示随机
+        results_per_query: 每个查询（query + 时间窗口）最多返回多少个视频
+        throttle_every: 每 N 个请求返回一次限流错误（reason 为 rateLimitExceeded），0 表示不限流
+        throttle_status: 限流错误的 HTTP 状态码，429 或 403
+        quota_limit: 配额上限（单位），用完后返回 403 quotaExceeded；0 表示不限
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeYouTubeHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.request_counts = Counter()
+    server.results_per_query = results_per_query
+    server.throttle_every = throttle_every
+    server.throttle_status = throttle_status
+    server.quota_limit = quota_limit
+    server.quota_used = 0
+    server.rejected = Counter()
+
+    server.thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server.thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地假 YouTube Data API 服务器')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--results', type=int, default=120, help='每个查询返回的视频数')
+    parser.add_argument('--throttle-every', type=int, default=0, help='每 N 个请求返回一次限流错误')
+    parser.add_argument('--throttle-status', type=int, default=429, choices=(429, 403), help='限流错误的状态码')
+    parser.add_argument('--quota', type=int, default=0, help='配额上限（单位），0 表示不限')
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(args.port, args.results, args.throttle_every,
+                                         args.throttle_status, args.quota)
+    print(f"🧪 假 API 已启动: {base_url}  (Ctrl+C 退出)")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+第二步的任务状态账本（SQLite），记录每个视频处理到了哪一步，支持断点续跑
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+
+# 状态按完成程度排序：后面的状态包含前面的
+PENDING = 'pending'
+METADATA_DONE = 'metadata_done'
+SUBTITLES_DONE = 'subtitles_done'
+VIDEO_DONE = 'video_done'
+FAILED = 'failed'
+MEDIA_FAILED = 'media_failed'  # 元数据和字幕已完成，只有视频文件下载失败，重新运行只重试下载
+NO_SUBTITLES = 'no_subtitles'  # 仅字幕模式：视频没有可用字幕，是终态，重新运行不再抓取
+
+STATE_RANK = {
+    FAILED: -1,
+    NO_SUBTITLES: 0,  # 不算完成了任何一步（完整模式下照常处理）
+    PENDING: 0,
+    METADATA_DONE: 1,
+    SUBTITLES_DONE: 2,
+    MEDIA_FAILED: 2,
+    VIDEO_DONE: 3,
+}
+
+
+class JobLedger:
+    """
+    每个视频一行：video_id, state, reason, attempts, updated_at
+
+    Args:
+        path: SQLite 文件路径（一般放在 OUTPUT_DIR 下）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                video_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                reason TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, video_id):
+        """返回视频当前状态，没有记录时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM jobs WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, video_id, target_state):
+        """视频是否已经完成到 target_state（失败的不算完成）"""
+        state = self.get(video_id)
+        return state is not None and STATE_RANK[state] >= STATE_RANK[target_state]
+
+    def start(self, video_id):
+        """开始一次尝试：状态置为 pending，尝试次数 +1"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (video_id, state, reason, attempts, updated_at)
+                VALUES (?, ?, NULL, 1, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    state = excluded.state, reason = NULL,
+                    attempts = attempts + 1, updated_at = excluded.updated_at
+                """,
+                (video_id, PENDING, now),
+            )
+            self._conn.commit()
+
+    def mark(self, video_id, state, reason=None):
+        """更新视频状态；失败时记录原因"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (video_id, state, reason, attempts, updated_at)
+                VALUES (?, ?, ?, 0, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    state = excluded.state, reason = excluded.reason,
+                    updated_at = excluded.updated_at
+                """,
+                (video_id, state, reason, now),
+            )
+            self._conn.commit()
+
+    def fail(self, video_id, reason):
+        self.mark(video_id, FAILED, reason)
+
+    def media_fail(self, video_id, reason):
+        """视频文件下载失败：不回退元数据和字幕的进度"""
+        self.mark(video_id, MEDIA_FAILED, reason)
+
+    def summary(self):
+        """按状态统计数量"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+    def in_state(self, state):
+        """返回处于 state 的视频ID集合"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM jobs WHERE state = ?", (state,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def failures(self):
+        """返回 [(video_id, reason), ...]（含只有视频下载失败的）"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT video_id, reason FROM jobs WHERE state IN (?, ?) ORDER BY video_id",
+                (FAILED, MEDIA_FAILED),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,318 @@
+"""
+媒体下载队列：和元数据/字幕阶段解耦，单独的线程池在后台下载视频文件
+
+- 并发数单独设置（MediaQueue(workers=...)）
+- 全局带宽上限：所有下载线程共用一个令牌桶（每个字节一个令牌），在 yt-dlp 的进度回调里扣减
+- 断点续传：输出文件名固定，yt-dlp 保留 .part 文件并在下次运行时接着下载；
+  选好的画质记在 <video_dir>/.media_quality，续传时不会因为预算变化换成别的格式
+- 按存储预算选画质：剩余预算 / 剩余视频数 = 每个视频的份额，选估算大小不超过份额的最高画质；
+  预算和去重由 media_store.MediaStore 管理，下载前按估算大小预留，超出预算的视频不下载
+"""
+
+import os
+import queue
+import threading
+
+import yt_dlp
+
+import job_ledger
+import metrics
+from job_ledger import JobLedger
+from media_store import BudgetExceededError
+from rate_limiter import TokenBucket
+
+# 从高到低尝试的画质（视频高度）
+QUALITY_LADDER = (2160, 1440, 1080, 720, 480, 360, 240)
+
+QUALITY_FILE = '.media_quality'
+
+
+def parse_quality(quality):
+    """'best' -> None（不限），'720p' -> 720"""
+    if quality in (None, 'best'):
+        return None
+    return int(str(quality).rstrip('p'))
+
+
+def format_selector(max_height=None):
+    """yt-dlp 格式选择：优先 mp4 视频 + m4a 音频，max_height 为 None 时不限高度"""
+    if max_height is None:
+        return 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/bestvideo+bestaudio/best'
+    h = max_height
+    return (f'bestvideo[ext=mp4][height<={h}]+bestaudio[ext=m4a]/best[ext=mp4][height<={h}]/'
+            f'bestvideo[height<={h}]+bestaudio/best[height<={h}]/best')
+
+
+def _format_size(fmt, duration):
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if not size and fmt.get('tbr') and duration:
+        size = fmt['tbr'] * 1000 / 8 * duration  # tbr 单位是 kbit/s
+    return size or 0
+
+
+def estimate_size(info, max_height=None):
+    """
+    按 format_selector 的规则估算下载大小（字节）：不超过 max_height 的最好 mp4 视频 + 最好的 m4a 音频
+
+    格式里没有大小时用 tbr × 时长估算；完全没有可用格式时返回 None
+    """
+    formats = info.get('formats') or []
+    duration = info.get('duration') or 0
+
+    def fits(fmt):
+        return max_height is None or (fmt.get('height') or 0) <= max_height
+
+    videos = [f for f in formats if f.get('vcodec') not in (None, 'none') and f.get('acodec') == 'none'
+              and f.get('ext') == 'mp4' and fits(f)]
+    audios = [f for f in formats if f.get('acodec') not in (None, 'none') and f.get('vcodec') == 'none'
+              and f.get('ext') == 'm4a']
+    if videos and audios:
+        video = max(videos, key=lambda f: ((f.get('height') or 0), f.get('tbr') or 0))
+        audio = max(audios, key=lambda f: f.get('tbr') or 0)
+        return _format_size(video, duration) + _format_size(audio, duration)
+
+    muxed = [f for f in formats if f.get('vcodec') not in (None, 'none') and f.get('acodec') not in (None, 'none')
+             and fits(f)]
+    if muxed:
+        return _format_size(max(muxed, key=lambda f: ((f.get('height') or 0), f.get('tbr') or 0)), duration)
+    return None
+
+
+def pick_quality(info, share_bytes=None, max_height=None):
+    """
+    在 max_height 以内选估算大小不超过 share_bytes 的最高画质；都超出时用估算最小的一档
+
+    Returns:
+        最大高度（None 表示不限）
+    """
+    if share_bytes is None:
+        return max_height
+    candidates = [h for h in QUALITY_LADDER if max_height is None or h <= max_height]
+    if max_height is None:
+        candidates.insert(0, None)
+    sizes = [(height, estimate_size(info, height)) for height in candidates]
+    sizes = [(height, size) for height, size in sizes if size is not None]
+    for height, size in sizes:
+        if size <= share_bytes:
+            return height
+    return min(sizes, key=lambda item: (item[1], item[0] or float('inf')))[0] if sizes else max_height
+
+
+def progress_hook(bucket=None):
+    """
+    yt-dlp 进度回调：统计新下载的字节数；传入 bucket 时按字节从令牌桶取令牌（阻塞当前下载线程）
+    """
+    last = {}
+
+    def hook(progress):
+        if progress.get('status') != 'downloading':
+            return
+        key = progress.get('filename')
+        downloaded = progress.get('downloaded_bytes') or 0
+        # 续传时第一次回调的字节数包含 .part 里已有的部分，只作为起点
+        delta = downloaded - last.get(key, downloaded)
+        last[key] = downloaded
+        if delta <= 0:
+            return
+        metrics.inc('bytes_downloaded', delta, source='media')
+        while bucket and delta > 0:
+            take = min(delta, bucket.capacity)
+            metrics.sleep('bandwidth', bucket.acquire(take))
+            delta -= take
+
+    return hook
+
+
+def extract_raw_info(ydl, video_id):
+    """默认的观看页解析（process=False），step2 会换成带缓存的版本"""
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    with metrics.timer('ytdlp_call_seconds', op='watch'):
+        return ydl.sanitize_info(ydl.extract_info(url, download=False, process=False))
+
+
+class MediaQueue:
+    """
+    后台媒体下载队列
+
+    Args:
+        videos_dir: 视频目录，每个视频一个子目录 <videos_dir>/<id>/<id>.mp4
+        workers: 同时下载的视频数
+        rate_limit: 所有下载合计的带宽上限（字节/秒），None 表示不限
+        max_quality: 画质上限（'best' 或 '1080p'、'720p' 等）
+        expected: 预计入队的视频总数，用来在入队完成之前分配预算
+        ledger_path: 任务账本路径，下载完成标记 VIDEO_DONE，失败标记 MEDIA_FAILED（不回退字幕进度）
+        extract_info: (ydl, video_id) -> 未处理的 info，默认 extract_raw_info
+        store: media_store.MediaStore，负责存储预算、去重和大小索引；None 时不限预算
+    """
+
+    def __init__(self, videos_dir, workers=2, rate_limit=None, max_quality='best',
+                 expected=None, ledger_path=None, extract_info=extract_raw_info, store=None):
+        self.videos_dir = videos_dir
+        self.workers = max(1, workers)
+        self.store = store
+        self.max_height = parse_quality(max_quality)
+        self.expected = expected
+        self.extract_info = extract_info
+        self.bucket = TokenBucket(rate_limit, rate_limit) if rate_limit else None
+        self.ledger = JobLedger(ledger_path) if ledger_path else None
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._seen = set()
+        self._active = set()
+        self.enqueued = 0
+        self.finished = 0
+        self.stats = {'done': 0, 'skipped': 0, 'failed': 0, 'over_budget': 0, 'linked': 0, 'bytes': 0}
+
+    def video_path(self, video_id):
+        return os.path.join(self.videos_dir, video_id, f"{video_id}.mp4")
+
+    def start(self):
+        os.makedirs(self.videos_dir, exist_ok=True)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"media-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def put(self, video_id):
+        """入队（同一个视频只入队一次），立即返回"""
+        with self._lock:
+            if video_id in self._seen:
+                return
+            self._seen.add(video_id)
+            self.enqueued += 1
+        self._queue.put(video_id)
+
+    def pending(self):
+        """还没下载完的视频数（含正在下载的）"""
+        with self._lock:
+            return self.enqueued - self.finished
+
+    def join(self):
+        """不再入队，等待所有下载完成；返回统计"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.ledger:
+            self.ledger.close()
+            self.ledger = None
+        return dict(self.stats)
+
+    def _share(self):
+        """当前每个视频可用的预算份额（字节）"""
+        available = self.store.available_bytes() if self.store else None
+        if available is None:
+            return None
+        with self._lock:
+            # 正在下载的视频已经预留过空间，不再参与分配
+            remaining_videos = max(1, max(self.expected or 0, self.enqueued) - self.finished - len(self._active))
+            return available / remaining_videos
+
+    def _choose_height(self, video_dir, info):
+        """续传时沿用上次选的画质，否则按预算重新选"""
+        quality_file = os.path.join(video_dir, QUALITY_FILE)
+        if os.path.exists(quality_file):
+            with open(quality_file, 'r', encoding='utf-8') as f:
+                return parse_quality(f.read().strip())
+
+        height = pick_quality(info, self._share(), self.max_height)
+        with open(quality_file, 'w', encoding='utf-8') as f:
+            f.write(f"{height}p" if height else 'best')
+        return height
+
+    def _worker(self):
+        while True:
+            video_id = self._queue.get()
+            if video_id is None:
+                return
+            try:
+                result = self._download(video_id)
+            except BudgetExceededError as e:
+                result = None
+                print(f"  💾 [媒体] {video_id} 超出存储预算，跳过: {e}")
+                with self._lock:
+                    self.stats['over_budget'] += 1
+                metrics.inc('media_videos', result='over_budget')
+                if self.ledger:
+                    self.ledger.media_fail(video_id, f"超出存储预算: {e}")
+            except Exception as e:
+                result = None
+                print(f"  ❌ [媒体] {video_id} 下载失败: {e}")
+                with self._lock:
+                    self.stats['failed'] += 1
+                metrics.inc('media_videos', result='failed')
+                if self.ledger:
+                    self.ledger.media_fail(video_id, f"视频下载失败: {type(e).__name__}: {e}")
+            with self._lock:
+                self.finished += 1
+                self._active.discard(video_id)
+            if self.store:
+                self.store.release(video_id)
+            if result:
+                height, size, linked = result
+                print(f"  🎬 [媒体] {video_id}: {f'{height}p' if height else 'best'}，{size / 1024 ** 2:.1f} MB"
+                      f"{'（和已有文件相同，已硬链接）' if linked else ''}（剩余 {self.pending()} 个）")
+
+    def _download(self, video_id):
+        if os.path.exists(self.video_path(video_id)):
+            with self._lock:
+                self.stats['skipped'] += 1
+            if self.store and video_id not in self.store:
+                self.store.add(video_id, self.video_path(video_id))
+            if self.ledger:
+                self.ledger.mark(video_id, job_ledger.VIDEO_DONE)
+            return
+
+        video_dir = os.path.join(self.videos_dir, video_id)
+        os.makedirs(video_dir, exist_ok=True)
+        ydl_opts = {
+            'outtmpl': os.path.join(video_dir, '%(id)s.%(ext)s'),
+            'merge_output_format': 'mp4',
+            'continuedl': True,  # 接着 .part 文件下载
+            'nopart': False,
+            'retries': 10,
+            'fragment_retries': 10,
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'progress_hooks': [progress_hook(self.bucket)],
+        }
+
+        # 先解析观看页选画质，格式选择器在 YoutubeDL 初始化时就确定了，所以下载用另一个实例
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as probe:
+            info = self.extract_info(probe, video_id)
+        height = self._choose_height(video_dir, info)
+        if self.store:
+            try:
+                self.store.reserve(video_id, estimate_size(info, height))
+            except BudgetExceededError:
+                # 预算以后可能调大，不要记住这次的画质
+                os.remove(os.path.join(video_dir, QUALITY_FILE))
+                raise
+        with self._lock:
+            self._active.add(video_id)
+        ydl_opts['format'] = format_selector(height)
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl, metrics.timer('ytdlp_call_seconds', op='media_download'):
+            ydl.process_ie_result(info, download=True)
+
+        if not os.path.exists(self.video_path(video_id)):
+            raise RuntimeError("视频文件未生成")
+
+        if self.store:
+            size, linked = self.store.add(video_id, self.video_path(video_id))
+        else:
+            size, linked = os.path.getsize(self.video_path(video_id)), False
+        with self._lock:
+            self.stats['done'] += 1
+            self.stats['linked'] += linked
+            self.stats['bytes'] += size
+        metrics.inc('media_videos', result='linked' if linked else 'done')
+        os.remove(os.path.join(video_dir, QUALITY_FILE))
+        if self.ledger:
+            self.ledger.mark(video_id, job_ledger.VIDEO_DONE)
+        return height, size, linked
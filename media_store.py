@@ -0,0 +1,231 @@
+"""
+视频文件存储：存储预算 + 按内容哈希去重（硬链接）+ 大小索引（SQLite）
+
+- 下载前 reserve(video_id, 预估字节数)：已用 + 已预留 + 预估 超过预算时拒绝
+- 下载后 add(video_id, path)：计算 sha256，和已有文件内容相同时删掉新文件、改成指向已有文件的硬链接
+- 已用空间按不同内容计算（硬链接只占一份），统计直接查索引，不用遍历目录
+
+用法:
+    python media_store.py stats
+    python media_store.py sync      # 把索引里没有的已有 mp4 登记进来（旧目录迁移用）
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+VIDEOS_DIR = os.path.join("youtube_downloads_test", "videos")
+INDEX_PATH = os.path.join("youtube_downloads_test", "media_index.sqlite")
+
+HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BudgetExceededError(Exception):
+    """预留空间会超出存储预算"""
+
+
+class MediaStore:
+    """
+    线程安全（媒体队列的多个下载线程共用一个实例）
+
+    Args:
+        videos_dir: 视频目录，<videos_dir>/<id>/<id>.mp4
+        index_path: SQLite 索引路径
+        budget_bytes: 存储预算（字节），None 表示不限
+    """
+
+    def __init__(self, videos_dir=VIDEOS_DIR, index_path=INDEX_PATH, budget_bytes=None):
+        self.videos_dir = videos_dir
+        self.budget_bytes = budget_bytes
+        self._reserved = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                video_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                linked INTEGER NOT NULL DEFAULT 0,
+                added_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256);
+            """
+        )
+        self._conn.commit()
+
+    def video_path(self, video_id):
+        return os.path.join(self.videos_dir, video_id, f"{video_id}.mp4")
+
+    def __contains__(self, video_id):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM files WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    def _used_bytes(self):
+        """不同内容的总大小（调用方持有锁）"""
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT size FROM files GROUP BY sha256)"
+        ).fetchone()[0]
+
+    @property
+    def used_bytes(self):
+        with self._lock:
+            return self._used_bytes()
+
+    @property
+    def reserved_bytes(self):
+        with self._lock:
+            return sum(self._reserved.values())
+
+    def available_bytes(self):
+        """预算里还能用的字节数（扣除正在下载的预留）；不限预算时返回 None"""
+        if self.budget_bytes is None:
+            return None
+        with self._lock:
+            return max(0, self.budget_bytes - self._used_bytes() - sum(self._reserved.values()))
+
+    def reserve(self, video_id, estimated_bytes):
+        """
+        下载前预留空间；超出预算时抛出 BudgetExceededError
+
+        预估未知（None）时按 0 处理，只检查预算是否已经用完
+        """
+        estimated_bytes = int(estimated_bytes or 0)
+        with self._lock:
+            if self.budget_bytes is not None:
+                used = self._used_bytes() + sum(self._reserved.values())
+                if used + estimated_bytes > self.budget_bytes or used >= self.budget_bytes:
+                    raise BudgetExceededError(
+                        f"需要 {estimated_bytes / 1024 ** 2:.0f} MB，预算剩余 "
+                        f"{max(0, self.budget_bytes - used) / 1024 ** 2:.0f} MB"
+                    )
+            self._reserved[video_id] = estimated_bytes
+
+    def release(self, video_id):
+        """下载结束（成功或失败）后释放预留"""
+        with self._lock:
+            self._reserved.pop(video_id, None)
+
+    def add(self, video_id, path=None):
+        """
+        登记下载好的文件；内容和已有文件相同时替换成硬链接
+
+        Returns:
+            (size, linked)：文件大小，是否和已有文件去重
+        """
+        path = path or self.video_path(video_id)
+        size = os.path.getsize(path)
+        sha256 = file_sha256(path)
+
+        with self._lock:
+            linked = False
+            rows = self._conn.execute(
+                "SELECT path FROM files WHERE sha256 = ? AND video_id != ?", (sha256, video_id)
+            ).fetchall()
+            for (existing,) in rows:
+                if not os.path.exists(existing) or os.path.samefile(existing, path):
+                    continue
+                tmp_path = f"{path}.link"
+                try:
+                    os.link(existing, tmp_path)
+                    os.replace(tmp_path, path)
+                    linked = True
+                except OSError:
+                    # 文件系统不支持硬链接时保留原文件
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                break
+
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO files (video_id, path, sha256, size, linked, added_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (video_id, path, sha256, size, int(linked), datetime.now().isoformat()),
+            )
+            self._conn.commit()
+            self._reserved.pop(video_id, None)
+        return size, linked
+
+    def remove(self, video_id):
+        """删除文件和索引记录（硬链接的其他视频不受影响）"""
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM files WHERE video_id = ?", (video_id,)).fetchone()
+            if row is None:
+                return False
+            if os.path.exists(row[0]):
+                os.remove(row[0])
+            self._conn.execute("DELETE FROM files WHERE video_id = ?", (video_id,))
+            self._conn.commit()
+        return True
+
+    def sync(self):
+        """登记目录里已有、但索引里没有的 <id>/<id>.mp4；返回新登记的数量"""
+        added = 0
+        if not os.path.isdir(self.videos_dir):
+            return added
+        for video_id in sorted(os.listdir(self.videos_dir)):
+            path = self.video_path(video_id)
+            if os.path.isfile(path) and video_id not in self:
+                self.add(video_id, path)
+                added += 1
+        return added
+
+    def summary(self):
+        """
+        Returns:
+            {'files', 'unique_files', 'logical_bytes', 'used_bytes', 'saved_bytes', 'budget_bytes'}
+        """
+        with self._lock:
+            files, unique_files, logical_bytes = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sha256), COALESCE(SUM(size), 0) FROM files"
+            ).fetchone()
+            used_bytes = self._used_bytes()
+        return {
+            'files': files,
+            'unique_files': unique_files,
+            'logical_bytes': logical_bytes,
+            'used_bytes': used_bytes,
+            'saved_bytes': logical_bytes - used_bytes,
+            'budget_bytes': self.budget_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    store = MediaStore()
+    if len(sys.argv) >= 2 and sys.argv[1] == 'sync':
+        print(f"✅ 新登记 {store.sync()} 个视频文件")
+    if len(sys.argv) >= 2 and sys.argv[1] in ('stats', 'sync'):
+        stats = store.summary()
+        print(f"📦 {stats['files']} 个视频，{stats['unique_files']} 个不同文件")
+        print(f"   占用 {stats['used_bytes'] / 1024 ** 3:.2f} GB，"
+              f"硬链接去重节省 {stats['saved_bytes'] / 1024 ** 3:.2f} GB")
+    else:
+        print(__doc__)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+合并字幕：按视频把片段文本合并成一整段，输出固定列的 merged_transcripts.csv
+
+逐个视频流式读取字幕存储、流式写CSV，内存占用和视频数量无关
+（替代 合并字幕.ipynb 里的循环）
+
+用法:
+    python merge_transcripts.py [--input transcripts_all.jsonl] [--output merged_transcripts.csv] [--all-tracks]
+                                [--skip-near-duplicates]
+"""
+
+import argparse
+import csv
+import os
+import time
+
+from captions import iter_merged_words, pick_transcript
+from transcript_store import iter_transcripts
+
+TRANSCRIPTS_JSONL = os.path.join("youtube_downloads_test", "transcripts_all.jsonl")
+MERGED_CSV = "merged_transcripts.csv"
+
+MERGED_FIELDS = ['video_id', 'language', 'segment_count', 'word_count', 'full_transcript']
+
+
+def merge_record(record, all_tracks=False):
+    """
+    合并一个视频的字幕，返回一行 MERGED_FIELDS；没有字幕时返回 None
+
+    Args:
+        all_tracks: False 时只用优先语言的一条轨道（多条英文轨道内容基本相同）；
+            True 时和原来的 notebook 一样把所有轨道拼在一起
+    """
+    transcripts = record['transcripts']
+    if not all_tracks:
+        transcript = pick_transcript(transcripts)
+        transcripts = [transcript] if transcript else []
+    if not transcripts:
+        return None
+
+    segment_count = sum(len(t['segments']) for t in transcripts)
+    words = list(iter_merged_words(seg['text'] for t in transcripts for seg in t['segments']))
+    if not words:
+        return None
+
+    return {
+        'video_id': record['video_id'],
+        'language': '|'.join(t['language'] for t in transcripts),
+        'segment_count': segment_count,
+        'word_count': len(words),
+        'full_transcript': ' '.join(words),
+    }
+
+
+def iter_merged(records, all_tracks=False):
+    """逐个生成合并后的行"""
+    for record in records:
+        row = merge_record(record, all_tracks)
+        if row:
+            yield row
+
+
+def merge_to_csv(transcripts_path=TRANSCRIPTS_JSONL, output_path=MERGED_CSV, all_tracks=False, skip_ids=None):
+    """
+    流式合并并写出CSV
+
+    Args:
+        skip_ids: 跳过的视频（如 near_duplicates 找到的冗余视频）
+
+    Returns:
+        写出的视频数
+    """
+    count = 0
+    records = iter_transcripts(transcripts_path)
+    if skip_ids:
+        records = (record for record in records if record['video_id'] not in skip_ids)
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MERGED_FIELDS)
+        writer.writeheader()
+        for row in iter_merged(records, all_tracks):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def load_merged_ids(output_path=MERGED_CSV):
+    """已经写进合并CSV的视频（文件可能带 BOM，用 utf-8-sig 读）"""
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, 'r', encoding='utf-8-sig', newline='') as f:
+        return {row['video_id'] for row in csv.DictReader(f) if row.get('video_id')}
+
+
+def prepare_for_append(output_path=MERGED_CSV, transcripts_path=TRANSCRIPTS_JSONL):
+    """
+    追加写入前检查已有的合并CSV，返回其中已有的 video IDs
+
+    - 列和 MERGED_FIELDS 不一致（比如 合并字幕.ipynb 输出的旧格式）时，原文件改名为 *.legacy.csv 保留，
+      再用 merge_to_csv 从字幕存储重新生成
+    - 末尾没有换行时补上，否则追加的第一行会接在最后一行后面
+    """
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return set()
+
+    with open(output_path, 'r', encoding='utf-8-sig', newline='') as f:
+        header = next(csv.reader(f), [])
+    if header != MERGED_FIELDS:
+        legacy_path = os.path.splitext(output_path)[0] + '.legacy.csv'
+        os.replace(output_path, legacy_path)
+        print(f"⚠️  {output_path} 的列和 MERGED_FIELDS 不一致，已改名为 {legacy_path}，从字幕存储重新生成")
+        if os.path.exists(transcripts_path):
+            merge_to_csv(transcripts_path, output_path)
+        return load_merged_ids(output_path)
+
+    with open(output_path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\r\n')  # 和 csv 模块的行结束符一致
+    return load_merged_ids(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按视频合并字幕')
+    parser.add_argument('--input', default=TRANSCRIPTS_JSONL, help='字幕存储 (.jsonl)')
+    parser.add_argument('--output', default=MERGED_CSV, help='输出CSV')
+    parser.add_argument('--all-tracks', action='store_true', help='合并所有字幕轨道（默认只用一条）')
+    parser.add_argument('--skip-near-duplicates', action='store_true',
+                        help='跳过 near_duplicates.py 找到的冗余视频（每个重复簇只保留代表视频）')
+    args = parser.parse_args()
+
+    skip_ids = None
+    if args.skip_near_duplicates:
+        from near_duplicates import NearDuplicateIndex
+
+        index = NearDuplicateIndex()
+        skip_ids = index.redundant_ids()
+        index.close()
+        print(f"🔁 跳过 {len(skip_ids)} 个近似重复的视频")
+
+    start = time.perf_counter()
+    count = merge_to_csv(args.input, args.output, args.all_tracks, skip_ids)
+    print(f"已成功保存到 {args.output}")
+    print(f"总共处理了 {count} 个视频（{time.perf_counter() - start:.1f}s）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+yt-dlp 元数据的保存/读取
+
+三种模式:
+    full:  和以前一样，保存清理后的完整 info（<id>_full.json，最大，约 600 KB/视频）
+    slim:  只保留 SLIM_FIELDS 里的字段（<id>_meta.json，几 KB/视频）
+    split: 轻量部分存 <id>_meta.json，formats / automatic_captions 等大字段
+           单独 gzip 压缩存 <id>_heavy.json.gz，需要时再合并读取
+"""
+
+import gzip
+import json
+import os
+
+# 体积大、分析时很少用到的子树
+HEAVY_FIELDS = (
+    'formats',
+    'automatic_captions',
+    'subtitles',
+    'thumbnails',
+    'requested_downloads',
+    'requested_formats',
+    'requested_subtitles',
+    'heatmap',
+    '_format_sort_fields',
+)
+
+# slim 模式保留的字段（覆盖 step2 的 extract_video_info / extract_channel_info 用到的所有字段）
+SLIM_FIELDS = (
+    # IDs & timestamps
+    'id', 'channel_id', 'upload_date', 'timestamp', 'release_timestamp', 'release_year', 'epoch',
+    # Textual metadata
+    'title', 'fulltitle', 'description', 'tags', 'categories', 'language', 'chapters',
+    # Channel
+    'channel', 'channel_url', 'channel_follower_count', 'uploader', 'uploader_id', 'uploader_url',
+    # Duration/format（最终选择的格式）
+    'duration', 'duration_string', 'format', 'format_id', 'ext', 'resolution', 'width', 'height',
+    'fps', 'vcodec', 'acodec', 'filesize', 'filesize_approx', 'dynamic_range', 'aspect_ratio',
+    # Content rating / status
+    'age_limit', 'is_live', 'was_live', 'live_status', 'availability', 'playable_in_embed',
+    # Statistics
+    'view_count', 'like_count', 'comment_count', 'average_rating',
+    # Additional
+    'thumbnail', 'webpage_url', 'original_url',
+)
+
+# 字幕字典在 slim 模式下只保留 {语言: [格式...]}
+CAPTION_FIELDS = ('subtitles', 'automatic_captions')
+
+MODES = ('full', 'slim', 'split')
+
+
+def summarize_captions(captions):
+    """{lang: [{ext, url, ...}]} -> {lang: [ext, ...]}"""
+    if not captions:
+        return {}
+    return {
+        lang: [track.get('ext') for track in tracks if isinstance(track, dict)]
+        for lang, tracks in captions.items()
+    }
+
+
+def project_info(info, fields=SLIM_FIELDS):
+    """只保留 fields 里的字段，字幕字典压缩成语言列表"""
+    projected = {key: info[key] for key in fields if key in info}
+    for key in CAPTION_FIELDS:
+        if key in info:
+            projected[key] = summarize_captions(info[key])
+    return projected
+
+
+def split_info(info, heavy_fields=HEAVY_FIELDS):
+    """拆成 (轻量部分, 大字段部分)"""
+    light = {k: v for k, v in info.items() if k not in heavy_fields}
+    heavy = {k: info[k] for k in heavy_fields if k in info}
+    for key in CAPTION_FIELDS:
+        if key in info:
+            light[key] = summarize_captions(info[key])
+    return light, heavy
+
+
+def meta_path(metadata_dir, video_id):
+    return os.path.join(metadata_dir, f"{video_id}_meta.json")
+
+
+def full_path(metadata_dir, video_id):
+    return os.path.join(metadata_dir, f"{video_id}_full.json")
+
+
+def heavy_path(metadata_dir, video_id):
+    return os.path.join(metadata_dir, f"{video_id}_heavy.json.gz")
+
+
+def _dump(data, path, indent):
+    separators = (',', ':') if indent is None else None
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent, separators=separators)
+
+
+def save_metadata(info, metadata_dir, video_id, mode='slim', indent=None, fields=SLIM_FIELDS, clean=None):
+    """
+    按模式保存元数据，返回写入的文件列表
+
+    Args:
+        info: yt-dlp 返回的 info
+        mode: 'full' / 'slim' / 'split'
+        indent: JSON 缩进，None 表示紧凑格式（无空格）
+        fields: slim 模式保留的字段
+        clean: 清理不可序列化对象的函数（如 step2.clean_info_for_json），在投影之后调用
+    """
+    if mode not in MODES:
+        raise ValueError(f"未知的元数据模式: {mode}，可选 {MODES}")
+    clean = clean or (lambda value: value)
+
+    if mode == 'full':
+        path = full_path(metadata_dir, video_id)
+        _dump(clean(info), path, indent)
+        return [path]
+
+    if mode == 'slim':
+        path = meta_path(metadata_dir, video_id)
+        _dump(clean(project_info(info, fields)), path, indent)
+        return [path]
+
+    light, heavy = split_info(info)
+    light_file = meta_path(metadata_dir, video_id)
+    heavy_file = heavy_path(metadata_dir, video_id)
+    _dump(clean(light), light_file, indent)
+    with gzip.open(heavy_file, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(clean(heavy), f, ensure_ascii=False, separators=(',', ':'))
+    return [light_file, heavy_file]
+
+
+def load_metadata(metadata_dir, video_id, include_heavy=False, mode='slim'):
+    """
+    读取保存的元数据：先读当前模式写的文件（full 模式是 _full.json，其他是 _meta.json），
+    不存在或损坏（写到一半被杀）时再读另一个；都读不了时返回 None
+
+    Args:
+        include_heavy: split 模式下把 _heavy.json.gz 里的大字段合并回来
+        mode: 保存时用的模式（见 MODES）
+    """
+    meta_file = meta_path(metadata_dir, video_id)
+    paths = [meta_file, full_path(metadata_dir, video_id)]
+    if mode == 'full':
+        paths.reverse()
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        heavy_file = heavy_path(metadata_dir, video_id)
+        if include_heavy and path == meta_file and os.path.exists(heavy_file):
+            with gzip.open(heavy_file, 'rt', encoding='utf-8') as f:
+                info.update(json.load(f))
+        return info
+    return None
@@ -0,0 +1,268 @@
+"""
+运行指标：计数器、耗时直方图、等待时间统计，运行结束时写出报告（JSON / CSV / Prometheus textfile）
+
+进程内一个全局的 REGISTRY（线程安全），各模块直接调用模块级函数:
+
+    metrics.inc('api_retries', endpoint='search')
+    with metrics.timer('api_call_seconds', endpoint='videos'):
+        ...
+    metrics.sleep('rate_limit', waited)        # 限速/退避等主动等待的时间
+    with metrics.stage('search'):              # 阶段墙钟时间
+        ...
+    metrics.write_report('run_report.json', csv_path='run_report.csv', prom_path='step2.prom')
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 耗时直方图的桶（秒），和 Prometheus 的默认桶类似，上限放宽到几分钟（视频下载）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, float('inf'))
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """按桶线性插值估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.quantile(0.5), 6),
+            'p90': round(self.quantile(0.9), 6),
+            'p99': round(self.quantile(0.99), 6),
+            'max': round(self.max, 6),
+        }
+
+
+class Metrics:
+    """
+    counters:   {(名字, 标签): 数值}
+    histograms: {(名字, 标签): Histogram}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters = {}
+            self.histograms = {}
+            self.stages = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录代码块耗时；抛出异常时带上 status=error 标签"""
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, status=status, **labels)
+
+    def sleep(self, reason, seconds, **labels):
+        """主动等待（限速、退避、带宽限制）的时间，单独统计以区分“在等”还是“在干活”"""
+        if seconds > 0:
+            self.inc('sleep_seconds', seconds, reason=reason, **labels)
+
+    @contextmanager
+    def stage(self, name):
+        """阶段的墙钟时间（同名阶段累加）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def snapshot(self):
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': round(value, 6)}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                dict({'name': name, 'labels': dict(labels)}, **histogram.snapshot())
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+            stages = {name: round(seconds, 3) for name, seconds in self.stages.items()}
+            wall = time.time() - self.started
+            sleep_total = sum(v for (name, _), v in self.counters.items() if name == 'sleep_seconds')
+        return {
+            'started_at': datetime.fromtimestamp(self.started).isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'wall_seconds': round(wall, 3),
+            'sleep_seconds': round(sleep_total, 3),
+            'stages': stages,
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def prometheus_text(self, prefix='yt_pipeline'):
+        """Prometheus textfile 格式（node_exporter textfile collector）"""
+        def fmt_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ''
+            return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{prefix}_{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{fmt_labels(labels)} {value}")
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{metric}_bucket{fmt_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{metric}_sum{fmt_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{fmt_labels(labels)} {histogram.count}")
+
+            metric = f"{prefix}_stage_seconds"
+            if self.stages:
+                lines.append(f"# TYPE {metric} gauge")
+            for name, seconds in sorted(self.stages.items()):
+                lines.append(f"{metric}{fmt_labels([('stage', name)])} {seconds}")
+            lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+            lines.append(f"{prefix}_last_run_timestamp_seconds {time.time()}")
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, json_path, csv_path=None, prom_path=None, extra=None):
+        """
+        写出运行报告
+
+        Args:
+            json_path: 完整报告（JSON）
+            csv_path: 扁平的 metric,labels,stat,value 表，方便用表格软件比较多次运行
+            prom_path: Prometheus textfile（先写临时文件再改名，避免 collector 读到一半）
+            extra: 合并进 JSON 报告的其他字段（如配置）
+        """
+        report = self.snapshot()
+        if extra:
+            report.update(extra)
+        for path in (json_path, csv_path, prom_path):
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        if csv_path:
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['metric', 'labels', 'stat', 'value'])
+                writer.writerow(['wall_seconds', '', 'value', report['wall_seconds']])
+                writer.writerow(['sleep_seconds', '', 'value', report['sleep_seconds']])
+                for name, seconds in report['stages'].items():
+                    writer.writerow(['stage_seconds', f"stage={name}", 'value', seconds])
+                for counter in report['counters']:
+                    writer.writerow([counter['name'], _labels_str(counter['labels']), 'value', counter['value']])
+                for histogram in report['histograms']:
+                    for stat in ('count', 'sum', 'mean', 'p50', 'p90', 'p99', 'max'):
+                        writer.writerow([histogram['name'], _labels_str(histogram['labels']), stat, histogram[stat]])
+
+        if prom_path:
+            tmp_path = f"{prom_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, prom_path)
+        return report
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_str(labels):
+    return ';'.join(f"{k}={v}" for k, v in sorted(labels.items()))
+
+
+REGISTRY = Metrics()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+sleep = REGISTRY.sleep
+stage = REGISTRY.stage
+snapshot = REGISTRY.snapshot
+write_report = REGISTRY.write_report
+reset = REGISTRY.reset
+
+
+def print_summary(report, top=8):
+    """在终端打印报告里最重要的几项"""
+    wall = report['wall_seconds'] or 1e-9
+    print(f"\n⏱️  运行 {wall:.1f}s，其中主动等待 {report['sleep_seconds']:.1f}s（累计，多线程时可能超过墙钟时间）")
+    for name, seconds in report['stages'].items():
+        print(f"   阶段 {name}: {seconds:.1f}s")
+    histograms = sorted(report['histograms'], key=lambda h: h['sum'], reverse=True)[:top]
+    for h in histograms:
+        labels = _labels_str(h['labels'])
+        print(f"   {h['name']}[{labels}]: {h['count']} 次，合计 {h['sum']:.1f}s，"
+              f"p50 {h['p50'] * 1000:.0f} ms，p99 {h['p99'] * 1000:.0f} ms")
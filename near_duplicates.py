@@ -0,0 +1,428 @@
+"""
+字幕近似重复检测（MinHash + LSH）：找出同一段讲话被重新上传、转载的视频，分析和存储时可以跳过
+
+- 每个视频取一条字幕轨道（captions.pick_transcript），片段文本合并成单词流（去掉自动字幕的滚动重复），
+  转小写后取连续 SHINGLE_SIZE 个单词作为一个 shingle，哈希成 64 位整数；
+  不足 MIN_WORDS 个单词的视频（只有 [Music] 之类）不加入，否则它们的 shingle 几乎一样，会被并成一个大簇
+- MinHash 签名：NUM_PERM 个 multiply-shift 哈希函数，对所有 shingle 向量化取最小值（uint32[NUM_PERM]）
+- LSH：签名切成 bands × rows，任意一个 band 完全相同的视频才成为候选，再用签名估计 Jaccard 相似度确认，
+  不需要两两比较；bands/rows 按 THRESHOLD 自动选择（误报和漏报的加权面积最小）
+- 签名、桶、确认的重复对都存在 SQLite 里，新视频增量加入；重复对用并查集合成簇，
+  簇里最早加入的视频作为代表，其余视频是可以跳过的冗余视频
+
+用法:
+    python near_duplicates.py build                        # 从 transcripts_all.jsonl 增量加入
+    python near_duplicates.py clusters                     # 输出 near_duplicate_clusters.csv
+    python near_duplicates.py check VIDEO_ID
+    python merge_transcripts.py --skip-near-duplicates     # 合并字幕时跳过冗余视频
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+
+from captions import iter_merged_words, pick_transcript
+from transcript_index import load_channel_map
+from transcript_store import iter_transcripts
+
+TRANSCRIPTS_JSONL = os.path.join("youtube_downloads_test", "transcripts_all.jsonl")
+INDEX_DB = os.path.join("youtube_downloads_test", "near_duplicates.sqlite")
+CLUSTERS_CSV = os.path.join("youtube_downloads_test", "near_duplicate_clusters.csv")
+
+SHINGLE_SIZE = 5  # 每个 shingle 的单词数
+NUM_PERM = 128  # MinHash 签名长度
+THRESHOLD = 0.8  # Jaccard 相似度达到多少算近似重复
+SEED = 1  # 哈希函数的随机种子（改了之后旧签名不能再用）
+# 选择 bands/rows 时误报的权重：候选会再用签名确认，误报只多花一点比较时间，漏报就找不回来了
+FALSE_POSITIVE_WEIGHT = 0.1
+MIN_WORDS = 50  # 单词数少于这个的视频不参与检测
+BATCH_SIZE = 500  # 每批提交一次
+SQL_CHUNK = 900  # IN (...) 每次最多带多少个参数（SQLite 默认上限 999）
+
+CLUSTER_FIELDS = ['cluster_id', 'video_id', 'canonical_video_id', 'is_canonical', 'similarity',
+                  'channel_id', 'word_count']
+
+WORD_RE = re.compile(r"\w+(?:'\w+)*")
+_MASK32 = np.uint64(0xFFFFFFFF)
+_word_hashes = {}
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _mix64(x):
+    """splitmix64 的收尾混合，让多项式组合出来的值分布均匀（uint64 数组，溢出即取模）"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def tokenize(transcripts):
+    """
+    字幕轨道列表（step2.extract_transcript_info 的输出） -> 小写单词列表
+    """
+    transcript = pick_transcript(transcripts)
+    if transcript is None:
+        return []
+    words = iter_merged_words(seg['text'] for seg in transcript['segments'])
+    return WORD_RE.findall(' '.join(words).lower())
+
+
+def shingle_hashes(words, size=SHINGLE_SIZE):
+    """连续 size 个单词一组，返回去重后的 uint64 哈希数组（单词数不足 size 时整段作为一个 shingle）"""
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    ids = []
+    for word in words:
+        h = _word_hashes.get(word)
+        if h is None:
+            h = _word_hashes[word] = _hash64(word.encode('utf-8'))
+        ids.append(h)
+    ids = np.array(ids, dtype=np.uint64)
+    size = min(size, len(ids))
+
+    # 多项式组合：h = w[i] * P^(size-1) + ... + w[i+size-1]
+    count = len(ids) - size + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    prime = np.uint64(0x100000001B3)
+    with np.errstate(over='ignore'):
+        for offset in range(size):
+            combined = combined * prime + ids[offset:offset + count]
+        return np.unique(_mix64(combined))
+
+
+class MinHasher:
+    """
+    NUM_PERM 个 multiply-shift 哈希函数 h_i(x) = (a_i * x + b_i) >> 32（a_i 为奇数，uint64 溢出即取模）
+
+    Args:
+        num_perm: 签名长度
+        seed: 随机种子，同一个索引里必须保持不变
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes, chunk=4096):
+        """shingle 哈希 -> uint32[num_perm]；分块计算，长字幕也不会占用太多内存"""
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        with np.errstate(over='ignore'):
+            for start in range(0, len(hashes), chunk):
+                block = hashes[start:start + chunk, None] * self.a + self.b
+                values = (block >> np.uint64(32)) & _MASK32
+                np.minimum(signature, values.min(axis=0).astype(np.uint32), out=signature)
+        return signature
+
+
+def lsh_params(threshold, num_perm, false_positive_weight=FALSE_POSITIVE_WEIGHT):
+    """
+    选择 (bands, rows)：候选概率 1 - (1 - s^rows)^bands 在 s < threshold 的面积（误报）
+    和 s >= threshold 的缺口面积（漏报）加权和最小
+    """
+    s = np.linspace(0, 1, 1001)
+    below = s < threshold
+    best, best_error = None, None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            p = 1 - (1 - s ** rows) ** bands
+            false_positive = p[below].mean() * threshold
+            false_negative = (1 - p[~below]).mean() * (1 - threshold)
+            error = false_positive_weight * false_positive + (1 - false_positive_weight) * false_negative
+            if best_error is None or error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Args:
+        path: SQLite 文件路径
+        threshold: 近似重复的 Jaccard 阈值（只影响新加入的视频；bands/rows 在第一次建库时确定）
+        min_words: 单词数少于这个的视频不加入
+    """
+
+    def __init__(self, path=INDEX_DB, threshold=THRESHOLD, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=SEED,
+                 min_words=MIN_WORDS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS signatures (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_id TEXT NOT NULL UNIQUE,
+                channel_id TEXT,
+                word_count INTEGER NOT NULL,
+                signature BLOB NOT NULL,
+                added_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                video_id TEXT NOT NULL,
+                PRIMARY KEY (band, bucket, video_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS pairs (
+                video_a TEXT NOT NULL,
+                video_b TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                PRIMARY KEY (video_a, video_b)
+            );
+            """
+        )
+        # 参数写进库里：哈希函数或分段方式变了，旧签名和桶就对不上了
+        params = {'num_perm': num_perm, 'shingle_size': shingle_size, 'seed': seed}
+        stored = dict(self._conn.execute("SELECT key, value FROM meta"))
+        if not stored:
+            bands, rows = lsh_params(threshold, num_perm)
+            params.update(bands=bands, rows=rows)
+            self._conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                   [(k, str(v)) for k, v in params.items()])
+            self._conn.commit()
+            stored = {k: str(v) for k, v in params.items()}
+        for key, value in params.items():
+            if stored[key] != str(value):
+                raise ValueError(f"{path} 是用 {key}={stored[key]} 建的，和当前的 {value} 不一致")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.bands = int(stored['bands'])
+        self.rows = int(stored['rows'])
+        self.hasher = MinHasher(num_perm, seed)
+
+    def __contains__(self, video_id):
+        row = self._conn.execute("SELECT 1 FROM signatures WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def _band_keys(self, signature):
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            keys.append((band, _hash64(chunk.tobytes()) - 2 ** 63))  # 转成 SQLite 的有符号 64 位整数
+        return keys
+
+    def _select_signatures(self, columns, video_ids):
+        """按 video_id 分块查询 signatures 表，逐行生成 (video_id, *columns)"""
+        video_ids = list(video_ids)
+        for start in range(0, len(video_ids), SQL_CHUNK):
+            chunk = video_ids[start:start + SQL_CHUNK]
+            yield from self._conn.execute(
+                f"SELECT video_id, {columns} FROM signatures WHERE video_id IN ({','.join('?' * len(chunk))})", chunk)
+
+    def _signatures(self, video_ids):
+        return {
+            video_id: np.frombuffer(blob, dtype=np.uint32)
+            for video_id, blob in self._select_signatures('signature', video_ids)
+        }
+
+    def candidates(self, signature, exclude=None):
+        """和签名至少有一个 band 相同的已有视频"""
+        keys = self._band_keys(signature)
+        # 写成 OR 才会逐个走主键查找（(band, bucket) IN (VALUES ...) 会全表扫描）
+        where = ' OR '.join('(band = ? AND bucket = ?)' for _ in keys)
+        rows = self._conn.execute(
+            f"SELECT DISTINCT video_id FROM buckets WHERE {where}",
+            [v for key in keys for v in key],
+        )
+        return [video_id for video_id, in rows if video_id != exclude]
+
+    def matches(self, signature, exclude=None):
+        """候选里估计相似度达到阈值的 [(video_id, similarity), ...]，相似度从高到低"""
+        candidates = self.candidates(signature, exclude)
+        if not candidates:
+            return []
+        found = []
+        for video_id, other in self._signatures(candidates).items():
+            similarity = float(np.mean(signature == other))
+            if similarity >= self.threshold:
+                found.append((video_id, similarity))
+        return sorted(found, key=lambda item: -item[1])
+
+    def add_video(self, video_id, transcripts, channel_id='', commit=True):
+        """
+        加入一个视频（transcripts 为 step2.extract_transcript_info 的输出）；已加入、没有字幕或单词数
+        少于 min_words 时跳过
+
+        Returns:
+            [(重复的已有视频, 相似度), ...]；没有加入时返回 None
+        """
+        if video_id in self:
+            return None
+        words = tokenize(transcripts)
+        if not words or len(words) < self.min_words:
+            return None
+        signature = self.hasher.signature(shingle_hashes(words, self.shingle_size))
+        found = self.matches(signature)
+
+        self._conn.execute(
+            "INSERT INTO signatures (video_id, channel_id, word_count, signature, added_at) VALUES (?, ?, ?, ?, ?)",
+            (video_id, channel_id, len(words), signature.tobytes(), datetime.now().isoformat()),
+        )
+        self._conn.executemany("INSERT OR IGNORE INTO buckets (band, bucket, video_id) VALUES (?, ?, ?)",
+                               [(band, bucket, video_id) for band, bucket in self._band_keys(signature)])
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO pairs (video_a, video_b, similarity) VALUES (?, ?, ?)",
+            [(min(video_id, other), max(video_id, other), similarity) for other, similarity in found],
+        )
+        if commit:
+            self._conn.commit()
+        return found
+
+    def add_from_store(self, transcripts_path=TRANSCRIPTS_JSONL, channel_map=None):
+        """从字幕存储增量加入；返回 (新增视频数, 其中和已有视频重复的数量)"""
+        channel_map = channel_map if channel_map is not None else load_channel_map()
+        added = duplicates = 0
+        for record in iter_transcripts(transcripts_path):
+            video_id = record['video_id']
+            if video_id in self:
+                continue
+            channel_id, _ = channel_map.get(video_id, ('', ''))
+            found = self.add_video(video_id, record['transcripts'], channel_id, commit=False)
+            if found is None:
+                continue
+            added += 1
+            duplicates += bool(found)
+            if added % BATCH_SIZE == 0:
+                self._conn.commit()
+        self._conn.commit()
+        return added, duplicates
+
+    def clusters(self):
+        """
+        重复对用并查集合并成簇，最早加入的视频作为代表
+
+        Returns:
+            [{'canonical': video_id, 'members': [video_id, ...]}, ...]（members 按加入顺序，第一个是代表）
+        """
+        parent = {}
+
+        def find(x):
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for video_a, video_b in self._conn.execute("SELECT video_a, video_b FROM pairs"):
+            root_a, root_b = find(video_a), find(video_b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        if not parent:
+            return []
+        order = dict(self._select_signatures('seq', parent))
+
+        groups = {}
+        for video_id in parent:
+            groups.setdefault(find(video_id), []).append(video_id)
+        clusters = []
+        for members in groups.values():
+            members.sort(key=lambda v: order.get(v, 0))
+            clusters.append({'canonical': members[0], 'members': members})
+        clusters.sort(key=lambda c: order.get(c['canonical'], 0))
+        return clusters
+
+    def redundant_ids(self):
+        """所有簇里除代表以外的视频（分析/存储时可以跳过）"""
+        return {video_id for cluster in self.clusters() for video_id in cluster['members'][1:]}
+
+    def write_clusters(self, csv_path=CLUSTERS_CSV):
+        """写出 CLUSTER_FIELDS 的CSV，similarity 是和代表视频的估计相似度；返回簇数"""
+        clusters = self.clusters()
+        with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CLUSTER_FIELDS)
+            writer.writeheader()
+            for cluster_id, cluster in enumerate(clusters, 1):
+                info = {row[0]: row[1:] for row in self._select_signatures(
+                    'channel_id, word_count, signature', cluster['members'])}
+                canonical = np.frombuffer(info[cluster['canonical']][2], dtype=np.uint32)
+                for video_id in cluster['members']:
+                    channel_id, word_count, blob = info[video_id]
+                    writer.writerow({
+                        'cluster_id': cluster_id,
+                        'video_id': video_id,
+                        'canonical_video_id': cluster['canonical'],
+                        'is_canonical': video_id == cluster['canonical'],
+                        'similarity': round(float(np.mean(np.frombuffer(blob, dtype=np.uint32) == canonical)), 3),
+                        'channel_id': channel_id,
+                        'word_count': word_count,
+                    })
+        return len(clusters)
+
+    def check(self, video_id):
+        """某个已加入视频的近似重复 [(video_id, 相似度), ...]"""
+        signature = self._signatures([video_id]).get(video_id)
+        if signature is None:
+            return []
+        return self.matches(signature, exclude=video_id)
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='字幕近似重复检测（MinHash + LSH）')
+    parser.add_argument('--db', default=INDEX_DB, help='索引文件路径')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Jaccard 相似度阈值')
+    parser.add_argument('--min-words', type=int, default=MIN_WORDS, help='单词数少于这个的视频不参与检测')
+    sub = parser.add_subparsers(dest='command')
+
+    build = sub.add_parser('build', help='增量加入新视频')
+    build.add_argument('--transcripts', default=TRANSCRIPTS_JSONL, help='字幕存储 (.jsonl)')
+
+    clusters = sub.add_parser('clusters', help='输出重复簇')
+    clusters.add_argument('--output', default=CLUSTERS_CSV)
+
+    check = sub.add_parser('check', help='查看某个视频的近似重复')
+    check.add_argument('video_id')
+
+    args = parser.parse_args()
+    index = NearDuplicateIndex(args.db, threshold=args.threshold, min_words=args.min_words)
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        added, duplicates = index.add_from_store(args.transcripts)
+        print(f"✅ 新增 {added} 个视频（{duplicates} 个和已有视频近似重复），索引共 {len(index)} 个视频"
+              f"（{index.bands} bands × {index.rows} rows，{time.perf_counter() - start:.1f}s）")
+
+    elif args.command == 'clusters':
+        count = index.write_clusters(args.output)
+        redundant = len(index.redundant_ids())
+        print(f"✅ {count} 个重复簇，{redundant} 个冗余视频可以跳过")
+        print(f"💾 已保存到: {args.output}")
+
+    elif args.command == 'check':
+        found = index.check(args.video_id)
+        if not found:
+            print("没有找到近似重复的视频")
+        for video_id, similarity in found:
+            print(f"{video_id}  {similarity:.3f}")
+
+    else:
+        parser.print_help()
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+一体化流水线：搜索 → 详情 → 元数据/字幕 → 合并，各阶段通过有界队列流式衔接，不再等上一步全部跑完
+
+    搜索（asyncio 线程） --ID队列--> step2 线程池 --结果队列--> 汇总（主线程：写字幕存储、合并字幕）
+           └── 视频/频道详情和搜索并发进行，结束后写 videos.csv / channels.csv
+
+- 搜索每返回一页，新出现的 video ID 立刻交给 step2 的工作线程；ID 队列满了（下游跟不上）时
+  只暂停对应的搜索，详情请求照常进行
+- 断点续跑沿用各步骤自己的检查点：去重索引（SEEN_INDEX_DB）、任务账本（jobs.sqlite）、字幕存储
+  （transcripts_all.jsonl），重跑时已完成的视频直接从保存的元数据恢复
+- 合并后的字幕边处理边追加到 MERGED_CSV（已有的视频跳过），不需要再跑 merge_transcripts.py
+  或合并字幕的 notebook
+
+配置沿用 step1_search.py（查询、时间范围、API）和 step2.py（并发、限速、视频下载等）
+
+用法:
+    python pipeline.py
+    python pipeline.py --transcript-only --workers 16
+    python pipeline.py --query "inflation explained" --max-results 200
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import job_ledger
+import metrics
+import step1_search
+import step2
+from job_ledger import JobLedger
+from merge_transcripts import MERGED_CSV, MERGED_FIELDS, merge_record, prepare_for_append
+from rate_limiter import HostRateLimiter
+from transcript_store import TranscriptStore
+
+# 搜索和处理之间最多缓冲的视频ID数；满了以后搜索等待下游
+ID_QUEUE_SIZE = 200
+# 处理完还没汇总的结果数
+RESULT_QUEUE_SIZE = 50
+
+RUN_REPORT_JSON = os.path.join(step2.OUTPUT_DIR, "run_report_pipeline.json")
+RUN_REPORT_CSV = os.path.join(step2.OUTPUT_DIR, "run_report_pipeline.csv")
+
+_DONE = object()
+
+
+class Pipeline:
+    """
+    Args:
+        queries: 查询列表
+        max_results: 每个 查询×切片 最多取的结果数
+        transcript_only: True 时第二阶段只抓字幕（step2.harvest_one），否则完整处理（step2.process_one_video）
+        workers: 第二阶段的并发数
+        cache: ResponseCache
+        requests_per_second: 第二阶段每个主机的限速，默认用 step2 的配置
+    """
+
+    def __init__(self, queries, max_results, transcript_only=False, workers=None, cache=None,
+                 requests_per_second=None):
+        self.queries = queries
+        self.max_results = max_results
+        self.transcript_only = transcript_only
+        self.workers = max(1, workers or (step2.TRANSCRIPT_WORKERS if transcript_only else step2.MAX_WORKERS))
+        self.cache = cache
+
+        self.ids = queue.Queue(maxsize=ID_QUEUE_SIZE)
+        self.results = queue.Queue(maxsize=RESULT_QUEUE_SIZE)
+        self.search_result = None
+        self.search_error = None
+        self.queued = 0
+        self.started = time.perf_counter()
+        self.first_result_at = None
+
+        if transcript_only:
+            self.limiter = HostRateLimiter(requests_per_second or step2.TRANSCRIPT_REQUESTS_PER_SECOND,
+                                           max(1, self.workers // 2))
+        else:
+            self.limiter = HostRateLimiter(requests_per_second or step2.REQUESTS_PER_SECOND,
+                                           max(step2.REQUEST_BURST, self.workers))
+        os.makedirs(step2.OUTPUT_DIR, exist_ok=True)
+        self.ledger = JobLedger(step2.LEDGER_PATH)
+        self.store = TranscriptStore(step2.TRANSCRIPTS_JSONL)
+        self.media_queue = self.media_store = None
+        if step2.DOWNLOAD_VIDEO and not transcript_only:
+            self.media_queue, self.media_store = step2.start_media_queue(cache)
+
+    # ---------------------------------------------------------------- 第一阶段：搜索 + 详情
+
+    def _search(self):
+        incremental = {}
+        if step1_search.INCREMENTAL:
+            incremental = {
+                'existing_videos': step1_search.load_csv_index(step1_search.VIDEOS_CSV, 'video_id'),
+                'existing_channels': step1_search.load_csv_index(step1_search.CHANNELS_CSV, 'channel_id'),
+                'stats_ttl_hours': step1_search.STATS_TTL_HOURS,
+            }
+
+        # 放入有界队列会阻塞，用单独的线程（不能占用 asyncio 默认线程池，HTTP 请求也在那里执行）
+        enqueue_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pipeline-enqueue')
+
+        async def on_new_ids(video_ids):
+            self.queued += len(video_ids)
+            await asyncio.get_running_loop().run_in_executor(enqueue_executor, self._enqueue, video_ids)
+
+        try:
+            with metrics.stage('search'):
+                self.search_result = step1_search.run_async_search(
+                    self.queries,
+                    self.max_results,
+                    step1_search.LANGUAGE,
+                    step1_search.DATE_AFTER,
+                    step1_search.DATE_BEFORE,
+                    slice_days=step1_search.DATE_SLICE_DAYS,
+                    index_path=step1_search.SEEN_INDEX_DB,
+                    cache=self.cache,
+                    on_new_ids=on_new_ids,
+                    **incremental
+                )
+        except Exception as e:
+            self.search_error = e
+            print(f"❌ 搜索失败: {e}")
+        finally:
+            enqueue_executor.shutdown()
+            for _ in range(self.workers):
+                self.ids.put(None)
+
+    def _enqueue(self, video_ids):
+        for video_id in video_ids:
+            self.ids.put(video_id)
+
+    # ---------------------------------------------------------------- 第二阶段：元数据 / 字幕
+
+    def _worker(self):
+        while True:
+            video_id = self.ids.get()
+            if video_id is None:
+                self.results.put(_DONE)
+                return
+            try:
+                self.results.put((video_id, self._process(video_id)))
+            except Exception as e:
+                print(f"  ❌ 处理 {video_id} 出错: {e}")
+                self.ledger.fail(video_id, f"{type(e).__name__}: {e}")
+                self.results.put((video_id, None))
+
+    def _process(self, video_id):
+        if self.transcript_only:
+            if video_id in self.store or self.ledger.get(video_id) == job_ledger.NO_SUBTITLES:
+                return 'skipped', None
+            return step2.harvest_one(video_id, step2.SUBTITLE_LANGS, self.limiter, self.cache, self.ledger)
+        return step2.process_one_video(video_id, step2.DOWNLOAD_VIDEO, step2.VIDEO_QUALITY, self.limiter,
+                                       ledger=self.ledger, cache=self.cache, media_queue=self.media_queue)
+
+    # ---------------------------------------------------------------- 第三阶段：汇总 + 合并
+
+    def run(self, merged_csv=MERGED_CSV):
+        """
+        Returns:
+            {'queued', 'processed', 'transcripts', 'merged', 'videos', 'channels', 'failed'}
+        """
+        search_thread = threading.Thread(target=self._search, name='pipeline-search', daemon=True)
+        search_thread.start()
+        workers = [threading.Thread(target=self._worker, name=f"pipeline-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in workers:
+            thread.start()
+
+        videos, channels = [], {}
+        counts = {'processed': 0, 'transcripts': 0, 'merged': 0, 'failed': 0}
+        merged_ids = prepare_for_append(merged_csv, step2.TRANSCRIPTS_JSONL)
+        os.makedirs(os.path.dirname(merged_csv) or '.', exist_ok=True)
+        with metrics.stage('process'), open(merged_csv, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=MERGED_FIELDS)
+            if f.tell() == 0:
+                writer.writeheader()
+            remaining = self.workers
+            while remaining:
+                item = self.results.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                if self.first_result_at is None:
+                    self.first_result_at = time.perf_counter() - self.started
+                    metrics.observe('time_to_first_result_seconds', self.first_result_at)
+                counts['processed'] += 1
+                record = self._collect(item, videos, channels, counts)
+                if not record or record['video_id'] in merged_ids:
+                    continue
+                row = merge_record(record)
+                if row:
+                    writer.writerow(row)
+                    f.flush()
+                    merged_ids.add(record['video_id'])
+                    counts['merged'] += 1
+
+        search_thread.join()
+        for thread in workers:
+            thread.join()
+        self.store.close()
+        print(f"\n📒 任务账本: {self.ledger.summary()}")
+        self.ledger.close()
+        return dict(counts, queued=self.queued, videos=videos, channels=channels)
+
+    def _collect(self, item, videos, channels, counts):
+        """处理一个结果，返回要合并的字幕记录（没有时返回 None）"""
+        video_id, result = item
+        if self.transcript_only:
+            outcome, record = result or ('failed', None)
+            if outcome == 'failed':
+                counts['failed'] += 1
+            if record:
+                self.store.append(record)
+                self.ledger.mark(video_id, job_ledger.SUBTITLES_DONE)
+                counts['transcripts'] += 1
+            return record
+
+        if not result:
+            counts['failed'] += 1
+            return None
+        video_data, channel_data, record = result
+        videos.append(video_data)
+        if channel_data and channel_data['channel_id'] not in channels:
+            channels[channel_data['channel_id']] = channel_data
+        if record:
+            self.store.append(record)
+            counts['transcripts'] += 1
+        return record
+
+
+def save_search_results(search_result):
+    """第一阶段的视频/频道详情写回 step1 的 CSV"""
+    video_ids, videos_data, channels_data = search_result
+    step1_search.save_to_csv(videos_data, step1_search.VIDEOS_CSV, step1_search.VIDEO_FIELDS)
+    step1_search.save_to_csv(channels_data, step1_search.CHANNELS_CSV, step1_search.CHANNEL_FIELDS)
+    if step1_search.WRITE_WAREHOUSE:
+        step1_search.save_to_warehouse(videos_data, channels_data)
+    return len(video_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='搜索 → 详情 → 元数据/字幕 → 合并 一体化流水线')
+    parser.add_argument('--query', action='append', help='搜索查询（可重复），默认用 step1_search.py 的配置')
+    parser.add_argument('--max-results', type=int, help='每个 查询×切片 最多取的结果数')
+    parser.add_argument('--transcript-only', action='store_true', default=step2.TRANSCRIPT_ONLY,
+                        help='第二阶段只抓字幕')
+    parser.add_argument('--workers', type=int, help='第二阶段的并发数')
+    parser.add_argument('--requests-per-second', type=float,
+                        help='第二阶段每个主机每秒最多开始的请求数，默认用 step2 的配置')
+    parser.add_argument('--merged-csv', default=MERGED_CSV, help='合并字幕的输出路径')
+    args = parser.parse_args()
+
+    queries = args.query or step1_search.SEARCH_QUERIES or [step1_search.SEARCH_QUERY]
+    max_results = args.max_results or (step1_search.MAX_RESULTS_PER_SEARCH if len(queries) > 1
+                                       else step1_search.MAX_RESULTS)
+
+    print("=" * 70)
+    print("YouTube 流水线：搜索 → 详情 → 元数据/字幕 → 合并")
+    print("=" * 70)
+    print(f"   查询: {len(queries)} 个，每个最多 {max_results} 个结果")
+    print(f"   第二阶段: {'仅字幕' if args.transcript_only else '元数据+字幕'}，"
+          f"队列 {ID_QUEUE_SIZE}/{RESULT_QUEUE_SIZE}")
+
+    cache = step1_search.make_response_cache(step1_search.INCREMENTAL)
+    pipeline = Pipeline(queries, max_results, args.transcript_only, args.workers, cache,
+                        args.requests_per_second)
+    result = pipeline.run(args.merged_csv)
+
+    if pipeline.search_result is not None:
+        save_search_results(pipeline.search_result)
+
+    if not args.transcript_only:
+        step2.enrich_channel_rows(result['channels'], cache)
+        step2.save_results(result['videos'], result['channels'], result['transcripts'], pipeline.media_store)
+    if pipeline.media_queue is not None:
+        print(f"\n⏳ 等待媒体队列下载剩余 {pipeline.media_queue.pending()} 个视频...")
+        with metrics.stage('media'):
+            media_stats = pipeline.media_queue.join()
+        step2.print_media_stats(media_stats)
+        step2.write_summary(result['videos'], result['channels'], result['transcripts'], pipeline.media_store)
+        pipeline.media_store.close()
+    if cache is not None:
+        print(f"\n🗄️  响应缓存: {cache.report()}")
+        cache.close()
+
+    report = metrics.write_report(RUN_REPORT_JSON, csv_path=RUN_REPORT_CSV, prom_path=step2.PROMETHEUS_TEXTFILE,
+                                  extra={'step': 'pipeline', 'first_result_seconds': pipeline.first_result_at})
+    metrics.print_summary(report)
+
+    print("\n" + "=" * 70)
+    print("✅ 流水线完成!")
+    print("=" * 70)
+    if pipeline.first_result_at is not None:
+        print(f"   首个结果: {pipeline.first_result_at:.1f}s")
+    print(f"   入队 {result['queued']} 个视频，处理 {result['processed']} 个，失败 {result['failed']} 个")
+    print(f"   有字幕 {result['transcripts']} 个，新合并 {result['merged']} 个: {args.merged_csv}")
+    if pipeline.search_error is not None:
+        print(f"   ⚠️  搜索中途失败（{pipeline.search_error}），已处理的结果已保存，重跑会接着处理")
+
+
+if __name__ == "__main__":
+    main()
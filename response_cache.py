@@ -0,0 +1,279 @@
+"""
+本地响应缓存（内容寻址）：重跑第一步/第二步时，相同的请求直接从磁盘读取，不再消耗配额或访问网络
+
+    <cache_dir>/index.sqlite             请求键 -> 内容哈希、大小、写入/访问时间
+    <cache_dir>/objects/ab/abcdef....gz  响应内容（gzip），文件名是内容的 sha256，相同内容只存一份
+
+- 请求键: sha256(命名空间 + 接口 + 排序后的参数)，去掉 API Key 和值为 None 的参数
+- 每个接口单独的有效期（DEFAULT_TTLS），过期后重新请求；有效期 0 表示每次都重新请求（仍然写入，供离线重放）
+- 总大小超过 max_bytes 时按最近访问时间淘汰（LRU）
+- 离线模式: 忽略有效期，只读缓存，没有命中时抛出 CacheMissError，用来离线重放录好的响应
+
+环境变量:
+    RESPONSE_CACHE_DIR       缓存目录（默认 .response_cache）
+    RESPONSE_CACHE_OFFLINE   设为 1 时使用离线模式
+
+用法:
+    python response_cache.py stats
+    python response_cache.py clear [接口]
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+
+CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR', '.response_cache')
+OFFLINE = os.environ.get('RESPONSE_CACHE_OFFLINE') == '1'
+MAX_BYTES = 2 * 1024 ** 3
+
+# 各接口的有效期（秒）；None 表示永不过期
+DEFAULT_TTLS = {
+    'search': 6 * 3600,  # 新上传的视频几小时内就会出现在搜索结果里；增量运行时设为 0（见 step1_search）
+    'videos': 6 * 3600,  # 统计数据（播放量等）
+    'channels': 6 * 3600,
+    'watch': 5 * 3600,  # yt-dlp 解析的观看页：里面的媒体/字幕URL大约6小时后失效
+    'timedtext': 30 * 24 * 3600,  # 字幕内容
+}
+DEFAULT_TTL = 24 * 3600
+
+# 不参与请求键的参数
+IGNORED_PARAMS = {'key'}
+
+
+class CacheMissError(Exception):
+    """离线模式下缓存里没有这个请求"""
+
+
+def request_key(namespace, endpoint, params):
+    """规整请求并计算键：参数按名字排序，值统一转成字符串"""
+    normalized = sorted(
+        (str(k), str(v)) for k, v in (params or {}).items()
+        if v is not None and k not in IGNORED_PARAMS
+    )
+    raw = json.dumps([namespace, endpoint, normalized], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    线程安全（第二步的线程池共用一个实例）
+
+    Args:
+        path: 缓存目录
+        max_bytes: 缓存总大小上限（压缩后）
+        ttls: {接口: 秒}，覆盖 DEFAULT_TTLS
+        offline: 离线重放模式
+    """
+
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES, ttls=None, offline=OFFLINE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, 'index.sqlite'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at);
+            CREATE INDEX IF NOT EXISTS idx_entries_hash ON entries (content_hash);
+            """
+        )
+        self._conn.commit()
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.path, 'objects', content_hash[:2], f"{content_hash}.gz")
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def get(self, namespace, endpoint, params):
+        """
+        读取缓存的响应（bytes）；没有或已过期时返回 None，离线模式下没有时抛出 CacheMissError
+        """
+        key = request_key(namespace, endpoint, params)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            ttl = self.ttl(endpoint)
+            fresh = row is not None and (self.offline or ttl is None or time.time() - row[1] < ttl)
+            body = self._read_object(row[0]) if fresh else None
+            metrics.inc('cache_misses' if body is None else 'cache_hits', namespace=namespace, endpoint=endpoint)
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+
+        if body is None and self.offline:
+            raise CacheMissError(f"离线模式下缓存未命中: {namespace}/{endpoint} {params}")
+        return body
+
+    def _read_object(self, content_hash):
+        try:
+            with gzip.open(self._object_path(content_hash), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, namespace, endpoint, params, body):
+        """写入响应（str 或 bytes）；离线模式下不写"""
+        if self.offline:
+            return
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key = request_key(namespace, endpoint, params)
+        content_hash = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(content_hash)
+
+        with self._lock:
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                tmp_path = f"{object_path}.{threading.get_ident()}.tmp"
+                with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                    f.write(body)
+                os.replace(tmp_path, object_path)
+            size = os.path.getsize(object_path)
+
+            old = self._conn.execute("SELECT content_hash FROM entries WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO entries (key, namespace, endpoint, content_hash, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, namespace, endpoint, content_hash, size, now, now),
+            )
+            if old and old[0] != content_hash:
+                self._drop_object_if_unused(old[0])
+            self._conn.commit()
+            self.stores += 1
+            self._evict()
+
+    def _drop_object_if_unused(self, content_hash):
+        """没有条目引用时删除内容文件，返回释放的字节数"""
+        used = self._conn.execute("SELECT 1 FROM entries WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+        if used:
+            return 0
+        path = self._object_path(content_hash)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        return size
+
+    def _total_bytes(self):
+        """磁盘占用：相同内容只算一次"""
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT size FROM entries GROUP BY content_hash)"
+        ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        """超过 max_bytes 时按访问时间从旧到新删除（调用方持有锁）"""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, content_hash FROM entries ORDER BY accessed_at").fetchall()
+        for key, content_hash in rows:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= self._drop_object_if_unused(content_hash)
+            self.evictions += 1
+            if total <= self.max_bytes:
+                break
+        self._conn.commit()
+
+    def get_json(self, namespace, endpoint, params):
+        body = self.get(namespace, endpoint, params)
+        return None if body is None else json.loads(body)
+
+    def put_json(self, namespace, endpoint, params, data):
+        self.put(namespace, endpoint, params, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+    def clear(self, endpoint=None):
+        """删除全部（或某个接口的）缓存，返回删除的条目数"""
+        with self._lock:
+            where, args = ("WHERE endpoint = ?", (endpoint,)) if endpoint else ("", ())
+            rows = self._conn.execute(f"SELECT key, content_hash FROM entries {where}", args).fetchall()
+            self._conn.execute(f"DELETE FROM entries {where}", args)
+            for content_hash in {content_hash for _, content_hash in rows}:
+                self._drop_object_if_unused(content_hash)
+            self._conn.commit()
+        return len(rows)
+
+    def summary(self):
+        """{接口: (条目数, 字节数)}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT endpoint, COUNT(*), SUM(size) FROM entries GROUP BY endpoint ORDER BY endpoint"
+            ).fetchall()
+        return {endpoint: (count, size) for endpoint, count, size in rows}
+
+    def report(self):
+        """本次运行的命中情况，一行文字"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return (f"命中 {self.hits}/{total}（{rate:.0f}%），新写入 {self.stores}，淘汰 {self.evictions}"
+                + ("，离线模式" if self.offline else ""))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def cached_json_call(cache, namespace, endpoint, params, fetch):
+    """
+    带缓存地调用 fetch()（返回可 JSON 序列化的结果）；cache 为 None 时直接调用
+
+    用于 googleapiclient 的 request.execute() 和 yt-dlp 的 extract_info
+    """
+    if cache is None:
+        return fetch()
+    data = cache.get_json(namespace, endpoint, params)
+    if data is None:
+        data = fetch()
+        cache.put_json(namespace, endpoint, params, data)
+    return data
+
+
+def main():
+    cache = ResponseCache()
+    if len(sys.argv) >= 2 and sys.argv[1] == 'stats':
+        for endpoint, (count, size) in cache.summary().items():
+            print(f"{endpoint:12s} {count:8d} 条  {size / 1024 ** 2:8.1f} MB")
+        print(f"\n合计 {cache._total_bytes() / 1024 ** 2:.1f} MB（上限 {cache.max_bytes / 1024 ** 3:.1f} GB）: {cache.path}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'clear':
+        removed = cache.clear(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"🗑️  已删除 {removed} 条缓存")
+    else:
+        print(__doc__)
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+跨查询的 video ID 去重索引（SQLite），记录每个视频被哪些查询/时间切片搜到
+"""
+
+import sqlite3
+from datetime import datetime
+
+
+class SeenIndex:
+    """
+    videos: 每个视频一行（首次发现的时间和来源）
+    hits:   每个 (视频, 查询, 时间切片) 一行，保留完整的来源信息
+
+    Args:
+        path: SQLite 文件路径
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                first_query TEXT NOT NULL,
+                first_slice TEXT NOT NULL,
+                first_seen_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS hits (
+                video_id TEXT NOT NULL,
+                query TEXT NOT NULL,
+                slice TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                seen_at TEXT NOT NULL,
+                PRIMARY KEY (video_id, query, slice)
+            );
+            CREATE INDEX IF NOT EXISTS idx_hits_query ON hits (query, slice);
+            """
+        )
+        self._conn.commit()
+
+    def record(self, video_ids, query, slice_label, start_rank=0):
+        """
+        记录一页搜索结果；返回其中第一次进入索引的 video IDs（保持原顺序）
+        """
+        now = datetime.now().isoformat()
+        new_ids = []
+        for offset, video_id in enumerate(video_ids):
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO videos (video_id, first_query, first_slice, first_seen_at) VALUES (?, ?, ?, ?)",
+                (video_id, query, slice_label, now),
+            )
+            if cursor.rowcount:
+                new_ids.append(video_id)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO hits (video_id, query, slice, rank, seen_at) VALUES (?, ?, ?, ?, ?)",
+                (video_id, query, slice_label, start_rank + offset, now),
+            )
+        self._conn.commit()
+        return new_ids
+
+    def __contains__(self, video_id):
+        row = self._conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def sources(self, video_id):
+        """返回 [(query, slice, rank), ...]"""
+        return self._conn.execute(
+            "SELECT query, slice, rank FROM hits WHERE video_id = ? ORDER BY query, slice",
+            (video_id,),
+        ).fetchall()
+
+    def query_stats(self):
+        """每个查询搜到的视频数，以及其中只有这个查询搜到的视频数"""
+        rows = self._conn.execute(
+            """
+            SELECT h.query,
+                   COUNT(DISTINCT h.video_id),
+                   COUNT(DISTINCT CASE WHEN n.cnt = 1 THEN h.video_id END)
+            FROM hits h
+            JOIN (SELECT video_id, COUNT(DISTINCT query) AS cnt FROM hits GROUP BY video_id) n
+              ON n.video_id = h.video_id
+            GROUP BY h.query
+            ORDER BY h.query
+            """
+        ).fetchall()
+        return {query: {'videos': total, 'unique': unique} for query, total, unique in rows}
+
+    def close(self):
+        self._conn.close()
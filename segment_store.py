@@ -0,0 +1,181 @@
+"""
+列式字幕片段存储：把 transcripts_all.jsonl 里的片段展开成 NumPy 数组，支持内存映射加载
+和按时间窗口二分查找
+
+目录结构:
+    videos.json        [{"video_id": ..., "language": ...}, ...]，下标即 video_idx
+    video_offsets.npy  int64[n_videos + 1]，第 i 个视频的片段是 [offsets[i], offsets[i+1])
+    video_idx.npy      int32[n_segments]
+    start_ms.npy       int64[n_segments]（每个视频内部按 start_ms 排序）
+    end_ms.npy         int64[n_segments]
+    text_offsets.npy   int64[n_segments + 1]，片段文本在 text.bin 中的字节范围
+    text.bin           所有片段文本（UTF-8）首尾相接
+
+每个视频只保留一条字幕轨道（按 captions.pick_transcript 的语言优先级），避免多语言重复
+
+用法:
+    python segment_store.py build [transcripts.jsonl] [输出目录]
+    python segment_store.py window 120000 180000 [video_id]
+"""
+
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+from captions import pick_transcript
+from transcript_store import iter_transcripts
+
+TRANSCRIPTS_JSONL = os.path.join("youtube_downloads_test", "transcripts_all.jsonl")
+SEGMENTS_DIR = os.path.join("youtube_downloads_test", "segments")
+
+
+def build_segment_store(transcripts_path=TRANSCRIPTS_JSONL, out_dir=SEGMENTS_DIR):
+    """
+    逐个视频读取字幕并追加到列式数组；文本直接流式写入 text.bin
+
+    Returns:
+        (视频数, 片段数)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    videos = []
+    video_offsets = array('q', [0])
+    video_idx = array('i')
+    starts = array('q')
+    ends = array('q')
+    text_offsets = array('q', [0])
+    text_size = 0
+
+    with open(os.path.join(out_dir, 'text.bin'), 'wb') as text_file:
+        for record in iter_transcripts(transcripts_path):
+            transcript = pick_transcript(record['transcripts'])
+            if transcript is None:
+                continue
+
+            index = len(videos)
+            videos.append({'video_id': record['video_id'], 'language': transcript['language']})
+            segments = sorted(transcript['segments'], key=lambda seg: seg['start_ms'])
+            for seg in segments:
+                data = seg['text'].encode('utf-8')
+                text_file.write(data)
+                text_size += len(data)
+                video_idx.append(index)
+                starts.append(seg['start_ms'])
+                ends.append(seg['end_ms'])
+                text_offsets.append(text_size)
+            video_offsets.append(len(starts))
+
+    np.save(os.path.join(out_dir, 'video_offsets.npy'), np.frombuffer(video_offsets, dtype=np.int64))
+    np.save(os.path.join(out_dir, 'video_idx.npy'), np.frombuffer(video_idx, dtype=np.int32))
+    np.save(os.path.join(out_dir, 'start_ms.npy'), np.frombuffer(starts, dtype=np.int64))
+    np.save(os.path.join(out_dir, 'end_ms.npy'), np.frombuffer(ends, dtype=np.int64))
+    np.save(os.path.join(out_dir, 'text_offsets.npy'), np.frombuffer(text_offsets, dtype=np.int64))
+    with open(os.path.join(out_dir, 'videos.json'), 'w', encoding='utf-8') as f:
+        json.dump(videos, f, ensure_ascii=False)
+
+    return len(videos), len(starts)
+
+
+class SegmentStore:
+    """
+    只读的列式片段存储，数组默认内存映射加载
+
+    Args:
+        path: build_segment_store 的输出目录
+        mmap: True 时使用 np.load(mmap_mode='r')，不把数组读进内存
+    """
+
+    def __init__(self, path=SEGMENTS_DIR, mmap=True):
+        mode = 'r' if mmap else None
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode=mode)  # noqa: E731
+
+        with open(os.path.join(path, 'videos.json'), 'r', encoding='utf-8') as f:
+            self.videos = json.load(f)
+        self.video_offsets = load('video_offsets.npy')
+        self.video_idx = load('video_idx.npy')
+        self.start_ms = load('start_ms.npy')
+        self.end_ms = load('end_ms.npy')
+        self.text_offsets = load('text_offsets.npy')
+
+        text_path = os.path.join(path, 'text.bin')
+        if os.path.getsize(text_path):
+            self.text = np.memmap(text_path, dtype=np.uint8, mode='r') if mmap else np.fromfile(text_path, np.uint8)
+        else:
+            self.text = np.zeros(0, dtype=np.uint8)
+
+        self._index = {video['video_id']: i for i, video in enumerate(self.videos)}
+        durations = np.asarray(self.end_ms) - np.asarray(self.start_ms)
+        self.max_duration = int(durations.max()) if len(durations) else 0
+
+    def __len__(self):
+        return len(self.start_ms)
+
+    def video_range(self, video_id):
+        """返回某个视频的片段下标范围 (lo, hi)"""
+        i = self._index[video_id]
+        return int(self.video_offsets[i]), int(self.video_offsets[i + 1])
+
+    def segment_text(self, i):
+        lo, hi = self.text_offsets[i], self.text_offsets[i + 1]
+        return bytes(self.text[lo:hi]).decode('utf-8')
+
+    def window_indices(self, video_id, start_ms, end_ms):
+        """
+        某个视频中与 [start_ms, end_ms) 有重叠的片段下标（二分查找 + 向量化过滤）
+        """
+        lo, hi = self.video_range(video_id)
+        starts = self.start_ms[lo:hi]
+        # 片段按开始时间排序；开始时间早于 start_ms - 最长片段时长 的片段不可能和窗口重叠
+        first = int(np.searchsorted(starts, start_ms - self.max_duration, side='left'))
+        last = int(np.searchsorted(starts, end_ms, side='left'))
+        candidates = np.arange(lo + first, lo + last)
+        return candidates[np.asarray(self.end_ms[lo + first:lo + last]) > start_ms]
+
+    def window(self, video_id, start_ms, end_ms):
+        """返回 [(start_ms, end_ms, text), ...]"""
+        return [
+            (int(self.start_ms[i]), int(self.end_ms[i]), self.segment_text(i))
+            for i in self.window_indices(video_id, start_ms, end_ms)
+        ]
+
+    def window_all(self, start_ms, end_ms):
+        """所有视频中与 [start_ms, end_ms) 有重叠的片段下标（整列向量化比较）"""
+        mask = (np.asarray(self.start_ms) < end_ms) & (np.asarray(self.end_ms) > start_ms)
+        return np.flatnonzero(mask)
+
+    def segments_per_video(self):
+        return np.diff(np.asarray(self.video_offsets))
+
+    def speech_ms_per_video(self):
+        """每个视频字幕覆盖的总时长（毫秒）"""
+        durations = np.asarray(self.end_ms) - np.asarray(self.start_ms)
+        return np.bincount(np.asarray(self.video_idx), weights=durations, minlength=len(self.videos))
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == 'build':
+        transcripts_path = sys.argv[2] if len(sys.argv) > 2 else TRANSCRIPTS_JSONL
+        out_dir = sys.argv[3] if len(sys.argv) > 3 else SEGMENTS_DIR
+        n_videos, n_segments = build_segment_store(transcripts_path, out_dir)
+        print(f"✅ 已生成片段存储: {out_dir}（{n_videos} 个视频，{n_segments} 个片段）")
+    elif len(sys.argv) >= 4 and sys.argv[1] == 'window':
+        store = SegmentStore()
+        start_ms, end_ms = int(sys.argv[2]), int(sys.argv[3])
+        if len(sys.argv) > 4:
+            for start, end, text in store.window(sys.argv[4], start_ms, end_ms):
+                print(f"[{start / 1000:8.1f}s - {end / 1000:8.1f}s] {text}")
+        else:
+            indices = store.window_all(start_ms, end_ms)
+            for i in indices:
+                video_id = store.videos[store.video_idx[i]]['video_id']
+                print(f"{video_id} [{store.start_ms[i] / 1000:8.1f}s] {store.segment_text(i)}")
+            print(f"\n共 {len(indices)} 个片段")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+字幕相似度：哈希 TF-IDF 稀疏向量（SciPy CSR），按视频和按频道比较谈论通胀的方式
+
+- 单词和相邻两个单词（bigram）哈希到 N_FEATURES 维（不需要词表，新视频直接加入），
+  词频取 1 + log(tf)；IDF 按当前的文档频率计算，查询时再乘上，所以加入新视频不用重算旧行
+- 矩阵按 CSR 的三个数组存成文件，data/indices 只追加写入，加载时内存映射（np.memmap），
+  10 万个视频也不需要全部读进内存
+- 频道向量 = 频道下所有视频归一化向量的平均（稀疏矩阵乘法一次算完），refresh 时和行范数一起重算
+- 查询都是一次稀疏矩阵 × 向量再 argpartition 取 top-k，只用 CPU
+
+目录结构:
+    state.npz      video_ids / channel_of（下标即行号）、indptr int64[n_videos + 1]、
+                   df int32[N_FEATURES]（每个特征出现在多少个视频里）；整个文件原子替换
+    indices.bin    int32[nnz]（只追加）
+    data.bin       float32[nnz]，1 + log(tf)（只追加）
+    norms.npy      float32[n_videos]，按当前 IDF 算出的行范数
+    channels.json / channels.npz  频道 ID 和归一化后的频道向量
+
+用法:
+    python similarity.py build                           # 从 merged_transcripts.csv 增量加入
+    python similarity.py query "money printing causes inflation" --limit 10
+    python similarity.py channels UCxxxx                 # 和这个频道最相似的频道
+    python similarity.py videos VIDEO_ID                 # 和这个视频最相似的视频
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from merge_transcripts import MERGED_CSV
+from transcript_index import load_channel_map
+
+SIMILARITY_DIR = os.path.join("youtube_downloads_test", "similarity")
+
+N_FEATURES = 2 ** 20  # 哈希空间，冲突概率很低，df.npy 占 4MB
+BIGRAMS = True  # 加入相邻两个单词（"money printing"），非零元素大约变成 3 倍
+BATCH_SIZE = 1000  # 每批向量化多少个视频
+REFRESH_ROWS = 10000  # refresh 时每次处理多少行
+
+WORD_RE = re.compile(r"\w+(?:'\w+)*")
+_word_hashes = {}
+
+
+def feature_ids(text, bigrams=BIGRAMS, n_features=N_FEATURES):
+    """文本 -> 特征下标数组（有重复，重复次数即词频）"""
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.int64)
+    hashes = []
+    for word in words:
+        h = _word_hashes.get(word)
+        if h is None:
+            h = _word_hashes[word] = int.from_bytes(
+                hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+        hashes.append(h)
+    hashes = np.array(hashes, dtype=np.uint64)
+    if bigrams and len(hashes) > 1:
+        with np.errstate(over='ignore'):
+            pairs = hashes[:-1] * np.uint64(0x9E3779B97F4A7C15) + (hashes[1:] ^ (hashes[1:] >> np.uint64(29)))
+        hashes = np.concatenate([hashes, pairs])
+    return (hashes % np.uint64(n_features)).astype(np.int64)
+
+
+def vectorize(texts, n_features=N_FEATURES, bigrams=BIGRAMS):
+    """
+    一批文本 -> (indptr, indices, data)：每行按特征下标排序，data 为 1 + log(tf)
+    """
+    indptr = [0]
+    indices = []
+    data = []
+    for text in texts:
+        features, counts = np.unique(feature_ids(text, bigrams, n_features), return_counts=True)
+        indices.append(features.astype(np.int32))
+        data.append((1.0 + np.log(counts)).astype(np.float32))
+        indptr.append(indptr[-1] + len(features))
+    if not indices:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    return np.array(indptr, dtype=np.int64), np.concatenate(indices), np.concatenate(data)
+
+
+def top_k(scores, k, exclude=None):
+    """分数最高的 k 个下标（从高到低）；exclude 的下标不参与"""
+    scores = np.asarray(scores, dtype=np.float64).ravel().copy()
+    if exclude is not None:
+        scores[exclude] = -np.inf
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind='stable')]
+
+
+class SimilarityIndex:
+    """
+    Args:
+        path: 索引目录
+        mmap: True 时 indices/data 内存映射加载
+    """
+
+    def __init__(self, path=SIMILARITY_DIR, mmap=True):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.mmap = mmap
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        if os.path.exists(self._file('state.npz')):
+            with np.load(self._file('state.npz')) as state:
+                self.videos = [{'video_id': str(video_id), 'channel_id': str(channel_id)}
+                               for video_id, channel_id in zip(state['video_ids'], state['channel_of'])]
+                self.indptr = state['indptr']
+                self.df = state['df']
+        else:
+            self.videos = []
+            self.indptr = np.zeros(1, dtype=np.int64)
+            self.df = np.zeros(N_FEATURES, dtype=np.int32)
+        self._index = {video['video_id']: i for i, video in enumerate(self.videos)}
+
+        # 只追加的文件可能比 indptr 记录的长（上次写到一半中断），多出来的部分忽略
+        nnz = int(self.indptr[-1])
+        self.indices = self._read_array('indices.bin', np.int32, nnz)
+        self.data = self._read_array('data.bin', np.float32, nnz)
+
+        self.norms = np.load(self._file('norms.npy')) if os.path.exists(self._file('norms.npy')) else None
+        if self.norms is not None and len(self.norms) != len(self.videos):
+            self.norms = None
+        self.channel_ids = []
+        self.channel_matrix = None
+        if self.norms is not None and os.path.exists(self._file('channels.npz')):
+            with open(self._file('channels.json'), 'r', encoding='utf-8') as f:
+                self.channel_ids = json.load(f)
+            self.channel_matrix = sp.load_npz(self._file('channels.npz')).tocsr()
+
+    def _read_array(self, name, dtype, count):
+        path = self._file(name)
+        if not count:
+            return np.zeros(0, dtype=dtype)
+        if self.mmap:
+            return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+        return np.fromfile(path, dtype=dtype, count=count)
+
+    def __len__(self):
+        return len(self.videos)
+
+    def __contains__(self, video_id):
+        return video_id in self._index
+
+    @property
+    def matrix(self):
+        """原始词频矩阵（1 + log(tf)），videos × N_FEATURES"""
+        return sp.csr_matrix((self.data, self.indices, self.indptr), shape=(len(self.videos), N_FEATURES), copy=False)
+
+    @property
+    def idf(self):
+        """平滑 IDF：log((1 + n) / (1 + df)) + 1"""
+        return (np.log((1.0 + len(self.videos)) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+    def add_documents(self, documents):
+        """
+        追加一批视频 [(video_id, channel_id, text), ...]；已加入的视频跳过（只追加，不更新旧行）
+
+        加入后行范数和频道向量过期，需要调用 refresh()
+
+        Returns:
+            新增视频数
+        """
+        new = {}
+        for video_id, channel_id, text in documents:
+            if video_id not in self._index and video_id not in new and text and text.strip():
+                new[video_id] = (video_id, channel_id, text)
+        new = list(new.values())
+        if not new:
+            return 0
+
+        # 去掉 indptr 之后的残留（上次中断时写了一半的数据）
+        nnz = int(self.indptr[-1])
+        for name, dtype in (('indices.bin', np.int32), ('data.bin', np.float32)):
+            with open(self._file(name), 'ab') as f:
+                f.truncate(nnz * np.dtype(dtype).itemsize)
+
+        indptr_parts = [self.indptr]
+        for start in range(0, len(new), BATCH_SIZE):
+            batch = new[start:start + BATCH_SIZE]
+            indptr, indices, data = vectorize(text for _, _, text in batch)
+            with open(self._file('indices.bin'), 'ab') as f:
+                indices.tofile(f)
+            with open(self._file('data.bin'), 'ab') as f:
+                data.tofile(f)
+            self.df += np.bincount(indices, minlength=N_FEATURES).astype(np.int32)
+            indptr_parts.append(indptr[1:] + indptr_parts[-1][-1])
+            for video_id, channel_id, _ in batch:
+                self._index[video_id] = len(self.videos)
+                self.videos.append({'video_id': video_id, 'channel_id': channel_id or ''})
+
+        self.indptr = np.concatenate(indptr_parts)
+        # 数据文件写完以后再替换 state.npz，中断时旧索引仍然完整（多写的数据下次追加前截掉）
+        tmp = self._file('state.tmp.npz')
+        np.savez(tmp, indptr=self.indptr, df=self.df,
+                 video_ids=np.array([video['video_id'] for video in self.videos]),
+                 channel_of=np.array([video['channel_id'] for video in self.videos]))
+        os.replace(tmp, self._file('state.npz'))
+        self._load()
+        return len(new)
+
+    def _save_array(self, name, array):
+        tmp = self._file(name + '.tmp.npy')
+        np.save(tmp, array)
+        os.replace(tmp, self._file(name))
+
+    def add_from_merged_csv(self, csv_path=MERGED_CSV, channel_map=None):
+        """从 merged_transcripts.csv 增量加入（按 BATCH_SIZE 分批），然后 refresh()；返回新增视频数"""
+        csv.field_size_limit(sys.maxsize)
+        channel_map = channel_map if channel_map is not None else load_channel_map()
+        added = 0
+        batch = []
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                video_id = row.get('video_id')
+                if not video_id or video_id in self._index:
+                    continue
+                batch.append((video_id, channel_map.get(video_id, ('', ''))[0], row.get('full_transcript', '')))
+                if len(batch) >= BATCH_SIZE:
+                    added += self.add_documents(batch)
+                    batch = []
+        added += self.add_documents(batch)
+        if added or self.norms is None:
+            self.refresh()
+        return added
+
+    def refresh(self):
+        """按当前 IDF 重算行范数和频道向量（加入新视频后调用），每次处理 REFRESH_ROWS 行，临时内存有上限"""
+        idf = self.idf
+        n = len(self.videos)
+        channel_ids = sorted({video['channel_id'] for video in self.videos if video['channel_id']})
+        column = {channel_id: i for i, channel_id in enumerate(channel_ids)}
+        channel_of = np.array([column.get(video['channel_id'], -1) for video in self.videos], dtype=np.int64)
+
+        norms = np.zeros(n, dtype=np.float32)
+        channels = sp.csr_matrix((len(channel_ids), N_FEATURES), dtype=np.float32)
+        for lo in range(0, n, REFRESH_ROWS):
+            hi = min(n, lo + REFRESH_ROWS)
+            a, b = int(self.indptr[lo]), int(self.indptr[hi])
+            indices = np.asarray(self.indices[a:b])
+            weights = np.asarray(self.data[a:b]) * idf[indices]
+            row_of = np.repeat(np.arange(hi - lo), np.diff(self.indptr[lo:hi + 1]))
+            chunk_norms = np.sqrt(np.bincount(row_of, weights=weights * weights, minlength=hi - lo))
+            norms[lo:hi] = chunk_norms
+
+            # 频道向量：归一化的视频向量按频道求和（之后再归一化，等价于平均的方向）
+            weights /= np.where(chunk_norms > 0, chunk_norms, 1.0)[row_of]
+            chunk = sp.csr_matrix((weights.astype(np.float32), indices, self.indptr[lo:hi + 1] - a),
+                                  shape=(hi - lo, N_FEATURES))
+            members = np.flatnonzero(channel_of[lo:hi] >= 0)
+            membership = sp.csr_matrix(
+                (np.ones(len(members), dtype=np.float32), (channel_of[lo:hi][members], members)),
+                shape=(len(channel_ids), hi - lo),
+            )
+            channels = channels + membership @ chunk
+
+        channel_norms = np.sqrt(np.asarray(channels.multiply(channels).sum(axis=1))).ravel()
+        channels = sp.diags(np.divide(1.0, channel_norms, out=np.zeros_like(channel_norms),
+                                      where=channel_norms > 0)) @ channels
+        self._save_array('norms.npy', norms)
+        sp.save_npz(self._file('channels.npz'), channels.astype(np.float32).tocsr(), compressed=False)
+        with open(self._file('channels.json'), 'w', encoding='utf-8') as f:
+            json.dump(channel_ids, f, ensure_ascii=False)
+        self._load()
+
+    def _check_fresh(self):
+        if self.norms is None:
+            raise RuntimeError("索引已更新，先调用 refresh()（或运行 python similarity.py build）")
+
+    def _video_scores(self, weights):
+        """所有视频和一个单位长度的 TF-IDF 向量（N_FEATURES,）的余弦相似度"""
+        scores = np.asarray(self.matrix @ (weights * self.idf)).ravel()
+        return np.divide(scores, self.norms, out=np.zeros_like(scores), where=self.norms > 0)
+
+    def _text_weights(self, text):
+        features, counts = np.unique(feature_ids(text), return_counts=True)
+        weights = np.zeros(N_FEATURES, dtype=np.float32)
+        weights[features] = (1.0 + np.log(counts)) * self.idf[features]
+        norm = np.linalg.norm(weights)
+        return weights / norm if norm else weights
+
+    def query(self, text, k=10):
+        """和一段文本最接近的视频 [(video_id, channel_id, 相似度), ...]"""
+        self._check_fresh()
+        scores = self._video_scores(self._text_weights(text))
+        return [(self.videos[i]['video_id'], self.videos[i]['channel_id'], float(scores[i]))
+                for i in top_k(scores, k) if scores[i] > 0]
+
+    def similar_videos(self, video_id, k=10):
+        """和已加入的某个视频最相似的视频"""
+        self._check_fresh()
+        i = self._index[video_id]
+        row = self.matrix[i]
+        weights = np.zeros(N_FEATURES, dtype=np.float32)
+        weights[row.indices] = row.data * self.idf[row.indices]
+        if self.norms[i]:
+            weights /= self.norms[i]
+        scores = self._video_scores(weights)
+        return [(self.videos[j]['video_id'], self.videos[j]['channel_id'], float(scores[j]))
+                for j in top_k(scores, k, exclude=i)]
+
+    def similar_channels(self, channel_id, k=10):
+        """和某个频道最相似的频道 [(channel_id, 相似度), ...]"""
+        self._check_fresh()
+        i = self.channel_ids.index(channel_id)
+        scores = self.channel_matrix @ self.channel_matrix[i].toarray().ravel()
+        return [(self.channel_ids[j], float(scores[j])) for j in top_k(scores, k, exclude=i)]
+
+    def channel_matrix_dense(self):
+        """频道 × 频道 的相似度矩阵（频道数不多时用来画热力图）"""
+        self._check_fresh()
+        return np.asarray((self.channel_matrix @ self.channel_matrix.T).todense())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='字幕 TF-IDF 相似度')
+    parser.add_argument('--dir', default=SIMILARITY_DIR, help='索引目录')
+    sub = parser.add_subparsers(dest='command')
+
+    build = sub.add_parser('build', help='增量加入新视频')
+    build.add_argument('--merged', default=MERGED_CSV, help='merged_transcripts.csv')
+
+    query = sub.add_parser('query', help='和一段文本最接近的视频')
+    query.add_argument('text')
+    query.add_argument('--limit', type=int, default=10)
+
+    channels = sub.add_parser('channels', help='和某个频道最相似的频道')
+    channels.add_argument('channel_id')
+    channels.add_argument('--limit', type=int, default=10)
+
+    videos = sub.add_parser('videos', help='和某个视频最相似的视频')
+    videos.add_argument('video_id')
+    videos.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args()
+    index = SimilarityIndex(args.dir)
+    start = time.perf_counter()
+
+    if args.command == 'build':
+        added = index.add_from_merged_csv(args.merged)
+        print(f"✅ 新增 {added} 个视频，索引共 {len(index)} 个视频、{len(index.channel_ids)} 个频道"
+              f"（{time.perf_counter() - start:.1f}s）")
+        return
+
+    if args.command == 'query':
+        for video_id, channel_id, score in index.query(args.text, args.limit):
+            print(f"{score:.3f}  {video_id}  {channel_id or '?'}")
+    elif args.command == 'channels':
+        for channel_id, score in index.similar_channels(args.channel_id, args.limit):
+            print(f"{score:.3f}  {channel_id}")
+    elif args.command == 'videos':
+        for video_id, channel_id, score in index.similar_videos(args.video_id, args.limit):
+            print(f"{score:.3f}  {video_id}  {channel_id or '?'}")
+    else:
+        parser.print_help()
+        return
+    print(f"\n⏱️  {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,26 @@ YouTube视频下载 - 第二步测试版：使用yt-dlp获取所有维度信息
 import os
 import csv
 import json
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice, repeat
 import yt_dlp
 
+import job_ledger
+from captions import format_compaction, parse_json3, select_caption_tracks
+from channel_enrichment import enrich_channels, format_enrichment
+import metadata_store
+import metrics
+from job_ledger import JobLedger
+from media_queue import MediaQueue, progress_hook
+from media_store import MediaStore
+from rate_limiter import HostRateLimiter
+from response_cache import ResponseCache, cached_json_call
+from transcript_store import TranscriptStore
+from warehouse import Warehouse
+from youtube_async import API_BASE_URL
+
 # ============================================================================
 # 配置部分
 # ============================================================================
@@ -23,6 +39,7 @@ METADATA_DIR = os.path.join(OUTPUT_DIR, "metadata")
 TRANSCRIPTS_DIR = os.path.join(OUTPUT_DIR, "transcripts")
 CHANNELS_DIR = os.path.join(OUTPUT_DIR, "channels")
 VIDEOS_DIR = os.path.join(OUTPUT_DIR, "videos")  # 视频文件目录
+TRANSCRIPTS_JSONL = os.path.join(OUTPUT_DIR, "transcripts_all.jsonl")  # 字幕：每行一个视频，边处理边追加
 
 # 测试：只下载前N个视频
 TEST_LIMIT = 150
@@ -31,6 +48,58 @@ TEST_LIMIT = 150
 DOWNLOAD_VIDEO = True  # 是否下载视频文件
 VIDEO_QUALITY = 'best'  # 视频质量：'best' (最高质量) 或 '1080p', '720p' 等
 
+# 媒体下载队列（DOWNLOAD_VIDEO = True 时）：视频文件在后台单独下载，元数据和字幕不用等视频
+MEDIA_WORKERS = 2  # 同时下载的视频数
+MEDIA_RATE_LIMIT_MB = None  # 所有下载合计的带宽上限（MB/秒），None 表示不限
+MEDIA_BUDGET_GB = None  # 视频目录的存储预算（GB），按剩余预算给每个视频选画质（不超过 VIDEO_QUALITY），超出的不下载
+MEDIA_INDEX_PATH = os.path.join(OUTPUT_DIR, "media_index.sqlite")  # 视频文件大小/哈希索引（见 media_store.py）
+
+# 并发设置
+MAX_WORKERS = 4  # 同时处理的视频数（线程池大小）
+# 每个主机每秒最多开始的请求数（令牌桶速率）；一个视频的解析要好几秒，2 次/秒足够让 MAX_WORKERS 个线程同时在跑
+REQUESTS_PER_SECOND = float(os.environ.get('STEP2_REQUESTS_PER_SECOND', '2.0'))
+REQUEST_BURST = MAX_WORKERS  # 令牌桶容量，允许的突发请求数（启动时所有线程可以同时开始）
+
+# 只要字幕：跳过媒体格式解析和缩略图/描述/infojson 写盘，直接在内存里解析 json3
+TRANSCRIPT_ONLY = False
+TRANSCRIPT_WORKERS = 16  # 字幕模式的并发数（每个视频只有两三个小请求，可以开得更高）
+TRANSCRIPT_REQUESTS_PER_SECOND = 4.0
+SUBTITLE_LANGS = ['en', 'en-US', 'en-GB']
+
+# 解析字幕时压缩自动字幕的滚动重复：去掉空片段和重复的行，片段时间互不重叠（见 captions.compact_segments）
+COMPACT_CAPTIONS = True
+
+# 元数据保存方式（见 metadata_store.py）
+#   'slim':  只保留常用字段（几 KB/视频）
+#   'split': 常用字段 + 大字段（formats、automatic_captions 等）单独 gzip 压缩
+#   'full':  完整 info（约 600 KB/视频）
+METADATA_MODE = 'slim'
+METADATA_INDENT = None  # None 为紧凑格式；调试时可设为 2
+METADATA_FIELDS = metadata_store.SLIM_FIELDS
+
+# 断点续跑：任务账本记录每个视频的进度，重跑时跳过已完成的视频，只重试失败的
+LEDGER_PATH = os.path.join(OUTPUT_DIR, "jobs.sqlite")
+
+# 响应缓存：yt-dlp 解析的观看页和字幕内容缓存到本地，重跑时不再访问网络（见 response_cache.py）
+USE_RESPONSE_CACHE = True
+
+# 频道补全：按频道ID去重后用 channels().list 批量补上简介、国家、链接等（见 channel_enrichment.py），
+# 和上次的 channels_detailed.csv 合并，CHANNEL_TTL_HOURS 内不重复请求
+ENRICH_CHANNELS = True
+CHANNEL_TTL_HOURS = 7 * 24
+YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY')  # 为空时沿用 step1_search.py 里的 Key
+API_BASE = os.environ.get('YOUTUBE_API_BASE_URL', API_BASE_URL)
+
+# 带类型的数据仓库（见 warehouse.py），和第一步共用一个文件，同一个视频/频道合并成一行
+WRITE_WAREHOUSE = True
+WAREHOUSE_PATH = os.path.join("youtube_results", "warehouse.sqlite")
+
+# 运行报告：yt-dlp 调用耗时分布、限速/带宽等待时间、下载字节数等（见 metrics.py）
+RUN_REPORT_JSON = os.path.join(OUTPUT_DIR, "run_report_step2.json")
+RUN_REPORT_CSV = os.path.join(OUTPUT_DIR, "run_report_step2.csv")
+# Prometheus textfile（node_exporter 的 textfile collector 目录下的 .prom 文件），None 表示不写
+PROMETHEUS_TEXTFILE = os.environ.get('PROMETHEUS_TEXTFILE')
+
 # ============================================================================
 # 辅助函数
 # ============================================================================
@@ -54,64 +123,92 @@ def read_video_ids_from_csv(csv_file, limit=None):
     return video_ids
 
 
+# JSON 原生支持的标量类型（含子类，如 bool、IntEnum）
+_JSON_SCALARS = (str, int, float, bool)
+_JSON_CONTAINERS = (dict, list, tuple)
+
+
 def clean_info_for_json(info):
     """
     清理 yt-dlp 返回的 info 对象，移除不可序列化的对象
     能序列化的都保留，不能序列化的就跳过
+
+    按类型判断，不再对每个叶子调用 json.dumps；用显式栈迭代遍历，
+    只有包含不可序列化对象的子树才会被复制，其余部分直接复用原对象。
+    指回祖先容器的引用（自引用的 dict/list）同样跳过，否则会无限循环
     """
-    if info is None:
+    if info is None or isinstance(info, _JSON_SCALARS):
+        return info
+    if not isinstance(info, _JSON_CONTAINERS):
         return None
 
-    # 如果不是字典、列表等复杂类型，直接测试能否序列化
-    if not isinstance(info, (dict, list, tuple)):
-        try:
-            json.dumps(info)
-            return info
-        except (TypeError, ValueError):
-            return None  # 不能序列化就返回 None
-
-    # 处理字典
-    if isinstance(info, dict):
-        cleaned = {}
-        for key, value in info.items():
-            try:
-                # 递归清理值
-                cleaned_value = clean_info_for_json(value)
-
-                # 如果清理后的值不是 None，就保存
-                if cleaned_value is not None:
-                    cleaned[key] = cleaned_value
-                # 特殊处理：如果原值就是 None，也要保留
-                elif value is None:
-                    cleaned[key] = None
-
-            except Exception as e:
-                # 任何异常都跳过这个字段
-                print(f"    ⚠️  跳过字段 '{key}': {type(value).__name__}")
-                continue
+    # 栈帧: [原容器, 子项迭代器, 复制出的新容器(没有改动时为 None), 已处理的子项数, 当前子项的键]
+    stack = [[info, _iter_children(info), None, 0, None]]
+    active = {id(info)}  # 栈上（正在遍历）的容器
+    result = None
+
+    while stack:
+        frame = stack[-1]
+        container, children, copy, position, _ = frame
+
+        for key, value in children:
+            if value is None or isinstance(value, _JSON_SCALARS):
+                if copy is not None:
+                    _put(copy, key, value)
+                position += 1
+            elif isinstance(value, _JSON_CONTAINERS) and id(value) not in active:
+                # 先处理子容器，处理完再回到这里
+                frame[2], frame[3], frame[4] = copy, position, key
+                stack.append([value, _iter_children(value), None, 0, None])
+                active.add(id(value))
+                break
+            else:
+                # 不能序列化或指回祖先：跳过，并从这里开始复制当前容器
+                if copy is None:
+                    copy = _copy_prefix(container, position)
+                position += 1
+        else:
+            # 当前容器处理完毕
+            stack.pop()
+            active.discard(id(container))
+            if copy is None:
+                cleaned = container
+            else:
+                cleaned = tuple(copy) if isinstance(container, tuple) else copy
+
+            if not stack:
+                result = cleaned
+                break
 
-        return cleaned
-
-    # 处理列表或元组
-    if isinstance(info, (list, tuple)):
-        cleaned_list = []
-        for item in info:
-            try:
-                cleaned_item = clean_info_for_json(item)
-                if cleaned_item is not None or item is None:
-                    cleaned_list.append(cleaned_item)
-            except Exception:
-                # 跳过不能序列化的列表项
-                continue
+            parent = stack[-1]
+            parent_container, _, parent_copy, parent_position, parent_key = parent
+            if cleaned is not container and parent_copy is None:
+                parent_copy = _copy_prefix(parent_container, parent_position)
+            if parent_copy is not None:
+                _put(parent_copy, parent_key, cleaned)
+            parent[2], parent[3] = parent_copy, parent_position + 1
 
-        return cleaned_list if isinstance(info, list) else tuple(cleaned_list)
+    return result
 
-    # 其他类型尝试直接序列化
-    try:
-        json.dumps(info)
-        return info
-    except (TypeError, ValueError):
-        return None
+
+def _iter_children(container):
+    if isinstance(container, dict):
+        return iter(container.items())
+    return zip(repeat(None), container)
+
+
+def _copy_prefix(container, count):
+    """复制容器的前 count 个子项（这些子项都没有改动，可以直接共享）"""
+    if isinstance(container, dict):
+        return dict(islice(container.items(), count))
+    return list(container[:count])
+
+
+def _put(copy, key, value):
+    if isinstance(copy, dict):
+        copy[key] = value
+    else:
+        copy.append(value)
 
 
 def extract_channel_info(info):
@@ -124,15 +221,15 @@ def extract_channel_info(info):
         'title': info.get('channel'),
         'uploader': info.get('uploader'),
 
-        # Description需要从完整频道页面获取，这里先留空
+        # 观看页里没有频道简介/国家，由 channel_enrichment 批量补全（ENRICH_CHANNELS）
         'description': '',
         'country': '',
 
         # Ownership/affiliation signals
         'channel_follower_count': info.get('channel_follower_count'),
 
-        # Links - yt-dlp可能不直接提供，需要额外抓取
-        'external_links': [],
+        # Links - yt-dlp不提供，由 channel_enrichment 从频道简介里提取（空格分隔）
+        'external_links': '',
         'business_email': '',
     }
 
@@ -216,37 +313,29 @@ def extract_transcript_info(subtitles_data, video_id):
             if subtitle_files:
                 break
 
+    stats = {}
     for subtitle_file in subtitle_files:
         try:
             with open(subtitle_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
                 # JSON3格式包含完整的时间戳信息
-                if 'events' in data:
-                    segments = []
-                    for event in data['events']:
-                        if 'segs' in event:
-                            text = ''.join([seg.get('utf8', '') for seg in event['segs']])
-                            segments.append({
-                                'start_ms': event.get('tStartMs', 0),
-                                'end_ms': event.get('tStartMs', 0) + event.get('dDurationMs', 0),
-                                'text': text.strip()
-                            })
-
-                    lang = os.path.basename(subtitle_file).split('.')[-2]
-                    transcripts.append({
-                        'language': lang,
-                        'segments': segments
-                    })
+                segments = parse_json3(json.load(f), compact=COMPACT_CAPTIONS, stats=stats)
+
+            if segments is not None:
+                lang = os.path.basename(subtitle_file).split('.')[-2]
+                transcripts.append({
+                    'language': lang,
+                    'segments': segments
+                })
         except Exception as e:
             print(f"  ⚠️  解析字幕文件失败 {os.path.basename(subtitle_file)}: {e}")
 
+    if stats:
+        print(f"  🗜️  字幕压缩 {video_id}: {format_compaction(stats)}")
     return transcripts
 
-    return transcripts
 
-
-def download_video_metadata(video_id, output_dir, download_video=True, video_quality='best'):
+def download_video_metadata(video_id, output_dir, download_video=True, video_quality='best', raise_errors=False,
+                            cache=None, limiter=None):
     """
     使用yt-dlp下载单个视频的所有元数据和视频文件
 
@@ -255,6 +344,10 @@ def download_video_metadata(video_id, output_dir, download_video=True, video_qua
         output_dir: 输出目录
         download_video: 是否下载视频文件
         video_quality: 视频质量 ('best', '1080p', '720p', etc.)
+        raise_errors: 失败时抛出异常（而不是返回 None），方便调用方记录原因
+        cache: ResponseCache；传入时观看页的解析结果（process=False）走缓存，
+            再用 process_ie_result 完成格式选择、写字幕和下载（和 --load-info-json 一样）
+        limiter: HostRateLimiter；解析观看页之前取令牌，缓存命中时不取
     """
     url = f"https://www.youtube.com/watch?v={video_id}"
 
@@ -274,7 +367,7 @@ def download_video_metadata(video_id, output_dir, download_video=True, video_qua
         # 下载字幕（所有可用语言）
         'writesubtitles': True,
         'writeautomaticsub': True,
-        'subtitleslangs': ['en', 'en-US', 'en-GB'],
+        'subtitleslangs': SUBTITLE_LANGS,
         'subtitlesformat': 'json3',
 
         # 下载其他元数据
@@ -313,22 +406,159 @@ def download_video_metadata(video_id, output_dir, download_video=True, video_qua
     else:
         ydl_opts['skip_download'] = True
         print(f"  📄 仅下载元数据（不下载视频）")
+    ydl_opts['progress_hooks'] = [progress_hook()]
 
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             print(f"  📥 处理: {video_id}")
-            info = ydl.extract_info(url, download=True)
+            op = 'download' if download_video else 'metadata'
+            if cache is None:
+                if limiter:
+                    limiter.acquire(url)
+                with metrics.timer('ytdlp_call_seconds', op=op):
+                    info = ydl.extract_info(url, download=True)
+            else:
+                info = extract_watch_info(ydl, video_id, cache, limiter)
+                with metrics.timer('ytdlp_call_seconds', op=op):
+                    info = ydl.process_ie_result(info, download=True)
 
             return info
 
     except Exception as e:
         print(f"  ❌ 失败: {e}")
+        if raise_errors:
+            raise
+        return None
+
+
+def extract_watch_info(ydl, video_id, cache=None, limiter=None):
+    """解析观看页（process=False，不做格式选择），结果按 video_id 缓存；只有真正请求时才限速"""
+    url = f"https://www.youtube.com/watch?v={video_id}"
+
+    def extract():
+        if limiter:
+            limiter.acquire(url)
+        with metrics.timer('ytdlp_call_seconds', op='watch'):
+            return ydl.sanitize_info(ydl.extract_info(url, download=False, process=False))
+
+    return cached_json_call(cache, 'yt-dlp', 'watch', {'id': video_id}, extract)
+
+
+def video_file_exists(video_id):
+    """视频目录下是否已有合并好的 mp4"""
+    video_dir = os.path.join(VIDEOS_DIR, video_id)
+    return os.path.exists(os.path.join(video_dir, f"{video_id}.mp4"))
+
+
+def load_saved_info(video_id):
+    """读取之前保存的元数据JSON，不存在时返回 None"""
+    return metadata_store.load_metadata(METADATA_DIR, video_id, mode=METADATA_MODE)
+
+
+def build_result(info, video_id):
+    """从 info 中提取 (video_data, channel_data, transcript_record)"""
+    # 提取视频信息
+    video_data = extract_video_info(info)
+
+    # 提取频道信息
+    channel_data = extract_channel_info(info) if info.get('channel_id') else None
+
+    # 提取字幕信息
+    transcript_data = extract_transcript_info(
+        info.get('subtitles') or info.get('automatic_captions'),
+        video_id
+    )
+    transcript_record = {
+        'video_id': video_id,
+        'transcripts': transcript_data
+    } if transcript_data else None
+
+    return video_data, channel_data, transcript_record
+
+
+def process_one_video(video_id, download_video=True, video_quality='best', limiter=None, position=None, ledger=None,
+                      cache=None, media_queue=None):
+    """
+    处理单个视频：下载元数据/视频，提取视频、频道、字幕信息并保存完整JSON
+
+    如果传入 ledger，已完成的视频直接从保存的JSON恢复结果，不再访问网络；
+    如果传入 media_queue，这里只处理元数据和字幕，视频文件交给媒体队列在后台下载
+
+    Returns:
+        (video_data, channel_data, transcript_record)，失败时返回 None
+    """
+    prefix = f"[{position}] " if position else ""
+    if media_queue is not None and download_video:
+        download_video = False
+    else:
+        media_queue = None
+    target_state = job_ledger.VIDEO_DONE if download_video else job_ledger.SUBTITLES_DONE
+
+    if ledger and ledger.is_done(video_id, target_state):
+        info = load_saved_info(video_id)
+        if info:
+            print(f"\n{prefix}⏭️  已完成，跳过: {video_id}")
+            if media_queue is not None:
+                media_queue.put(video_id)
+            metrics.inc('videos', result='skipped')
+            return build_result(info, video_id)
+
+    print(f"\n{prefix}处理视频: {video_id}")
+    if ledger:
+        ledger.start(video_id)
+
+    # 下载元数据和视频（令牌桶限速只在真正请求时取令牌，缓存命中不等待）
+    output_location = VIDEOS_DIR if download_video else TRANSCRIPTS_DIR
+    try:
+        info = download_video_metadata(video_id, output_location, download_video, video_quality,
+                                       raise_errors=True, cache=cache, limiter=limiter)
+    except Exception as e:
+        if ledger:
+            ledger.fail(video_id, f"{type(e).__name__}: {e}")
+        metrics.inc('videos', result='failed')
         return None
 
+    if not info:
+        if ledger:
+            ledger.fail(video_id, "yt-dlp 未返回信息")
+        metrics.inc('videos', result='failed')
+        return None
+
+    # 保存元数据JSON（清理后，按 METADATA_MODE 投影/拆分）
+    metadata_store.save_metadata(info, METADATA_DIR, video_id, METADATA_MODE, METADATA_INDENT,
+                                 METADATA_FIELDS, clean=clean_info_for_json)
+    if ledger:
+        ledger.mark(video_id, job_ledger.METADATA_DONE)
+
+    result = build_result(info, video_id)
+    if ledger:
+        ledger.mark(video_id, job_ledger.SUBTITLES_DONE)
+        if download_video:
+            if video_file_exists(video_id):
+                ledger.mark(video_id, job_ledger.VIDEO_DONE)
+            else:
+                ledger.media_fail(video_id, "视频文件未生成")
+    if media_queue is not None:
+        media_queue.put(video_id)
+
+    metrics.inc('videos', result='ok')
+    return result
+
+
+def process_videos(video_ids, download_video=True, video_quality='best', max_workers=MAX_WORKERS,
+                   ledger_path=LEDGER_PATH, transcripts_path=TRANSCRIPTS_JSONL, cache=None, media_queue=None):
+    """
+    批量处理视频（线程池并发，结果按输入顺序汇总；ledger_path 为 None 时不记录进度；
+    传入 cache 时观看页解析结果走响应缓存；传入 media_queue 时视频文件入队后台下载，
+    这里返回时视频可能还在下载，调用方用 media_queue.join() 等待）
+
+    字幕不保存在内存里，每个视频完成后直接追加到 transcripts_path（JSON Lines）
 
-def process_videos(video_ids, download_video=True, video_quality='best'):
-    """批量处理视频"""
+    Returns:
+        (videos, channels, transcript_count)
+    """
     print(f"\n🚀 开始处理 {len(video_ids)} 个视频")
+    print(f"   并发数: {max_workers}，限速: 每主机 {REQUESTS_PER_SECOND} 次/秒")
     if download_video:
         print(f"   视频质量: {video_quality}")
         print(f"   ⚠️  下载视频需要较长时间和存储空间")
@@ -341,58 +571,235 @@ def process_videos(video_ids, download_video=True, video_quality='best'):
 
     all_videos = []
     all_channels = {}
-    all_transcripts = []
+    transcript_count = 0
+    store = TranscriptStore(transcripts_path)
 
-    for i, video_id in enumerate(video_ids, 1):
-        print(f"\n[{i}/{len(video_ids)}] 处理视频: {video_id}")
+    limiter = HostRateLimiter(REQUESTS_PER_SECOND, max(REQUEST_BURST, max_workers))
+    ledger = JobLedger(ledger_path) if ledger_path else None
+    total = len(video_ids)
 
-        # 下载元数据和视频
-        output_location = VIDEOS_DIR if download_video else TRANSCRIPTS_DIR
-        info = download_video_metadata(video_id, output_location, download_video, video_quality)
+    def run(item):
+        i, video_id = item
+        try:
+            return process_one_video(video_id, download_video, video_quality, limiter, f"{i}/{total}", ledger,
+                                     cache, media_queue)
+        except Exception as e:
+            print(f"  ❌ 处理 {video_id} 出错: {e}")
+            if ledger:
+                ledger.fail(video_id, f"{type(e).__name__}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # executor.map 按提交顺序返回结果，保证输出顺序稳定
+        for result in executor.map(run, enumerate(video_ids, 1)):
+            if not result:
+                continue
 
-        if info:
-            # 提取视频信息
-            video_data = extract_video_info(info)
+            video_data, channel_data, transcript_record = result
             all_videos.append(video_data)
 
-            # 提取频道信息
-            channel_id = info.get('channel_id')
-            if channel_id and channel_id not in all_channels:
-                channel_data = extract_channel_info(info)
-                all_channels[channel_id] = channel_data
-
-            # 提取字幕信息
-            transcript_data = extract_transcript_info(
-                info.get('subtitles') or info.get('automatic_captions'),
-                video_id
-            )
-
-            if transcript_data:
-                all_transcripts.append({
-                    'video_id': video_id,
-                    'transcripts': transcript_data
-                })
+            if channel_data and channel_data['channel_id'] not in all_channels:
+                all_channels[channel_data['channel_id']] = channel_data
+
+            if transcript_record:
+                store.append(transcript_record)
+                transcript_count += 1
+
+    store.close()
+
+    if ledger:
+        print(f"\n📒 任务账本: {ledger.summary()}")
+        failures = ledger.failures()
+        if failures:
+            print(f"   ❌ 失败 {len(failures)} 个，重新运行会自动重试")
+        ledger.close()
+
+    return all_videos, all_channels, transcript_count
+
+
+# ============================================================================
+# 仅字幕模式
+# ============================================================================
+
+_thread_local = threading.local()
+
+
+def _transcript_ydl():
+    """每个线程复用一个轻量的 YoutubeDL（不下载、不写任何文件）"""
+    ydl = getattr(_thread_local, 'ydl', None)
+    if ydl is None:
+        ydl = yt_dlp.YoutubeDL({
+            'skip_download': True,
+            'quiet': True,
+            'no_warnings': True,
+        })
+        _thread_local.ydl = ydl
+    return ydl
+
+
+def fetch_transcripts(video_id, langs=SUBTITLE_LANGS, limiter=None, stats=None, cache=None):
+    """
+    只获取一个视频的字幕：解析观看页拿到字幕轨道URL（process=False，跳过格式选择），
+    再直接下载 json3 并在内存里解析，不落盘
+
+    Args:
+        stats: 传入 dict 时累计字幕压缩前后的大小（COMPACT_CAPTIONS 开启时）
+        cache: ResponseCache，观看页解析结果和字幕内容走缓存（命中时不限速）
+
+    Returns:
+        [{'language': ..., 'segments': [...]}, ...]
+    """
+    ydl = _transcript_ydl()
+    info = extract_watch_info(ydl, video_id, cache, limiter)
+
+    transcripts = []
+    for lang, track_url in select_caption_tracks(info, langs):
+        track_key = {'id': video_id, 'lang': lang}
+        body = cache.get('yt-dlp', 'timedtext', track_key) if cache else None
+        if body is None:
+            if limiter:
+                limiter.acquire(track_url)
+            with metrics.timer('ytdlp_call_seconds', op='timedtext'), ydl.urlopen(track_url) as response:
+                body = response.read()
+            metrics.inc('bytes_downloaded', len(body), source='timedtext')
+            if cache:
+                cache.put('yt-dlp', 'timedtext', track_key, body)
+        segments = parse_json3(body, compact=COMPACT_CAPTIONS, stats=stats)
+        if segments is not None:
+            transcripts.append({
+                'language': lang,
+                'segments': segments
+            })
+    return transcripts
 
-            # 保存完整的JSON信息（清理后）
-            json_path = os.path.join(METADATA_DIR, f"{video_id}_full.json")
-            with open(json_path, 'w', encoding='utf-8') as f:
-                cleaned_info = clean_info_for_json(info)
-                json.dump(cleaned_info, f, ensure_ascii=False, indent=2)
 
-        # 避免请求过快
-        time.sleep(2 if download_video else 1)
+def harvest_transcripts(video_ids, max_workers=TRANSCRIPT_WORKERS, langs=SUBTITLE_LANGS,
+                        transcripts_path=TRANSCRIPTS_JSONL, ledger_path=LEDGER_PATH, cache=None):
+    """
+    仅字幕模式：高并发抓取字幕，每个视频完成后直接追加到字幕存储；
+    已经在存储里的视频和账本里记为没有字幕的视频跳过
+
+    Returns:
+        (本次新写入的视频数, 没有字幕的视频数, 失败数)
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    store = TranscriptStore(transcripts_path)
+    ledger = JobLedger(ledger_path) if ledger_path else None
+    limiter = HostRateLimiter(TRANSCRIPT_REQUESTS_PER_SECOND, max(1, max_workers // 2))
+
+    no_subtitles = ledger.in_state(job_ledger.NO_SUBTITLES) if ledger else set()
+    todo = [video_id for video_id in video_ids if video_id not in store and video_id not in no_subtitles]
+    print(f"\n📝 仅字幕模式: {len(todo)} 个视频待处理（已有 {len(video_ids) - len(todo)} 个，"
+          f"其中没有字幕 {len(no_subtitles & set(video_ids))} 个），并发数 {max_workers}")
+
+    def run(item):
+        i, video_id = item
+        outcome, record = harvest_one(video_id, langs, limiter, cache, ledger, f"{i}/{len(todo)}")
+        if record:
+            store.append(record)
+            if ledger:
+                ledger.mark(video_id, job_ledger.SUBTITLES_DONE)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        outcomes = list(executor.map(run, enumerate(todo, 1)))
+    for outcome in ('ok', 'empty', 'failed'):
+        metrics.inc('transcripts', outcomes.count(outcome), result=outcome)
+
+    store.close()
+    if ledger:
+        ledger.close()
+    return outcomes.count('ok'), outcomes.count('empty'), outcomes.count('failed')
+
+
+def harvest_one(video_id, langs=SUBTITLE_LANGS, limiter=None, cache=None, ledger=None, position=None):
+    """
+    仅字幕模式下处理一个视频；成功时由调用方写入字幕存储后再标记 SUBTITLES_DONE
+
+    Returns:
+        (outcome, record)：outcome 为 'ok' / 'empty' / 'failed'，record 只在 'ok' 时有值
+    """
+    prefix = f"[{position}] " if position else ""
+    if ledger:
+        ledger.start(video_id)
+    stats = {}
+    try:
+        transcripts = fetch_transcripts(video_id, langs, limiter, stats, cache)
+    except Exception as e:
+        print(f"  ❌ {prefix}{video_id} 失败: {e}")
+        if ledger:
+            ledger.fail(video_id, f"{type(e).__name__}: {e}")
+        return 'failed', None
+
+    if not transcripts:
+        print(f"  ⚪ {prefix}{video_id} 没有字幕")
+        if ledger:
+            ledger.mark(video_id, job_ledger.NO_SUBTITLES)
+        return 'empty', None
+
+    report = f"（压缩 {format_compaction(stats)}）" if stats else ""
+    print(f"  ✅ {prefix}{video_id}: {sum(len(t['segments']) for t in transcripts)} 段{report}")
+    return 'ok', {'video_id': video_id, 'transcripts': transcripts}
+
+
+def start_media_queue(cache=None, expected=None):
+    """创建媒体存储（登记已有文件）并启动后台媒体下载队列；返回 (media_queue, media_store)"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    media_store = MediaStore(VIDEOS_DIR, MEDIA_INDEX_PATH,
+                             budget_bytes=MEDIA_BUDGET_GB * 1024 ** 3 if MEDIA_BUDGET_GB else None)
+    registered = media_store.sync()
+    if registered:
+        print(f"📦 已把 {registered} 个已有视频文件登记到索引: {MEDIA_INDEX_PATH}")
+    media_queue = MediaQueue(
+        VIDEOS_DIR,
+        workers=MEDIA_WORKERS,
+        rate_limit=MEDIA_RATE_LIMIT_MB * 1024 ** 2 if MEDIA_RATE_LIMIT_MB else None,
+        max_quality=VIDEO_QUALITY,
+        expected=expected,
+        ledger_path=LEDGER_PATH,
+        extract_info=lambda ydl, video_id: extract_watch_info(ydl, video_id, cache),
+        store=media_store,
+    ).start()
+    return media_queue, media_store
+
+
+def print_media_stats(media_stats):
+    print(f"🎬 媒体下载: 完成 {media_stats['done']} 个（{media_stats['bytes'] / 1024 ** 3:.2f} GB，"
+          f"其中 {media_stats['linked']} 个和已有文件相同），已存在 {media_stats['skipped']} 个，"
+          f"超出预算 {media_stats['over_budget']} 个，失败 {media_stats['failed']} 个")
+
+
+def enrich_channel_rows(channels, cache=None):
+    """ENRICH_CHANNELS 开启时补全频道信息；失败不影响保存其他结果"""
+    if not ENRICH_CHANNELS or not channels:
+        return
+    print(f"\n🏷️  频道补全: {len(channels)} 个频道")
+    try:
+        enrichment = enrich_channels(channels, YOUTUBE_API_KEY or default_api_key(), API_BASE,
+                                     previous_csv=os.path.join(OUTPUT_DIR, "channels_detailed.csv"),
+                                     ttl_hours=CHANNEL_TTL_HOURS, cache=cache)
+        print(f"✅ {format_enrichment(enrichment)}")
+    except Exception as e:
+        print(f"❌ 频道补全失败: {e}")
 
-    return all_videos, all_channels, all_transcripts
 
+def union_fieldnames(rows):
+    """所有行的列（按第一次出现的顺序）；行之间列不一致时 DictWriter 不会报错，缺的列留空"""
+    return list(dict.fromkeys(field for row in rows for field in row))
+
+
+def save_results(videos, channels, transcript_count, media_store=None):
+    """
+    保存处理结果为CSV和JSON（字幕已在处理过程中写入 TRANSCRIPTS_JSONL）
 
-def save_results(videos, channels, transcripts):
-    """保存处理结果为CSV和JSON"""
+    视频文件大小从 media_store 的索引读取，不遍历视频目录
+    """
 
     # 1. 保存视频信息为CSV
     if videos:
         csv_path = os.path.join(OUTPUT_DIR, "videos_detailed.csv")
         with open(csv_path, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.DictWriter(f, fieldnames=videos[0].keys())
+            writer = csv.DictWriter(f, fieldnames=union_fieldnames(videos))
             writer.writeheader()
             writer.writerows(videos)
         print(f"\n💾 视频信息已保存: {csv_path}")
@@ -402,36 +809,42 @@ def save_results(videos, channels, transcripts):
         csv_path = os.path.join(OUTPUT_DIR, "channels_detailed.csv")
         channel_list = list(channels.values())
         with open(csv_path, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.DictWriter(f, fieldnames=channel_list[0].keys())
+            writer = csv.DictWriter(f, fieldnames=union_fieldnames(channel_list))
             writer.writeheader()
             writer.writerows(channel_list)
         print(f"💾 频道信息已保存: {csv_path}")
 
-    # 3. 保存字幕信息为JSON（CSV不适合存储层级数据）
-    if transcripts:
-        json_path = os.path.join(OUTPUT_DIR, "transcripts_all.json")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(transcripts, f, ensure_ascii=False, indent=2)
-        print(f"💾 字幕信息已保存: {json_path}")
+    # 3. 字幕信息已经边处理边追加为 JSON Lines（CSV不适合存储层级数据）
+    if transcript_count:
+        print(f"💾 字幕信息已保存: {TRANSCRIPTS_JSONL}")
+
+    if WRITE_WAREHOUSE and (videos or channels):
+        with Warehouse(WAREHOUSE_PATH) as warehouse:
+            warehouse.load_videos(videos)
+            warehouse.load_channels(channels.values())
+        print(f"🗃️  数据仓库已更新: {WAREHOUSE_PATH}")
+
+    write_summary(videos, channels, transcript_count, media_store)
+
 
-    # 4. 计算视频文件总大小
+def write_summary(videos, channels, transcript_count, media_store=None):
+    """生成 summary.json；媒体队列下载完之后会再调用一次，更新视频文件大小"""
+    # 4. 视频文件总大小（索引里的统计；硬链接去重的文件只算一次）
     total_size_mb = 0
-    if DOWNLOAD_VIDEO and os.path.exists(VIDEOS_DIR):
-        for root, dirs, files in os.walk(VIDEOS_DIR):
-            for file in files:
-                if file.endswith('.mp4'):
-                    filepath = os.path.join(root, file)
-                    total_size_mb += os.path.getsize(filepath) / (1024 * 1024)
+    media_stats = media_store.summary() if media_store else None
+    if DOWNLOAD_VIDEO and media_stats:
+        total_size_mb = media_stats['used_bytes'] / (1024 * 1024)
 
     # 5. 生成摘要报告
     summary = {
         'timestamp': datetime.now().isoformat(),
         'total_videos': len(videos),
         'total_channels': len(channels),
-        'videos_with_transcripts': len(transcripts),
+        'videos_with_transcripts': transcript_count,
         'downloaded_videos': DOWNLOAD_VIDEO,
         'video_quality': VIDEO_QUALITY if DOWNLOAD_VIDEO else 'N/A',
         'total_video_size_mb': round(total_size_mb, 2) if DOWNLOAD_VIDEO else 0,
+        'deduplicated_video_size_mb': round(media_stats['saved_bytes'] / (1024 * 1024), 2) if media_stats else 0,
         'statistics': {
             'videos_with_subtitles': sum(1 for v in videos if v['has_subtitles']),
             'videos_with_auto_captions': sum(1 for v in videos if v['has_automatic_captions']),
@@ -450,6 +863,25 @@ def save_results(videos, channels, transcripts):
         print(f"\n📦 视频文件总大小: {total_size_mb:.2f} MB ({total_size_mb/1024:.2f} GB)")
 
 
+def default_api_key():
+    from step1_search import YOUTUBE_API_KEY
+    return YOUTUBE_API_KEY
+
+
+def write_run_report():
+    report = metrics.write_report(RUN_REPORT_JSON, csv_path=RUN_REPORT_CSV, prom_path=PROMETHEUS_TEXTFILE, extra={
+        'step': 'step2',
+        'config': {
+            'transcript_only': TRANSCRIPT_ONLY,
+            'download_video': DOWNLOAD_VIDEO,
+            'max_workers': TRANSCRIPT_WORKERS if TRANSCRIPT_ONLY else MAX_WORKERS,
+            'media_workers': MEDIA_WORKERS,
+            'requests_per_second': TRANSCRIPT_REQUESTS_PER_SECOND if TRANSCRIPT_ONLY else REQUESTS_PER_SECOND,
+        },
+    })
+    metrics.print_summary(report)
+
+
 def main():
     print("=" * 70)
     print("YouTube 下载测试 - 第二步：使用yt-dlp获取所有维度")
@@ -459,8 +891,13 @@ def main():
     print(f"   输出目录: {OUTPUT_DIR}")
     print(f"   测试数量: 前 {TEST_LIMIT} 个视频")
     print(f"   下载视频: {'是' if DOWNLOAD_VIDEO else '否（仅元数据）'}")
+    if TRANSCRIPT_ONLY:
+        print(f"   仅字幕模式: 是（并发数 {TRANSCRIPT_WORKERS}）")
+    print(f"   并发数: {MAX_WORKERS}")
     if DOWNLOAD_VIDEO:
         print(f"   视频质量: {VIDEO_QUALITY}")
+        print(f"   媒体队列: {MEDIA_WORKERS} 个并发，带宽上限 {MEDIA_RATE_LIMIT_MB or '不限'} MB/s，"
+              f"存储预算 {MEDIA_BUDGET_GB or '不限'} GB")
         print(f"\n   ⚠️  下载10个高清视频预计需要:")
         print(f"      - 时间: 10-30分钟（取决于网速和视频长度）")
         print(f"      - 空间: 1-5 GB（取决于视频质量和长度）")
@@ -475,14 +912,51 @@ def main():
 
     print(f"✅ 读取到 {len(video_ids)} 个视频ID")
 
+    cache = ResponseCache() if USE_RESPONSE_CACHE else None
+
+    if TRANSCRIPT_ONLY:
+        with metrics.stage('transcripts'):
+            written, empty, failed = harvest_transcripts(video_ids, TRANSCRIPT_WORKERS, SUBTITLE_LANGS, cache=cache)
+        if cache is not None:
+            print(f"\n🗄️  响应缓存: {cache.report()}")
+            cache.close()
+        write_run_report()
+        print("\n" + "=" * 70)
+        print("✅ 字幕抓取完成!")
+        print("=" * 70)
+        print(f"   新增字幕: {written} 个，无字幕: {empty} 个，失败: {failed} 个")
+        print(f"   字幕数据: {TRANSCRIPTS_JSONL}")
+        return
+
     # 2. 处理视频
-    videos, channels, transcripts = process_videos(video_ids, DOWNLOAD_VIDEO, VIDEO_QUALITY)
+    media_queue = media_store = None
+    if DOWNLOAD_VIDEO:
+        media_queue, media_store = start_media_queue(cache, expected=len(video_ids))
 
-    # 3. 保存结果
+    with metrics.stage('videos'):
+        videos, channels, transcript_count = process_videos(video_ids, DOWNLOAD_VIDEO, VIDEO_QUALITY, MAX_WORKERS,
+                                                            cache=cache, media_queue=media_queue)
+
+    enrich_channel_rows(channels, cache)
+
+    # 3. 保存结果（不等视频下载完）
     print("\n" + "=" * 70)
     print("保存结果")
     print("=" * 70)
-    save_results(videos, channels, transcripts)
+    with metrics.stage('save'):
+        save_results(videos, channels, transcript_count, media_store)
+
+    if media_queue is not None:
+        print(f"\n⏳ 元数据和字幕已完成，等待媒体队列下载剩余 {media_queue.pending()} 个视频...")
+        with metrics.stage('media'):
+            media_stats = media_queue.join()
+        print_media_stats(media_stats)
+        write_summary(videos, channels, transcript_count, media_store)
+        media_store.close()
+    if cache is not None:
+        print(f"\n🗄️  响应缓存: {cache.report()}")
+        cache.close()
+    write_run_report()
 
     # 4. 打印统计
     print("\n" + "=" * 70)
@@ -491,14 +965,20 @@ def main():
     print(f"\n📊 统计:")
     print(f"   成功处理: {len(videos)}/{len(video_ids)} 个视频")
     print(f"   涉及频道: {len(channels)} 个")
-    print(f"   有字幕的: {len(transcripts)} 个")
+    print(f"   有字幕的: {transcript_count} 个")
 
     print(f"\n📁 输出文件:")
     print(f"   - 视频详情: {OUTPUT_DIR}/videos_detailed.csv")
     print(f"   - 频道详情: {OUTPUT_DIR}/channels_detailed.csv")
-    print(f"   - 字幕数据: {OUTPUT_DIR}/transcripts_all.json")
+    print(f"   - 字幕数据: {TRANSCRIPTS_JSONL}")
     print(f"   - 摘要报告: {OUTPUT_DIR}/summary.json")
-    print(f"   - 完整JSON: {METADATA_DIR}/[video_id]_full.json")
+    print(f"   - 运行报告: {RUN_REPORT_JSON}")
+    if METADATA_MODE == 'full':
+        print(f"   - 完整JSON: {METADATA_DIR}/[video_id]_full.json")
+    else:
+        print(f"   - 元数据JSON: {METADATA_DIR}/[video_id]_meta.json")
+    if METADATA_MODE == 'split':
+        print(f"   - 大字段(gzip): {METADATA_DIR}/[video_id]_heavy.json.gz")
     if DOWNLOAD_VIDEO:
         print(f"   - 视频文件: {VIDEOS_DIR}/[video_id]/[video_id].mp4")
         print(f"   - 字幕文件: {VIDEOS_DIR}/[video_id]/[video_id].en.json3")
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# 模块都在仓库根目录，测试直接 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_youtube_api import start_fake_server  # noqa: E402
+
+
+@pytest.fixture
+def fake_api():
+    """启动一个假 API 服务器，返回工厂函数 fake_api(**kwargs) -> (server, base_url)"""
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_fake_server(**kwargs)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
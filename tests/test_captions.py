@@ -0,0 +1,29 @@
+from captions import compact_segments, iter_merged_words, trim_overlap
+
+
+def test_trim_overlap_keeps_a_bounded_tail():
+    tail = []
+    assert trim_overlap(tail, ['so', 'what', 'is']) == ['so', 'what', 'is']
+    assert trim_overlap(tail, ['what', 'is', 'inflation']) == ['inflation']
+    assert trim_overlap(tail, ['inflation', 'really']) == ['inflation', 'really']  # 只重叠 1 个词，不算滚动
+    assert tail == ['so', 'what', 'is', 'inflation', 'inflation', 'really']
+
+    trim_overlap(tail, [str(i) for i in range(40)], window=32)
+    assert len(tail) == 32
+
+
+def test_rolling_captions_merge_the_same_way_in_both_paths():
+    segments = [
+        {'start_ms': 0, 'end_ms': 3000, 'text': 'so what is'},
+        {'start_ms': 1500, 'end_ms': 4000, 'text': 'so what is\ninflation'},
+        {'start_ms': 3000, 'end_ms': 5000, 'text': '\n'},
+        {'start_ms': 3500, 'end_ms': 6000, 'text': 'is inflation exactly'},
+        {'start_ms': 5000, 'end_ms': 7000, 'text': 'very very high'},
+    ]
+
+    compacted = compact_segments(segments)
+    merged = list(iter_merged_words(segment['text'] for segment in segments))
+
+    assert [segment['text'] for segment in compacted] == ['so what is', 'inflation', 'exactly', 'very very high']
+    assert ' '.join(segment['text'] for segment in compacted).split() == merged
+    assert [(s['start_ms'], s['end_ms']) for s in compacted] == [(0, 1500), (1500, 3500), (3500, 5000), (5000, 7000)]
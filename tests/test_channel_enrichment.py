@@ -0,0 +1,53 @@
+import csv
+
+import pytest
+
+from channel_enrichment import ENRICHED_FIELDS, enrich_channels
+from step2 import union_fieldnames
+
+
+def channel_rows(n):
+    return {f'UC{i:022d}': {'channel_id': f'UC{i:022d}', 'channel_name': f'Channel {i}'} for i in range(n)}
+
+
+def test_failed_batch_keeps_other_batches(fake_api):
+    # 配额只够一批：两批中一批成功，另一批收到 quotaExceeded
+    server, base_url = fake_api(quota_limit=1)
+    channels = channel_rows(100)
+
+    stats = enrich_channels(channels, 'test-key', base_url, max_concurrency=1)
+
+    assert stats['fetched'] == 50
+    assert stats['failed'] == 50
+    assert stats['missing'] == 0
+    enriched = [row for row in channels.values() if row['enriched_at']]
+    assert len(enriched) == 50
+    assert all(set(ENRICHED_FIELDS) <= set(row) for row in channels.values())
+
+
+def test_rows_are_normalized_when_the_request_fails(monkeypatch):
+    import channel_enrichment
+
+    def broken_run(coro):
+        coro.close()
+        raise RuntimeError('event loop is closed')
+
+    monkeypatch.setattr(channel_enrichment.asyncio, 'run', broken_run)
+    channels = channel_rows(3)
+    with pytest.raises(RuntimeError):
+        enrich_channels(channels, 'test-key', 'http://127.0.0.1:9')
+    assert all(set(ENRICHED_FIELDS) <= set(row) for row in channels.values())
+
+
+def test_union_fieldnames_writes_rows_with_different_columns(tmp_path):
+    rows = [{'channel_id': 'a'}, {'channel_id': 'b', 'country': 'US'}]
+    fieldnames = union_fieldnames(rows)
+    assert fieldnames == ['channel_id', 'country']
+
+    path = tmp_path / 'channels.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(path, newline='', encoding='utf-8') as f:
+        assert list(csv.DictReader(f)) == [{'channel_id': 'a', 'country': ''}, {'channel_id': 'b', 'country': 'US'}]
@@ -0,0 +1,33 @@
+import json
+
+from step2 import clean_info_for_json
+
+
+def test_unserializable_values_are_dropped_and_clean_subtrees_reused():
+    formats = [{'format_id': '18', 'ext': 'mp4'}]
+    info = {'id': 'abc', 'formats': formats, 'downloader': object(), 'tags': ('a', object(), 'b')}
+
+    cleaned = clean_info_for_json(info)
+
+    assert cleaned == {'id': 'abc', 'formats': formats, 'tags': ('a', 'b')}
+    assert cleaned['formats'] is formats
+    assert 'downloader' in info  # 原对象不变
+
+
+def test_self_references_are_dropped():
+    info = {'id': 'abc', 'entries': []}
+    info['self'] = info
+    info['entries'].append({'parent': info, 'title': 'first'})
+    info['entries'].append(info['entries'])
+
+    cleaned = clean_info_for_json(info)
+
+    assert cleaned == {'id': 'abc', 'entries': [{'title': 'first'}]}
+    json.dumps(cleaned)
+
+
+def test_shared_references_that_are_not_cycles_are_kept():
+    thumbnail = {'url': 'https://example.com/t.jpg'}
+    info = {'thumbnails': [thumbnail, thumbnail], 'thumbnail': thumbnail}
+
+    assert clean_info_for_json(info) == info
@@ -0,0 +1,63 @@
+import csv
+import json
+
+from merge_transcripts import MERGED_FIELDS, load_merged_ids, prepare_for_append
+
+
+def record(video_id, text):
+    return {'video_id': video_id, 'transcripts': [
+        {'language': 'en', 'segments': [{'start_ms': 0, 'end_ms': 1000, 'text': text}]}
+    ]}
+
+
+def append_row(path, row):
+    """和 Pipeline.run 一样追加一行"""
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MERGED_FIELDS)
+        if f.tell() == 0:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def read_rows(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def new_row(video_id):
+    return {'video_id': video_id, 'language': 'en', 'segment_count': 1, 'word_count': 2,
+            'full_transcript': 'hello world'}
+
+
+def test_legacy_notebook_output_is_set_aside_and_rebuilt(tmp_path):
+    merged = tmp_path / 'merged_transcripts.csv'
+    merged.write_bytes('\ufeffvideo_id,full_transcript,,,\r\nold1,some text,,,'.encode('utf-8'))
+    store = tmp_path / 'transcripts_all.jsonl'
+    store.write_text(''.join(json.dumps(record(v, f'text of {v}')) + '\n' for v in ('a', 'b')), encoding='utf-8')
+
+    assert prepare_for_append(str(merged), str(store)) == {'a', 'b'}
+    append_row(merged, new_row('c'))
+
+    assert [row['video_id'] for row in read_rows(merged)] == ['a', 'b', 'c']
+    assert (tmp_path / 'merged_transcripts.legacy.csv').read_bytes().endswith(b'old1,some text,,,')
+
+
+def test_bom_file_without_trailing_newline_appends_cleanly(tmp_path):
+    merged = tmp_path / 'merged_transcripts.csv'
+    header = ','.join(MERGED_FIELDS)
+    merged.write_bytes(f'\ufeff{header}\r\na,en,1,2,hello world'.encode('utf-8'))
+
+    assert prepare_for_append(str(merged)) == {'a'}
+    append_row(merged, new_row('b'))
+
+    rows = read_rows(merged)
+    assert [row['video_id'] for row in rows] == ['a', 'b']
+    assert rows[0]['full_transcript'] == 'hello world'
+    assert load_merged_ids(str(merged)) == {'a', 'b'}
+
+
+def test_missing_file_gets_a_header(tmp_path):
+    merged = tmp_path / 'merged_transcripts.csv'
+    assert prepare_for_append(str(merged)) == set()
+    append_row(merged, new_row('a'))
+    assert [row['video_id'] for row in read_rows(merged)] == ['a']
@@ -0,0 +1,24 @@
+from metadata_store import full_path, load_metadata, meta_path, save_metadata
+
+INFO = {'id': 'v1', 'title': 'fresh', 'formats': [{'format_id': '18'}]}
+
+
+def test_truncated_meta_falls_back_to_full(tmp_path):
+    save_metadata(INFO, str(tmp_path), 'v1', mode='full')
+    with open(meta_path(str(tmp_path), 'v1'), 'w', encoding='utf-8') as f:
+        f.write('{"id": "v1", "tit')  # 写到一半被杀
+
+    assert load_metadata(str(tmp_path), 'v1')['title'] == 'fresh'
+
+    with open(full_path(str(tmp_path), 'v1'), 'w', encoding='utf-8') as f:
+        f.write('')
+    assert load_metadata(str(tmp_path), 'v1') is None
+
+
+def test_configured_mode_is_read_first(tmp_path):
+    save_metadata(dict(INFO, title='stale'), str(tmp_path), 'v1', mode='slim')
+    save_metadata(INFO, str(tmp_path), 'v1', mode='full')
+
+    assert load_metadata(str(tmp_path), 'v1', mode='full')['title'] == 'fresh'
+    assert load_metadata(str(tmp_path), 'v1', mode='slim')['title'] == 'stale'
+    assert load_metadata(str(tmp_path), 'missing', mode='full') is None
@@ -0,0 +1,59 @@
+import csv
+import random
+
+from near_duplicates import NearDuplicateIndex
+
+VOCABULARY = [f'word{i}' for i in range(2000)]
+
+
+def transcripts(text):
+    return [{'language': 'en', 'is_auto': False, 'segments': [{'start_ms': 0, 'end_ms': 1000, 'text': text}]}]
+
+
+def random_text(seed, n=200):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(n))
+
+
+def test_near_duplicates_are_found(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'nd.sqlite'))
+    text = random_text(1)
+    assert index.add_video('original', transcripts(text)) == []
+    assert index.add_video('unrelated', transcripts(random_text(2))) == []
+
+    found = index.add_video('reupload', transcripts(text + ' subscribe'))
+
+    assert [video_id for video_id, _ in found] == ['original']
+    assert index.redundant_ids() == {'reupload'}
+    index.close()
+
+
+def test_short_transcripts_are_skipped(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'nd.sqlite'))
+    for i in range(5):
+        assert index.add_video(f'music{i}', transcripts('[Music]')) is None
+    assert index.add_video('short', transcripts('thanks for watching see you next time')) is None
+
+    assert len(index) == 0
+    assert index.clusters() == []
+    index.close()
+
+
+def test_large_clusters_are_queried_in_chunks(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'nd.sqlite'))
+    video_ids = [f'v{i:04d}' for i in range(1000)]
+    for i, video_id in enumerate(video_ids):
+        index.add_video(video_id, transcripts(random_text(i)), commit=False)
+    # 人为把 1000 个视频连成一个簇（超过 SQLite 的参数上限）
+    index._conn.executemany("INSERT INTO pairs (video_a, video_b, similarity) VALUES (?, ?, 1.0)",
+                            [(video_ids[0], video_id) for video_id in video_ids[1:]])
+    index._conn.commit()
+
+    assert len(index._signatures(video_ids)) == 1000
+    csv_path = tmp_path / 'clusters.csv'
+    assert index.write_clusters(str(csv_path)) == 1
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['video_id'] for row in rows] == video_ids
+    assert all(row['canonical_video_id'] == 'v0000' for row in rows)
+    index.close()
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from response_cache import CacheMissError, ResponseCache
+from youtube_async import AsyncYouTubeClient
+
+
+async def search_ids(client, query):
+    return [video_id async for ids in client.iter_search_pages(query, 120) for video_id in ids]
+
+
+def test_recorded_responses_replay_offline(fake_api, tmp_path):
+    server, base_url = fake_api(results_per_query=120)
+    cache = ResponseCache(str(tmp_path))
+    client = AsyncYouTubeClient('test-key', base_url=base_url, cache=cache)
+    recorded = asyncio.run(search_ids(client, 'inflation'))
+    details = asyncio.run(client.list_videos(recorded[:50]))
+    cache.close()
+    requests_made = sum(server.request_counts.values())
+
+    offline = ResponseCache(str(tmp_path), offline=True)
+    replay = AsyncYouTubeClient('other-key', base_url=base_url, cache=offline)
+    assert asyncio.run(search_ids(replay, 'inflation')) == recorded
+    assert asyncio.run(replay.list_videos(recorded[:50])) == details
+    assert sum(server.request_counts.values()) == requests_made
+    assert replay.total_quota == 0
+    assert replay.cache_hits == {'search': 3, 'videos': 1}
+    offline.close()
+
+
+def test_offline_cache_miss_raises(tmp_path):
+    cache = ResponseCache(str(tmp_path), offline=True)
+    client = AsyncYouTubeClient('test-key', base_url='http://127.0.0.1:9', cache=cache)
+
+    with pytest.raises(CacheMissError):
+        asyncio.run(search_ids(client, 'never recorded'))
+    assert client.calls == {}
+    cache.close()
+
+
+def test_zero_ttl_refetches_but_still_records(fake_api, tmp_path):
+    server, base_url = fake_api(results_per_query=50)
+    cache = ResponseCache(str(tmp_path), ttls={'search': 0})
+    client = AsyncYouTubeClient('test-key', base_url=base_url, cache=cache)
+
+    first = asyncio.run(search_ids(client, 'inflation'))
+    second = asyncio.run(search_ids(client, 'inflation'))
+    assert first == second
+    assert server.request_counts['search'] == 2
+    assert client.cache_hits['search'] == 0
+    cache.close()
+
+    offline = ResponseCache(str(tmp_path), ttls={'search': 0}, offline=True)
+    replay = AsyncYouTubeClient('test-key', base_url=base_url, cache=offline)
+    assert asyncio.run(search_ids(replay, 'inflation')) == first
+    offline.close()
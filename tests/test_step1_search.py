@@ -0,0 +1,79 @@
+import asyncio
+
+from seen_index import SeenIndex
+from step1_search import backfill_details, is_stale, refresh_statistics_async, search_grid_async
+from youtube_async import AsyncYouTubeClient, YouTubeApiError
+
+
+class StubClient:
+    """只返回 available 里的视频；failing 里的 ID 所在批次请求失败"""
+
+    def __init__(self, available, failing=()):
+        self.available = set(available)
+        self.failing = set(failing)
+
+    async def list_videos(self, video_ids, part=None):
+        if self.failing & set(video_ids):
+            raise YouTubeApiError(500, 'backendError')
+        return [{'id': i, 'statistics': {'viewCount': '10', 'likeCount': '2', 'commentCount': '1'}}
+                for i in video_ids if i in self.available]
+
+
+def stale_rows(ids):
+    return {i: {'video_id': i, 'view_count': '1', 'like_count': '0', 'comment_count': '0', 'stats_updated_at': ''}
+            for i in ids}
+
+
+def test_missing_ids_are_stamped_so_they_are_not_refetched():
+    rows = stale_rows(['a', 'b', 'gone'])
+    client = StubClient(available=['a', 'b'])
+
+    refreshed, gone = asyncio.run(refresh_statistics_async(client, rows, 'videos', ttl_hours=24))
+
+    assert (refreshed, gone) == (2, 1)
+    assert rows['a']['view_count'] == '10'
+    assert rows['gone']['view_count'] == '1'
+    assert not any(is_stale(row, 24) for row in rows.values())
+
+
+def test_failed_batch_is_left_stale():
+    ids = [f'v{i:03d}' for i in range(60)]
+    rows = stale_rows(ids)
+    client = StubClient(available=ids, failing=['v055'])
+
+    refreshed, gone = asyncio.run(refresh_statistics_async(client, rows, 'videos', ttl_hours=24))
+
+    assert (refreshed, gone) == (50, 0)
+    assert [i for i in ids if is_stale(rows[i], 24)] == ids[50:]
+
+
+def test_seen_index_skips_detail_requests_across_runs(fake_api, tmp_path):
+    server, base_url = fake_api(results_per_query=120)
+    searches = [('inflation', None, None)]
+
+    async def run(previous_videos, previous_channels):
+        client = AsyncYouTubeClient('test-key', base_url=base_url)
+        index = SeenIndex(str(tmp_path / 'seen.sqlite'))
+        try:
+            result = await search_grid_async(client, searches, 120, index=index)
+            return result, await backfill_details(client, result, previous_videos, previous_channels)
+        finally:
+            index.close()
+
+    (_, first_videos, first_channels), _ = asyncio.run(run({}, {}))
+    assert len(first_videos) == 120
+    detail_requests = server.request_counts['videos']
+
+    # 第二次运行：索引里已有这些视频，不再请求详情，行从上次的结果取
+    previous_videos = {row['video_id']: row for row in first_videos}
+    previous_channels = {row['channel_id']: row for row in first_channels}
+    (_, grid_videos, _), (video_ids, videos, channels) = asyncio.run(run(previous_videos, previous_channels))
+    assert grid_videos == []
+    assert server.request_counts['videos'] == detail_requests
+    assert [row['video_id'] for row in videos] == video_ids == [row['video_id'] for row in first_videos]
+    assert len(channels) == len(first_channels)
+
+    # 上次的行丢了（比如中途配额用完没保存）：补请求
+    _, (_, videos, _) = asyncio.run(run({}, {}))
+    assert len(videos) == 120
+    assert server.request_counts['videos'] == detail_requests + 3
@@ -0,0 +1,103 @@
+import job_ledger
+import step2
+from job_ledger import NO_SUBTITLES, JobLedger
+
+
+def test_videos_without_subtitles_are_not_refetched(tmp_path, monkeypatch):
+    fetched = []
+
+    def fake_fetch(video_id, langs, limiter=None, stats=None, cache=None):
+        fetched.append(video_id)
+        if video_id == 'silent':
+            return []
+        return [{'language': 'en', 'segments': [{'start_ms': 0, 'end_ms': 1000, 'text': 'hello'}]}]
+
+    monkeypatch.setattr(step2, 'fetch_transcripts', fake_fetch)
+    paths = {'transcripts_path': str(tmp_path / 'transcripts.jsonl'), 'ledger_path': str(tmp_path / 'ledger.sqlite')}
+    monkeypatch.setattr(step2, 'OUTPUT_DIR', str(tmp_path))
+
+    assert step2.harvest_transcripts(['a', 'silent'], max_workers=2, **paths) == (1, 1, 0)
+    assert step2.harvest_transcripts(['a', 'silent', 'b'], max_workers=2, **paths) == (1, 0, 0)
+    assert sorted(fetched) == ['a', 'b', 'silent']
+
+    ledger = JobLedger(paths['ledger_path'])
+    assert ledger.get('silent') == NO_SUBTITLES
+    assert ledger.failures() == []
+    ledger.close()
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.queued = []
+
+    def put(self, video_id):
+        self.queued.append(video_id)
+
+
+def test_media_failures_only_retry_the_download(tmp_path, monkeypatch):
+    from media_queue import MediaQueue
+
+    ledger_path = str(tmp_path / 'ledger.sqlite')
+    ledger = JobLedger(ledger_path)
+    ledger.mark('v1', job_ledger.SUBTITLES_DONE)
+
+    def broken_extract(ydl, video_id):
+        raise OSError('connection reset')
+
+    media_queue = MediaQueue(str(tmp_path / 'videos'), workers=1, ledger_path=ledger_path,
+                             extract_info=broken_extract).start()
+    media_queue.put('v1')
+    assert media_queue.join()['failed'] == 1
+    assert ledger.get('v1') == job_ledger.MEDIA_FAILED
+    assert [video_id for video_id, _ in ledger.failures()] == ['v1']
+
+    # 重新运行：不再解析元数据和字幕，只把视频重新交给媒体队列
+    def no_network(*args, **kwargs):
+        raise AssertionError('元数据不应重新下载')
+
+    monkeypatch.setattr(step2, 'download_video_metadata', no_network)
+    monkeypatch.setattr(step2, 'load_saved_info', lambda video_id: {'id': video_id, 'title': 'saved'})
+    retry_queue = RecordingQueue()
+    assert step2.process_one_video('v1', download_video=True, ledger=ledger, media_queue=retry_queue)
+    assert retry_queue.queued == ['v1']
+    ledger.close()
+
+
+class StubYoutubeDL:
+    """只支持缓存命中后的 process_ie_result，不访问网络"""
+
+    def __init__(self, opts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def process_ie_result(self, info, download=True):
+        return info
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.urls = []
+
+    def acquire(self, url):
+        self.urls.append(url)
+
+
+def test_cache_hits_do_not_wait_for_the_rate_limiter(tmp_path, monkeypatch):
+    from response_cache import ResponseCache
+
+    cache = ResponseCache(str(tmp_path / 'cache'))
+    cache.put_json('yt-dlp', 'watch', {'id': 'v1'}, {'id': 'v1', 'title': 'cached'})
+    monkeypatch.setattr(step2.yt_dlp, 'YoutubeDL', StubYoutubeDL)
+    monkeypatch.setattr(step2, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(step2, 'TRANSCRIPTS_DIR', str(tmp_path / 'transcripts'))
+    monkeypatch.setattr(step2, 'METADATA_DIR', str(tmp_path))
+
+    limiter = CountingLimiter()
+    assert step2.process_one_video('v1', download_video=False, limiter=limiter, cache=cache)
+    assert limiter.urls == []
+    cache.close()
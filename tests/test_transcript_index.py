@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from transcript_index import QuerySyntaxError, TranscriptIndex
+
+
+def track(language, texts):
+    return {'language': language, 'segments': [
+        {'start_ms': i * 1000, 'end_ms': (i + 1) * 1000, 'text': text} for i, text in enumerate(texts)
+    ]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    store = tmp_path / 'transcripts.jsonl'
+    records = [
+        {'video_id': 'v1', 'transcripts': [track('en-US', ['money printing is back']),
+                                           track('en', ['money printing is back'])]},
+        {'video_id': 'v2', 'transcripts': [track('en', ['prices keep rising'])]},
+    ]
+    store.write_text(''.join(json.dumps(r) + '\n' for r in records), encoding='utf-8')
+    index = TranscriptIndex(str(tmp_path / 'index.sqlite'))
+    index.add_from_store(str(store), channel_map={'v1': ('UC1', 'One'), 'v2': ('UC2', 'Two')})
+    yield index
+    index.close()
+
+
+def test_one_track_per_video_is_indexed(index):
+    hits = index.search('money printing')
+    assert [(hit['video_id'], hit['start_ms']) for hit in hits] == [('v1', 0)]
+    assert index.count_by_channel('money printing') == [('UC1', 'One', 1)]
+
+
+def test_raw_query_syntax_errors_are_reported(index):
+    assert {hit['video_id'] for hit in index.search('money OR prices', raw=True)} == {'v1', 'v2'}
+    with pytest.raises(QuerySyntaxError):
+        index.search('"unterminated', raw=True)
+    with pytest.raises(QuerySyntaxError):
+        index.count_by_channel('money AND', raw=True)
+    assert index.search('"unterminated') == []  # 短语模式会转义引号
+
+
+def test_phrases_across_segment_boundaries_match_once(tmp_path):
+    index = TranscriptIndex(str(tmp_path / 'index.sqlite'))
+    index.add_video('v1', track('en', ['the fed started money', 'printing again in 2020', 'money printing works'])
+                    ['segments'])
+
+    hits = index.search('money printing')
+    assert sorted(hit['start_ms'] for hit in hits) == [0, 2000]  # 跨边界的从第一个片段算起
+    assert [hit['start_ms'] for hit in index.search('printing again')] == [1000]  # 只在接上的部分里也只返回一次
+    assert [hit['start_ms'] for hit in index.search('in 2020 money')] == [1000]
+    assert index.count_by_channel('money printing') == [('', '', 2)]
+    index.close()
+
+
+def test_build_fills_missing_channels(tmp_path):
+    index = TranscriptIndex(str(tmp_path / 'index.sqlite'))
+    index.add_video('v1', track('en', ['hello'])['segments'])
+    index.add_video('v2', track('en', ['hello'])['segments'], channel_id='UC2', channel_title='Two')
+
+    assert index.fill_channels({'v1': ('UC1', 'One'), 'v2': ('UCX', 'Other')}) == 1
+    assert sorted(index.count_by_channel('hello')) == [('UC1', 'One', 1), ('UC2', 'Two', 1)]
+    index.close()
+
+
+def test_old_index_without_windows_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    import sqlite3
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE VIRTUAL TABLE segments USING fts5(text, video_id UNINDEXED, start_ms UNINDEXED, "
+                 "end_ms UNINDEXED)")
+    conn.execute("INSERT INTO segments VALUES ('old', 'v0', 0, 1)")
+    conn.commit()
+    conn.close()
+
+    index = TranscriptIndex(path)
+    assert len(index) == 0
+    assert index.add_video('v0', track('en', ['new text'])['segments'])
+    index.close()
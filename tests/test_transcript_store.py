@@ -0,0 +1,40 @@
+from transcript_store import TranscriptStore, iter_transcripts, repair_torn_tail
+
+
+def record(video_id):
+    return {'video_id': video_id, 'transcripts': [
+        {'language': 'en', 'segments': [{'start_ms': 0, 'end_ms': 1000, 'text': f'hello {video_id}'}]}
+    ]}
+
+
+def test_torn_last_line_is_truncated_on_open(tmp_path):
+    path = str(tmp_path / 'transcripts.jsonl')
+    with TranscriptStore(path) as store:
+        store.append(record('a'))
+        store.append(record('b'))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"video_id": "c", "transcripts": [{"lang')  # 写到一半进程被杀
+
+    with TranscriptStore(path) as store:
+        assert len(store) == 2
+        assert 'c' not in store
+        assert store.append(record('c'))
+        store.append(record('d'))
+
+    assert [r['video_id'] for r in iter_transcripts(path)] == ['a', 'b', 'c', 'd']
+    with open(path, 'rb') as f:
+        assert f.read().endswith(b'\n')
+
+
+def test_repair_keeps_complete_files(tmp_path):
+    path = tmp_path / 'transcripts.jsonl'
+    path.write_text('{"video_id": "a", "transcripts": []}\n', encoding='utf-8')
+    assert repair_torn_tail(str(path)) == 0
+    assert path.read_text(encoding='utf-8') == '{"video_id": "a", "transcripts": []}\n'
+
+
+def test_repair_single_torn_line_longer_than_chunk(tmp_path):
+    path = tmp_path / 'transcripts.jsonl'
+    path.write_text('{"video_id": "a"' + ' ' * 100, encoding='utf-8')
+    assert repair_torn_tail(str(path), chunk_size=16) == 116
+    assert path.read_bytes() == b''
@@ -0,0 +1,77 @@
+import asyncio
+import socket
+
+import pytest
+
+from step1_search import search_grid_async
+from youtube_async import AsyncYouTubeClient, QuotaExceededError, YouTubeApiError
+
+
+def make_client(base_url, **kwargs):
+    kwargs.setdefault('backoff_base', 0.001)
+    kwargs.setdefault('backoff_max', 0.01)
+    return AsyncYouTubeClient('test-key', base_url=base_url, **kwargs)
+
+
+async def collect_pages(client, query, max_results):
+    return [ids async for ids in client.iter_search_pages(query, max_results)]
+
+
+@pytest.mark.parametrize('status', [429, 403])
+def test_throttled_requests_back_off_and_retry(fake_api, status):
+    server, base_url = fake_api(results_per_query=120, throttle_every=2, throttle_status=status)
+    client = make_client(base_url)
+
+    pages = asyncio.run(collect_pages(client, 'inflation', 120))
+
+    assert sum(len(ids) for ids in pages) == 120
+    assert client.retries['search'] > 0
+    assert client.backoff_seconds > 0
+    assert client.calls['search'] == server.request_counts['search']
+    assert client.limiter.limit < client.limiter.max_limit
+
+
+def test_quota_units_match_requests(fake_api):
+    server, base_url = fake_api(results_per_query=120, throttle_every=5)
+    client = make_client(base_url)
+
+    video_ids, videos, channels = asyncio.run(
+        search_grid_async(client, [('inflation', None, None), ('economy', None, None)], max_results=120))
+
+    assert len(video_ids) == 240
+    assert len(videos) == 240
+    assert client.quota_used['search'] == 100 * server.request_counts['search']
+    assert client.quota_used['videos'] == server.request_counts['videos']
+    assert client.quota_used['channels'] == server.request_counts['channels']
+    assert client.total_quota == server.quota_used
+
+
+def test_quota_exceeded_stops_paging_and_keeps_partial_results(fake_api):
+    # 两页搜索（200）+ 几次详情请求后，第三页搜索超出 250 单位
+    server, base_url = fake_api(results_per_query=500, quota_limit=250)
+    client = make_client(base_url)
+
+    video_ids, videos, channels = asyncio.run(
+        search_grid_async(client, [('inflation', None, None)], max_results=500))
+
+    assert len(video_ids) == 100
+    assert 0 < len(videos) <= 100
+    assert client.quota_exhausted
+    assert server.rejected == {'search': 1}  # 用完之后不再发请求
+
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(client.list_videos(video_ids[:1]))
+    assert server.rejected == {'search': 1}
+
+
+def test_network_errors_are_retried_then_raised():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    client = make_client(f"http://127.0.0.1:{port}", max_retries=2, timeout=2)
+
+    with pytest.raises(YouTubeApiError) as excinfo:
+        asyncio.run(client.list_videos(['abc']))
+
+    assert excinfo.value.status == 0
+    assert client.retries['videos'] == 2
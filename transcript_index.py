@@ -0,0 +1,308 @@
+"""
+字幕全文倒排索引（SQLite FTS5），支持短语查询，结果带视频、频道和时间戳
+
+- 每个视频只索引一条字幕轨道（captions.pick_transcript，和合并、近似重复检测一致），
+  同一段话不会因为 en / en-US 两条轨道各命中一次
+- 以片段为单位索引，每行的文本后面接上下一个片段的前 OVERLAP_WORDS 个单词，跨越片段边界的短语也能查到；
+  查询时只保留匹配从本片段开始的行（完全落在接上的那部分里的匹配由下一行负责），同一处不会返回两次。
+  同一个视频的多个片段命中时每个片段各返回一行，时间戳是匹配开始的片段
+- build 时给之前没有频道信息的视频补上频道（videos.csv / videos_detailed.csv 后来才生成的情况）
+
+用法:
+    python transcript_index.py build                      # 从 transcripts_all.jsonl 增量建索引
+    python transcript_index.py build --merged merged_transcripts.csv
+    python transcript_index.py search "money printing" --limit 20
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from captions import pick_transcript
+from transcript_store import iter_transcripts
+
+INDEX_DB = os.path.join("youtube_downloads_test", "transcript_index.sqlite")
+OVERLAP_WORDS = 12  # 每个片段接上下一个片段的单词数：不超过这个长度的跨边界短语都能查到
+# 第一个匹配从本片段的文本开始（highlight 插入的标记位置不超过 own_len）；否则由下一行返回
+_OWN_MATCH = "instr(highlight(segments, 0, char(2), char(3)), char(2)) <= s.own_len"
+TRANSCRIPTS_JSONL = os.path.join("youtube_downloads_test", "transcripts_all.jsonl")
+
+# 用来补全 video_id -> 频道 的CSV（存在哪个就用哪个）
+CHANNEL_SOURCES = [
+    os.path.join("youtube_results", "videos.csv"),
+    os.path.join("youtube_downloads_test", "videos_detailed.csv"),
+]
+
+
+def load_channel_map(paths=CHANNEL_SOURCES):
+    """从视频CSV读取 {video_id: (channel_id, channel_title)}"""
+    csv.field_size_limit(sys.maxsize)
+    channels = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                video_id = row.get('video_id')
+                if not video_id:
+                    continue
+                old_id, old_title = channels.get(video_id, ('', ''))
+                channels[video_id] = (row.get('channel_id') or old_id, row.get('channel_title') or old_title)
+    return channels
+
+
+class QuerySyntaxError(ValueError):
+    """FTS5 查询语法错误（--raw 模式下用户输入的查询）"""
+
+
+def phrase_query(text):
+    """把普通文本转成 FTS5 短语查询（转义双引号）"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class TranscriptIndex:
+    """
+    Args:
+        path: SQLite 文件路径
+    """
+
+    def __init__(self, path=INDEX_DB):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(segments)")]
+        if columns and 'own_len' not in columns:
+            # 旧版索引没有重叠窗口，FTS5 表不能加列，删掉重建（索引可以从字幕存储重新生成）
+            print(f"⚠️  {path} 是旧版索引，重新建立")
+            self._conn.executescript("DROP TABLE segments; DROP TABLE IF EXISTS videos;")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                channel_id TEXT,
+                channel_title TEXT,
+                language TEXT,
+                segment_count INTEGER NOT NULL,
+                indexed_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos (channel_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+                text,
+                video_id UNINDEXED,
+                start_ms UNINDEXED,
+                end_ms UNINDEXED,
+                own_len UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            """
+        )
+        self._conn.commit()
+
+    def __contains__(self, video_id):
+        row = self._conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def add_video(self, video_id, segments, channel_id='', channel_title='', language='', commit=True):
+        """
+        索引一个视频的片段 [{start_ms, end_ms, text}, ...]；已索引的视频跳过
+
+        每行存 本片段文本 + 下一个片段的前 OVERLAP_WORDS 个单词，own_len 是本片段文本的长度
+
+        Returns:
+            是否新增
+        """
+        if video_id in self:
+            return False
+        segments = [seg for seg in segments if seg.get('text', '').strip()]
+        rows = []
+        for i, seg in enumerate(segments):
+            text = ' '.join(seg['text'].split())
+            following = segments[i + 1]['text'].split()[:OVERLAP_WORDS] if i + 1 < len(segments) else []
+            window = ' '.join([text] + following)
+            rows.append((window, video_id, seg.get('start_ms'), seg.get('end_ms'), len(text)))
+        self._conn.executemany(
+            "INSERT INTO segments (text, video_id, start_ms, end_ms, own_len) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        self._conn.execute(
+            "INSERT INTO videos (video_id, channel_id, channel_title, language, segment_count, indexed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (video_id, channel_id, channel_title, language, len(rows), datetime.now().isoformat()),
+        )
+        if commit:
+            self._conn.commit()
+        return True
+
+    def add_from_store(self, transcripts_path=TRANSCRIPTS_JSONL, channel_map=None):
+        """从字幕存储增量添加（每个视频按语言优先级选一条字幕轨道）；返回新增视频数"""
+        channel_map = channel_map if channel_map is not None else load_channel_map()
+        added = 0
+        for record in iter_transcripts(transcripts_path):
+            video_id = record['video_id']
+            if video_id in self:
+                continue
+            transcript = pick_transcript(record['transcripts'])
+            if transcript is None:
+                continue
+            channel_id, channel_title = channel_map.get(video_id, ('', ''))
+            added += self.add_video(video_id, transcript['segments'], channel_id, channel_title,
+                                    transcript['language'], commit=False)
+            if added and added % 500 == 0:
+                self._conn.commit()
+        self._conn.commit()
+        return added
+
+    def add_from_merged_csv(self, csv_path, channel_map=None):
+        """从 merged_transcripts.csv 添加（整段文本，没有时间戳）；返回新增视频数"""
+        csv.field_size_limit(sys.maxsize)
+        channel_map = channel_map if channel_map is not None else load_channel_map()
+        added = 0
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                video_id = row.get('video_id')
+                if not video_id or video_id in self:
+                    continue
+                segments = [{'start_ms': None, 'end_ms': None, 'text': row.get('full_transcript', '')}]
+                channel_id, channel_title = channel_map.get(video_id, ('', ''))
+                added += self.add_video(video_id, segments, channel_id, channel_title, commit=False)
+        self._conn.commit()
+        return added
+
+    def fill_channels(self, channel_map):
+        """给没有频道信息的已索引视频补上频道（索引时还没有视频CSV），返回更新的视频数"""
+        rows = self._conn.execute(
+            "SELECT video_id FROM videos WHERE channel_id IS NULL OR channel_id = ''").fetchall()
+        updates = [(*channel_map[video_id], video_id) for video_id, in rows if channel_map.get(video_id, ('',))[0]]
+        self._conn.executemany("UPDATE videos SET channel_id = ?, channel_title = ? WHERE video_id = ?", updates)
+        self._conn.commit()
+        return len(updates)
+
+    def _match(self, sql, query, raw, *params):
+        """执行 MATCH 查询；raw 查询语法错误时抛出 QuerySyntaxError"""
+        match = query if raw else phrase_query(query)
+        try:
+            return self._conn.execute(sql, (match, *params)).fetchall()
+        except sqlite3.OperationalError as e:
+            raise QuerySyntaxError(f"{query}: {e}") from e
+
+    def search(self, query, limit=50, raw=False):
+        """
+        查询片段，默认按短语匹配（raw=True 时直接使用 FTS5 语法，如 "money printing" OR transitory；
+        语法错误时抛出 QuerySyntaxError）
+
+        Returns:
+            [{'video_id', 'channel_id', 'channel_title', 'start_ms', 'end_ms', 'snippet'}, ...]，按相关度排序
+        """
+        rows = self._match(
+            f"""
+            SELECT s.video_id, v.channel_id, v.channel_title, s.start_ms, s.end_ms,
+                   snippet(segments, 0, '[', ']', '…', 16)
+            FROM segments s
+            LEFT JOIN videos v ON v.video_id = s.video_id
+            WHERE segments MATCH ? AND {_OWN_MATCH}
+            ORDER BY rank
+            LIMIT ?
+            """,
+            query, raw, limit,
+        )
+        keys = ('video_id', 'channel_id', 'channel_title', 'start_ms', 'end_ms', 'snippet')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def count_by_channel(self, query, raw=False):
+        """每个频道命中的片段数 [(channel_id, channel_title, hits), ...]"""
+        return self._match(
+            f"""
+            SELECT v.channel_id, v.channel_title, COUNT(*) AS hits
+            FROM segments s
+            JOIN videos v ON v.video_id = s.video_id
+            WHERE segments MATCH ? AND {_OWN_MATCH}
+            GROUP BY v.channel_id
+            ORDER BY hits DESC
+            """,
+            query, raw,
+        )
+
+    def optimize(self):
+        """合并 FTS5 的内部段，批量导入后查询更快"""
+        self._conn.execute("INSERT INTO segments(segments) VALUES ('optimize')")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def format_ms(ms):
+    if ms is None:
+        return '--:--'
+    seconds = int(ms) // 1000
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='字幕全文索引')
+    parser.add_argument('--db', default=INDEX_DB, help='索引文件路径')
+    sub = parser.add_subparsers(dest='command')
+
+    build = sub.add_parser('build', help='增量建立索引')
+    build.add_argument('--transcripts', default=TRANSCRIPTS_JSONL, help='字幕存储 (.jsonl)')
+    build.add_argument('--merged', help='也从 merged_transcripts.csv 导入（没有时间戳）')
+
+    search = sub.add_parser('search', help='查询')
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--raw', action='store_true', help='直接使用 FTS5 查询语法')
+    search.add_argument('--by-channel', action='store_true', help='按频道汇总命中数')
+
+    args = parser.parse_args()
+    index = TranscriptIndex(args.db)
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        channel_map = load_channel_map()
+        added = 0
+        if os.path.exists(args.transcripts):
+            added += index.add_from_store(args.transcripts, channel_map)
+        if args.merged:
+            added += index.add_from_merged_csv(args.merged, channel_map)
+        if added:
+            index.optimize()
+        filled = index.fill_channels(channel_map)
+        print(f"✅ 新增 {added} 个视频，索引共 {len(index)} 个视频（{time.perf_counter() - start:.1f}s）")
+        if filled:
+            print(f"🏷️  补上频道信息: {filled} 个视频")
+
+    elif args.command == 'search':
+        start = time.perf_counter()
+        try:
+            if args.by_channel:
+                rows = index.count_by_channel(args.query, args.raw)
+                elapsed = (time.perf_counter() - start) * 1000
+                for channel_id, channel_title, hits in rows[:args.limit]:
+                    print(f"{hits:6d}  {channel_title or '?'} ({channel_id})")
+            else:
+                hits = index.search(args.query, args.limit, args.raw)
+                elapsed = (time.perf_counter() - start) * 1000
+                for hit in hits:
+                    print(f"{hit['video_id']}  {format_ms(hit['start_ms'])}  "
+                          f"{hit['channel_title'] or hit['channel_id'] or '?'}  "
+                          f"{hit['snippet'].replace(chr(10), ' ')}")
+            print(f"\n⏱️  {elapsed:.1f} ms")
+        except QuerySyntaxError as e:
+            print(f"❌ 查询语法错误: {e}")
+
+    else:
+        parser.print_help()
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
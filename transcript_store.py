@@ -0,0 +1,153 @@
+"""
+字幕存储：JSON Lines 格式，每行一个视频 {"video_id": ..., "transcripts": [...]}
+
+边处理边追加，读取时逐行生成，不需要把整个文件读进内存
+
+用法:
+    python transcript_store.py convert youtube_downloads_test/transcripts_all.json
+    python transcript_store.py sample youtube_downloads_test/transcripts_all.jsonl sample.json 3
+"""
+
+import json
+import os
+import sys
+import threading
+from itertools import islice
+
+
+class TranscriptStore:
+    """
+    追加写入的字幕存储（线程安全）。同一个 video_id 只写一次，重跑时不会重复
+
+    Args:
+        path: .jsonl 文件路径
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            truncated = repair_torn_tail(path)
+            if truncated:
+                print(f"⚠️  {path} 最后一行不完整（上次运行中断），已截掉 {truncated} 字节")
+        self._video_ids = set(iter_video_ids(path)) if os.path.exists(path) else set()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, video_id):
+        return video_id in self._video_ids
+
+    def __len__(self):
+        return len(self._video_ids)
+
+    def append(self, record):
+        """追加一个视频的字幕；已存在时跳过并返回 False"""
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if record['video_id'] in self._video_ids:
+                return False
+            self._file.write(line + '\n')
+            self._file.flush()
+            self._video_ids.add(record['video_id'])
+        return True
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def repair_torn_tail(path, chunk_size=64 * 1024):
+    """
+    进程中断时最后一行可能只写了一半且没有换行，之后追加的记录会接在它后面、连同它一起无法解析。
+    截掉最后一个换行之后的内容（那个视频没有记录在案，重跑时会重新处理），返回截掉的字节数
+    """
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - chunk_size)
+            f.seek(start)
+            chunk = f.read(end - start)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+        return size - end
+
+
+def iter_transcripts(path):
+    """逐行读取，每次生成一个视频的记录"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # 进程中断时最后一行可能不完整
+                continue
+
+
+def iter_video_ids(path):
+    """只取 video_id（每行仍需解析，但不会保留整条记录）"""
+    for record in iter_transcripts(path):
+        yield record['video_id']
+
+
+def iter_segments(path):
+    """逐个生成 (video_id, language, segment)"""
+    for record in iter_transcripts(path):
+        for transcript in record['transcripts']:
+            for segment in transcript['segments']:
+                yield record['video_id'], transcript['language'], segment
+
+
+def sample_transcripts(path, n=3):
+    """取前 n 个视频的字幕，只读文件开头的 n 行"""
+    return list(islice(iter_transcripts(path), n))
+
+
+def convert_json_to_jsonl(json_path, jsonl_path=None):
+    """把旧版 transcripts_all.json（一个大数组）转换成 JSON Lines；返回写入的视频数"""
+    jsonl_path = jsonl_path or os.path.splitext(json_path)[0] + '.jsonl'
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    written = 0
+    with TranscriptStore(jsonl_path) as store:
+        for record in data:
+            written += store.append(record)
+    return written
+
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == 'convert':
+        json_path = sys.argv[2]
+        jsonl_path = sys.argv[3] if len(sys.argv) > 3 else None
+        written = convert_json_to_jsonl(json_path, jsonl_path)
+        print(f"✅ 已转换 {written} 个视频 -> {jsonl_path or os.path.splitext(json_path)[0] + '.jsonl'}")
+    elif len(sys.argv) >= 4 and sys.argv[1] == 'sample':
+        n = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+        sample_data = sample_transcripts(sys.argv[2], n)
+        with open(sys.argv[3], 'w', encoding='utf-8') as f:
+            json.dump(sample_data, f, ensure_ascii=False, indent=2)
+        print(f"样本已保存到 {sys.argv[3]}（{len(sample_data)} 个视频）")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
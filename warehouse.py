@@ -0,0 +1,488 @@
+"""
+带类型的数据仓库（SQLite）：视频表和频道表，和 CSV 一起写出
+
+CSV 里计数是字符串、时长是 ISO-8601（PT#M#S）、标签用 | 拼接、列表字段是 Python repr，
+每次分析都要重新解析。这里写入时解析一次：
+- 计数、时长（秒）、宽高等存成 INTEGER，是否类字段存成 0/1
+- 发布时间统一成 UTC 的 'YYYY-MM-DDTHH:MM:SSZ'（字符串比较即时间比较）
+- 标签单独一张表 video_tags（可以按标签查），其他列表字段存 JSON 数组
+- step1（Data API）和 step2（yt-dlp）的同一个视频/频道合并成一行：新值为空时保留旧值
+- video_id / channel_id / published_at 上有索引，按频道汇总不需要全表扫描多次
+
+用法:
+    python warehouse.py import                 # 导入已有的 videos.csv / *_detailed.csv / channels*.csv
+    python warehouse.py panel [输出.csv]       # 按频道汇总
+    python warehouse.py stats
+"""
+
+import ast
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+
+WAREHOUSE_PATH = os.path.join("youtube_results", "warehouse.sqlite")
+
+# import 命令默认导入的CSV
+DEFAULT_CSVS = [
+    os.path.join("youtube_results", "videos.csv"),
+    os.path.join("youtube_results", "channels.csv"),
+    os.path.join("youtube_downloads_test", "videos_detailed.csv"),
+    os.path.join("youtube_downloads_test", "channels_detailed.csv"),
+]
+
+VIDEO_COLUMNS = {
+    'video_id': 'TEXT PRIMARY KEY',
+    'channel_id': 'TEXT',
+    'channel_title': 'TEXT',
+    'title': 'TEXT',
+    'description': 'TEXT',
+    'published_at': 'TEXT',
+    'recording_date': 'TEXT',
+    'duration_seconds': 'INTEGER',
+    'definition': 'TEXT',
+    'caption': 'INTEGER',  # Data API 的 contentDetails.caption（有人工字幕）
+    'has_subtitles': 'INTEGER',
+    'has_automatic_captions': 'INTEGER',
+    'available_subtitles': 'TEXT',  # JSON 数组
+    'available_auto_captions': 'TEXT',  # JSON 数组
+    'categories': 'TEXT',  # JSON 数组
+    'category_id': 'INTEGER',
+    'default_language': 'TEXT',
+    'default_audio_language': 'TEXT',
+    'width': 'INTEGER',
+    'height': 'INTEGER',
+    'fps': 'REAL',
+    'vcodec': 'TEXT',
+    'acodec': 'TEXT',
+    'filesize': 'INTEGER',
+    'age_limit': 'INTEGER',
+    'is_live': 'INTEGER',
+    'was_live': 'INTEGER',
+    'view_count': 'INTEGER',
+    'like_count': 'INTEGER',
+    'comment_count': 'INTEGER',
+    'video_url': 'TEXT',
+    'thumbnail': 'TEXT',
+    'stats_updated_at': 'TEXT',
+}
+
+CHANNEL_COLUMNS = {
+    'channel_id': 'TEXT PRIMARY KEY',
+    'title': 'TEXT',
+    'custom_url': 'TEXT',
+    'handle': 'TEXT',
+    'description': 'TEXT',
+    'country': 'TEXT',
+    'published_at': 'TEXT',
+    'subscriber_count': 'INTEGER',
+    'follower_count': 'INTEGER',  # yt-dlp 的 channel_follower_count
+    'video_count': 'INTEGER',
+    'view_count': 'INTEGER',
+    'keywords': 'TEXT',
+    'external_links': 'TEXT',  # JSON 数组
+    'business_email': 'TEXT',
+    'channel_url': 'TEXT',
+    'stats_updated_at': 'TEXT',
+    'enriched_at': 'TEXT',
+}
+
+ISO_DURATION_RE = re.compile(
+    r'^P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$'
+)
+
+
+# ============================================================================
+# 解析
+# ============================================================================
+
+# CSV 里表示空值的字符串
+BLANK_STRINGS = frozenset(('', 'None', 'nan'))
+
+# 已经是 'YYYY-MM-DDTHH:MM:SSZ'（Data API 的格式）
+NORMALIZED_DATETIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$')
+
+
+def _blank(value):
+    # 每行调用几十次，先走最常见的情况
+    if value is None:
+        return True
+    return value.__class__ is str and value in BLANK_STRINGS
+
+
+def parse_int(value):
+    """'1234' / 1234 / '12.0' -> int；空值或无法解析时返回 None"""
+    if _blank(value):
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+
+def parse_float(value):
+    if _blank(value):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_bool(value):
+    """True / 'True' / 'true' / '1' -> 1，False / 'false' / '0' -> 0，空值 -> None"""
+    if _blank(value):
+        return None
+    if isinstance(value, str):
+        return int(value.strip().lower() in ('true', '1', 'yes'))
+    return int(bool(value))
+
+
+def parse_duration(value):
+    """
+    时长（秒）：'PT1H2M3S'（Data API）、'1:02:03'（yt-dlp 的 duration_string）或秒数
+    """
+    if _blank(value):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = value.strip()
+    match = ISO_DURATION_RE.match(value)
+    if match:
+        parts = {k: float(v) for k, v in match.groupdict().items() if v}
+        return int(parts.get('days', 0) * 86400 + parts.get('hours', 0) * 3600
+                   + parts.get('minutes', 0) * 60 + parts.get('seconds', 0))
+    if ':' in value:
+        seconds = 0
+        for part in value.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    return parse_int(value)
+
+
+def parse_datetime(value):
+    """
+    统一成 UTC 'YYYY-MM-DDTHH:MM:SSZ'：ISO-8601、yt-dlp 的 'YYYYMMDD' 或 Unix 时间戳
+    """
+    if _blank(value):
+        return None
+    if isinstance(value, (int, float)):
+        moment = datetime.fromtimestamp(value, timezone.utc)
+    else:
+        value = value.strip()
+        if NORMALIZED_DATETIME_RE.match(value):
+            return value
+        if len(value) == 8 and value.isdigit():
+            moment = datetime.strptime(value, '%Y%m%d').replace(tzinfo=timezone.utc)
+        else:
+            try:
+                moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                return value
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def parse_list(value, separator='|'):
+    """list、JSON 数组、Python repr（CSV 里的 "['en', 'fr']"）或用 separator 拼接的字符串 -> list"""
+    if _blank(value):
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    value = value.strip()
+    if value.startswith('['):
+        for loads in (json.loads, ast.literal_eval):
+            try:
+                return [str(item) for item in loads(value)]
+            except (ValueError, SyntaxError):
+                continue
+    return [item for item in (part.strip() for part in value.split(separator)) if item]
+
+
+def _json_list(value, separator='|'):
+    items = parse_list(value, separator)
+    return json.dumps(items, ensure_ascii=False) if items else None
+
+
+def _text(value):
+    return None if _blank(value) else str(value)
+
+
+def normalize_video(row):
+    """
+    把 step1（parse_video_item）或 step2（extract_video_info）的一行转成 VIDEO_COLUMNS
+
+    Returns:
+        (列值 dict, 标签列表或 None)；标签为 None 表示这一行没有标签信息，不改动已有标签
+    """
+    get = row.get
+    # step2 的 published_at 只有日期（YYYYMMDD），有 Unix 时间戳时用时间戳
+    timestamp = parse_int(get('timestamp'))
+    tags = get('tags')
+    video = {
+        'video_id': get('video_id'),
+        'channel_id': _text(get('channel_id')),
+        'channel_title': _text(get('channel_title')),
+        'title': _text(get('title')),
+        'description': _text(get('description')),
+        'published_at': parse_datetime(timestamp if timestamp is not None else get('published_at')),
+        'recording_date': parse_datetime(get('recording_date')),
+        'duration_seconds': parse_duration(get('duration')),
+        'definition': _text(get('definition')),
+        'caption': parse_bool(get('caption')),
+        'has_subtitles': parse_bool(get('has_subtitles')),
+        'has_automatic_captions': parse_bool(get('has_automatic_captions')),
+        'available_subtitles': _json_list(get('available_subtitles'), ','),
+        'available_auto_captions': _json_list(get('available_auto_captions'), ','),
+        'categories': _json_list(get('categories')),
+        'category_id': parse_int(get('category_id')),
+        'default_language': _text(get('default_language')),
+        'default_audio_language': _text(get('default_audio_language')),
+        'width': parse_int(get('width')),
+        'height': parse_int(get('height')),
+        'fps': parse_float(get('fps')),
+        'vcodec': _text(get('vcodec')),
+        'acodec': _text(get('acodec')),
+        'filesize': parse_int(get('filesize')) or parse_int(get('filesize_approx')),
+        'age_limit': parse_int(get('age_limit')),
+        'is_live': parse_bool(get('is_live')),
+        'was_live': parse_bool(get('was_live')),
+        'view_count': parse_int(get('view_count')),
+        'like_count': parse_int(get('like_count')),
+        'comment_count': parse_int(get('comment_count')),
+        'video_url': _text(get('video_url') or get('webpage_url')),
+        'thumbnail': _text(get('thumbnail')),
+        'stats_updated_at': parse_datetime(get('stats_updated_at')),
+    }
+    return video, (parse_list(tags) if tags is not None and not _blank(tags) else None)
+
+
+def normalize_channel(row):
+    """把 step1（parse_channel_item）、step2（extract_channel_info）或频道补全后的一行转成 CHANNEL_COLUMNS"""
+    get = row.get
+    return {
+        'channel_id': get('channel_id'),
+        'title': _text(get('channel_title') or get('title')),
+        'custom_url': _text(get('custom_url')),
+        'handle': _text(get('channel_handle')),
+        'description': _text(get('description')),
+        'country': _text(get('country')),
+        'published_at': parse_datetime(get('published_at')),
+        'subscriber_count': parse_int(get('subscriber_count')),
+        'follower_count': parse_int(get('channel_follower_count')),
+        'video_count': parse_int(get('video_count')),
+        'view_count': parse_int(get('view_count')),
+        'keywords': _text(get('keywords')),
+        'external_links': _json_list(get('external_links'), ' '),
+        'business_email': _text(get('business_email')),
+        'channel_url': _text(get('channel_url')),
+        'stats_updated_at': parse_datetime(get('stats_updated_at')),
+        'enriched_at': parse_datetime(get('enriched_at')),
+    }
+
+
+# ============================================================================
+# 仓库
+# ============================================================================
+
+def _upsert_sql(table, columns, key):
+    names = list(columns)
+    updates = ', '.join(f"{name} = COALESCE(excluded.{name}, {table}.{name})" for name in names if name != key)
+    return (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+            f"ON CONFLICT({key}) DO UPDATE SET {updates}")
+
+
+class Warehouse:
+    """
+    线程安全；写入在一个事务里批量完成
+
+    Args:
+        path: SQLite 文件路径
+    """
+
+    def __init__(self, path=WAREHOUSE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS videos ({', '.join(f'{k} {v}' for k, v in VIDEO_COLUMNS.items())});
+            CREATE TABLE IF NOT EXISTS channels ({', '.join(f'{k} {v}' for k, v in CHANNEL_COLUMNS.items())});
+            CREATE TABLE IF NOT EXISTS video_tags (
+                video_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (video_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos (channel_id, published_at);
+            CREATE INDEX IF NOT EXISTS idx_videos_published ON videos (published_at);
+            CREATE INDEX IF NOT EXISTS idx_video_tags_tag ON video_tags (tag);
+            """
+        )
+        self._conn.commit()
+        self._video_sql = _upsert_sql('videos', VIDEO_COLUMNS, 'video_id')
+        self._channel_sql = _upsert_sql('channels', CHANNEL_COLUMNS, 'channel_id')
+
+    def load_videos(self, rows):
+        """写入视频行（step1 / step2 的 dict 或从 CSV 读出的行）；返回写入的行数"""
+        values = []
+        tags = {}  # 同一批里重复的视频以最后一行的标签为准
+        for row in rows:
+            if not row.get('video_id'):
+                continue
+            video, video_tags = normalize_video(row)
+            values.append(tuple(video.values()))
+            if video_tags is not None:
+                tags[video['video_id']] = video_tags
+
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(self._video_sql, values)
+                self._conn.executemany("DELETE FROM video_tags WHERE video_id = ?", [(vid,) for vid in tags])
+                self._conn.executemany(
+                    "INSERT INTO video_tags (video_id, position, tag) VALUES (?, ?, ?)",
+                    [(vid, i, tag) for vid, video_tags in tags.items() for i, tag in enumerate(video_tags)],
+                )
+        return len(values)
+
+    def load_channels(self, rows):
+        """写入频道行；返回写入的行数"""
+        values = [tuple(normalize_channel(row).values()) for row in rows if row.get('channel_id')]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(self._channel_sql, values)
+        return len(values)
+
+    def import_csv(self, path):
+        """导入 step1 / step2 写出的 CSV（按表头判断是视频还是频道）；返回 (表名, 行数)"""
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            if 'video_id' in (reader.fieldnames or []):
+                return 'videos', self.load_videos(reader)
+            return 'channels', self.load_channels(reader)
+
+    # ---------------------------------------------------------------- 查询
+
+    def query(self, sql, params=()):
+        """执行任意 SQL，返回 dict 列表"""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def channel_panel(self, date_after=None, date_before=None, min_videos=1):
+        """
+        按频道汇总（视频表 JOIN 频道表），published_at 在 [date_after, date_before] 之间的视频
+
+        Returns:
+            每个频道一行：频道信息 + videos、total_views、avg_views、avg_duration_seconds、
+            total_likes、total_comments、first_published、last_published；按 total_views 降序
+        """
+        where, params = [], []
+        if date_after:
+            where.append("v.published_at >= ?")
+            params.append(parse_datetime(date_after))
+        if date_before:
+            where.append("v.published_at <= ?")
+            params.append(parse_datetime(date_before))
+        params.append(min_videos)
+        return self.query(
+            f"""
+            SELECT v.channel_id,
+                   COALESCE(c.title, MAX(v.channel_title)) AS title,
+                   c.country, c.subscriber_count, c.video_count AS channel_video_count,
+                   COUNT(*) AS videos,
+                   SUM(v.view_count) AS total_views,
+                   AVG(v.view_count) AS avg_views,
+                   AVG(v.duration_seconds) AS avg_duration_seconds,
+                   SUM(v.like_count) AS total_likes,
+                   SUM(v.comment_count) AS total_comments,
+                   MIN(v.published_at) AS first_published,
+                   MAX(v.published_at) AS last_published
+            FROM videos v LEFT JOIN channels c ON c.channel_id = v.channel_id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            GROUP BY v.channel_id
+            HAVING COUNT(*) >= ?
+            ORDER BY total_views DESC
+            """,
+            params,
+        )
+
+    def channel_videos(self, channel_id):
+        """一个频道的视频（按发布时间）"""
+        return self.query("SELECT * FROM videos WHERE channel_id = ? ORDER BY published_at", (channel_id,))
+
+    def tag_counts(self, limit=50):
+        """最常见的标签：[{'tag', 'videos'}]"""
+        return self.query(
+            "SELECT tag, COUNT(DISTINCT video_id) AS videos FROM video_tags GROUP BY tag ORDER BY videos DESC LIMIT ?",
+            (limit,),
+        )
+
+    def summary(self):
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('videos', 'channels', 'video_tags')
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_csv(rows, path):
+    if not rows:
+        return
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('import', 'panel', 'stats'):
+        print(__doc__)
+        return
+
+    with Warehouse() as warehouse:
+        if command == 'import':
+            for path in sys.argv[2:] or DEFAULT_CSVS:
+                if os.path.exists(path):
+                    table, count = warehouse.import_csv(path)
+                    print(f"✅ {path} -> {table}: {count} 行")
+        elif command == 'panel':
+            rows = warehouse.channel_panel()
+            if len(sys.argv) > 2:
+                write_csv(rows, sys.argv[2])
+                print(f"💾 {len(rows)} 个频道已保存: {sys.argv[2]}")
+            for row in rows[:20]:
+                print(f"{row['channel_id']}  {row['videos']:5d} 个视频  {row['total_views'] or 0:>14,} 次播放  "
+                      f"{row['title']}")
+        stats = warehouse.summary()
+        print(f"\n📦 {warehouse.path}: {stats['videos']} 个视频，{stats['channels']} 个频道，{stats['video_tags']} 个标签")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+YouTube Data API v3 的 asyncio 客户端：并发请求、配额统计、遇到限流自适应退避
+
+直接请求 REST 接口（不依赖 googleapiclient），base_url 可以指向本地的假服务器
+（见 fake_youtube_api.py），方便离线测试
+"""
+
+import asyncio
+import json
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+import metrics
+
+API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+# 每次调用消耗的配额单位（https://developers.google.com/youtube/v3/determine_quota_cost）
+QUOTA_COSTS = {
+    'search': 100,
+    'videos': 1,
+    'channels': 1,
+}
+
+# 这些 reason 代表短时间限流，可以等一会儿重试
+RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError'}
+
+
+class YouTubeApiError(Exception):
+    """API 返回的错误"""
+
+    def __init__(self, status, reason, message=''):
+        super().__init__(f"HTTP {status} {reason}: {message}")
+        self.status = status
+        self.reason = reason
+
+
+class QuotaExceededError(YouTubeApiError):
+    """当日配额已用完，重试没有意义"""
+
+
+class AdaptiveLimiter:
+    """
+    自适应并发上限（AIMD）：被限流时上限减半，连续成功后逐步加回去
+    """
+
+    def __init__(self, max_limit, increase_after=5):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.increase_after = increase_after
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def on_success(self):
+        async with self._cond:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    async def on_throttle(self):
+        async with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+
+def _parse_error(status, body):
+    """从错误响应里取出 reason 和 message"""
+    try:
+        error = json.loads(body).get('error', {})
+        errors = error.get('errors') or [{}]
+        return errors[0].get('reason', ''), error.get('message', '')
+    except (ValueError, AttributeError):
+        return '', body[:200] if isinstance(body, str) else ''
+
+
+def _http_get(url, timeout):
+    """同步 GET，返回 (status, body)；在线程池里执行。连接失败、超时等网络错误返回 status 0"""
+    request = urllib.request.Request(url, headers={'Accept': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode('utf-8', errors='replace')
+    except (urllib.error.URLError, OSError) as e:
+        return 0, str(getattr(e, 'reason', e))
+
+
+class AsyncYouTubeClient:
+    """
+    Args:
+        api_key: API Key
+        base_url: 接口地址，测试时可以换成本地假服务器
+        max_concurrency: 最大并发请求数
+        max_retries: 限流/服务端错误时的最大重试次数
+        backoff_base: 退避基础秒数（指数增长并加随机抖动）
+        backoff_max: 单次退避的最长秒数
+        timeout: 单个请求超时秒数
+        cache: response_cache.ResponseCache，命中时不发请求、不计配额
+    """
+
+    def __init__(self, api_key, base_url=API_BASE_URL, max_concurrency=8, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, timeout=30, cache=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = AdaptiveLimiter(max_concurrency)
+
+        # 统计
+        self.quota_used = Counter()  # 每种调用消耗的配额单位
+        self.calls = Counter()  # 每种调用的请求次数（含重试）
+        self.retries = Counter()  # 每种调用的重试次数
+        self.cache_hits = Counter()  # 每种调用命中缓存的次数
+        self.backoff_seconds = 0.0  # 退避等待的总秒数
+        self.quota_exhausted = False  # 收到过 quotaExceeded 后不再发请求
+
+    @property
+    def total_quota(self):
+        return sum(self.quota_used.values())
+
+    def quota_report(self):
+        """按调用类型汇总配额和请求数"""
+        return {
+            endpoint: {
+                'calls': self.calls[endpoint],
+                'retries': self.retries[endpoint],
+                'quota_units': self.quota_used[endpoint],
+                'cache_hits': self.cache_hits[endpoint],
+            }
+            for endpoint in sorted(set(self.calls) | set(self.cache_hits))
+        }
+
+    def _build_url(self, endpoint, params):
+        query = {k: v for k, v in params.items() if v is not None}
+        query['key'] = self.api_key
+        return f"{self.base_url}/{endpoint}?{urllib.parse.urlencode(query)}"
+
+    async def request(self, endpoint, params):
+        """
+        发送一次 GET 请求；限流和网络错误按指数退避重试，配额用尽时抛出 QuotaExceededError
+        （之后的请求不再访问网络，直接抛出 QuotaExceededError）
+        """
+        if self.cache is not None:
+            body = self.cache.get('youtube', endpoint, params)
+            if body is not None:
+                self.cache_hits[endpoint] += 1
+                return json.loads(body)
+        if self.quota_exhausted:
+            raise QuotaExceededError(403, 'quotaExceeded', 'quota already exhausted in this run')
+
+        url = self._build_url(endpoint, params)
+
+        for attempt in range(self.max_retries + 1):
+            async with self.limiter:
+                self.calls[endpoint] += 1
+                self.quota_used[endpoint] += QUOTA_COSTS.get(endpoint, 1)
+                metrics.inc('quota_units', QUOTA_COSTS.get(endpoint, 1), endpoint=endpoint)
+                start = time.perf_counter()
+                status, body = await asyncio.to_thread(_http_get, url, self.timeout)
+                metrics.observe('api_call_seconds', time.perf_counter() - start,
+                                endpoint=endpoint, status='ok' if status == 200 else 'error')
+                metrics.inc('bytes_downloaded', len(body.encode('utf-8')), source='api')
+
+            if status == 200:
+                await self.limiter.on_success()
+                if self.cache is not None:
+                    self.cache.put('youtube', endpoint, params, body)
+                return json.loads(body)
+
+            reason, message = _parse_error(status, body)
+            if status == 403 and reason in ('quotaExceeded', 'dailyLimitExceeded'):
+                self.quota_exhausted = True
+                raise QuotaExceededError(status, reason, message)
+
+            retryable = (status in (0, 429) or status >= 500
+                         or (status == 403 and reason in RETRYABLE_REASONS))
+            if not retryable or attempt == self.max_retries:
+                raise YouTubeApiError(status, reason, message)
+
+            await self.limiter.on_throttle()
+            delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+            delay *= random.uniform(0.5, 1.0)
+            self.retries[endpoint] += 1
+            self.backoff_seconds += delay
+            metrics.inc('retries', endpoint=endpoint, source='api')
+            metrics.sleep('backoff', delay, source='api')
+            cause = f"被限流 (HTTP {status} {reason})" if status else f"网络错误 ({message})"
+            print(f"  ⏳ {endpoint} {cause}，{delay:.1f}s 后重试")
+            await asyncio.sleep(delay)
+
+    async def iter_search_pages(self, query, max_results=50, language='en', date_after=None, date_before=None):
+        """按页返回搜索到的 video IDs（异步生成器），每拿到一页就立刻交给调用方"""
+        fetched = 0
+        page_token = None
+
+        while fetched < max_results:
+            params = {
+                'q': query,
+                'type': 'video',
+                'part': 'id',
+                'maxResults': min(50, max_results - fetched),
+                'pageToken': page_token,
+                'relevanceLanguage': language,
+                'videoCaption': 'any',
+                'publishedAfter': date_after,
+                'publishedBefore': date_before,
+            }
+            response = await self.request('search', params)
+
+            ids = [item['id']['videoId'] for item in response.get('items', [])
+                   if item.get('id', {}).get('videoId')]
+            fetched += len(ids)
+            if ids:
+                yield ids
+
+            page_token = response.get('nextPageToken')
+            if not page_token or not ids:
+                break
+
+    async def list_videos(self, video_ids, part='id,snippet,contentDetails,statistics,recordingDetails'):
+        """videos().list，一次最多 50 个 ID，返回 items"""
+        response = await self.request('videos', {
+            'part': part,
+            'id': ','.join(video_ids),
+        })
+        return response.get('items', [])
+
+    async def list_channels(self, channel_ids, part='id,snippet,contentDetails,statistics,brandingSettings'):
+        """channels().list，一次最多 50 个 ID，返回 items"""
+        response = await self.request('channels', {
+            'part': part,
+            'id': ','.join(channel_ids),
+        })
+        return response.get('items', [])
@@ -0,0 +1,135 @@
+"""
+googleapiclient 的 YouTube 客户端：发现文档只读取、解析一次，客户端按需创建并复用
+
+build('youtube', 'v3') 每次都要拿发现文档（旧版本的 googleapiclient 会联网请求）再解析一遍，
+这里按下面的顺序找发现文档，找到后缓存在进程里:
+
+1. DISCOVERY_CACHE（本地缓存文件，可以直接放进仓库）
+2. googleapiclient 自带的静态文档（2.x 版本）
+3. 联网请求 DISCOVERY_URL，然后写入 DISCOVERY_CACHE，下次启动不再联网
+
+httplib2.Http 不是线程安全的，每个线程各自用同一份文档创建一个客户端（创建本身不到 1 ms）
+
+用法:
+    youtube = youtube_client.get_client(api_key)                  # 当前线程的客户端
+    youtube = youtube_client.get_client(api_key, base_url)        # 指向 fake_youtube_api.py 的本地服务器
+    python youtube_client.py                                       # 预先写好 DISCOVERY_CACHE
+"""
+
+import json
+import os
+import threading
+import urllib.request
+
+import metrics
+from youtube_async import API_BASE_URL
+
+DISCOVERY_CACHE = os.path.join("youtube_results", "youtube.v3.discovery.json")
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest"
+
+_lock = threading.Lock()
+_document = None
+_local = threading.local()
+
+
+def _read_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _bundled_document():
+    """googleapiclient 2.x 自带的静态发现文档"""
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+    except ImportError:
+        return None
+    content = get_static_doc('youtube', 'v3')
+    return json.loads(content) if content else None
+
+
+def _fetch_document(path):
+    with urllib.request.urlopen(DISCOVERY_URL, timeout=30) as response:
+        content = response.read().decode('utf-8')
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return json.loads(content)
+
+
+def load_discovery_document(path=DISCOVERY_CACHE):
+    """读取发现文档（进程内只读一次）：本地缓存 → 自带的静态文档 → 联网请求并写入缓存"""
+    global _document
+    with _lock:
+        if _document is None:
+            with metrics.timer('discovery_load_seconds'):
+                for source, load in (('cache', lambda: _read_cache(path)),
+                                     ('bundled', _bundled_document),
+                                     ('network', lambda: _fetch_document(path))):
+                    _document = load()
+                    if _document:
+                        metrics.inc('discovery_loads', source=source)
+                        break
+        return _document
+
+
+def _api_endpoint(base_url):
+    """API_BASE（.../youtube/v3）换成发现文档里 rootUrl 的形式；默认地址时返回 None（用文档里的 rootUrl）"""
+    if not base_url or base_url.rstrip('/') == API_BASE_URL:
+        return None
+    root = base_url.rstrip('/')
+    if root.endswith('/youtube/v3'):
+        root = root[:-len('/youtube/v3')]
+    return root + '/'
+
+
+def build_client(api_key, base_url=None, path=DISCOVERY_CACHE):
+    """用缓存的发现文档创建一个新的客户端（不联网）"""
+    from googleapiclient.discovery import build_from_document
+
+    endpoint = _api_endpoint(base_url)
+    return build_from_document(
+        load_discovery_document(path),
+        developerKey=api_key,
+        client_options={'api_endpoint': endpoint} if endpoint else None,
+    )
+
+
+def get_client(api_key, base_url=None):
+    """当前线程的客户端，第一次调用时创建，之后复用（api_key / base_url 变了会重新创建）"""
+    key = (api_key, base_url)
+    if getattr(_local, 'key', None) != key:
+        _local.client = build_client(api_key, base_url)
+        _local.key = key
+    return _local.client
+
+
+def reset():
+    """丢掉进程内缓存的文档和当前线程的客户端（测试或更换 DISCOVERY_CACHE 后用）"""
+    global _document
+    with _lock:
+        _document = None
+    _local.__dict__.clear()
+
+
+def main():
+    if _read_cache(DISCOVERY_CACHE):
+        print(f"✅ 发现文档已存在: {DISCOVERY_CACHE}")
+        return
+    document = _bundled_document()
+    if document:
+        os.makedirs(os.path.dirname(DISCOVERY_CACHE), exist_ok=True)
+        with open(DISCOVERY_CACHE, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False)
+    else:
+        document = _fetch_document(DISCOVERY_CACHE)
+    print(f"💾 已写入发现文档（revision {document.get('revision', '?')}）: {DISCOVERY_CACHE}")
+
+
+if __name__ == "__main__":
+    main()